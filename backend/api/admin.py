@@ -18,17 +18,17 @@ class CustomUserAdmin(UserAdmin):
 @admin.register(Agent)
 class AgentAdmin(admin.ModelAdmin):
     list_display = ('dni', 'full_name', 'status', 'ministry', 'retirement_date')
-    list_filter = ('status', 'ministry', 'gender')
+    list_filter = ('status_code', 'ministry', 'gender')
     search_fields = ('dni', 'full_name', 'affiliate_status')
 
-from .models import SecurityLog
+from .models import SecurityLog, Job, OutboundEmail
 
 @admin.register(SecurityLog)
 class SecurityLogAdmin(admin.ModelAdmin):
-    list_display = ('timestamp', 'action', 'user', 'ip_address', 'details')
+    list_display = ('timestamp', 'action', 'count', 'user', 'ip_address', 'details')
     list_filter = ('action', 'timestamp', 'user')
     search_fields = ('user__username', 'details', 'ip_address')
-    readonly_fields = ('timestamp', 'action', 'user', 'ip_address', 'details')
+    readonly_fields = ('timestamp', 'action', 'count', 'user', 'ip_address', 'details')
 
     def has_add_permission(self, request):
         return False
@@ -38,3 +38,24 @@ class SecurityLogAdmin(admin.ModelAdmin):
 
     def has_delete_permission(self, request, obj=None):
         return False
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'kind', 'status', 'progress', 'total', 'created_by', 'worker')
+    list_filter = ('kind', 'status')
+    readonly_fields = [f.name for f in Job._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'to', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('to', 'subject')
+    readonly_fields = [f.name for f in OutboundEmail._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
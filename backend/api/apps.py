@@ -0,0 +1,27 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_migrate, post_save
+
+
+def ensure_search_index(sender, using, **kwargs):
+    from django.db import connections
+    from django.db.migrations.recorder import MigrationRecorder
+    connection = connections[using]
+    # Only once the search_text column exists (a partial migrate may stop before it).
+    applied = MigrationRecorder(connection).applied_migrations()
+    if ('api', '0007_agent_search_text') not in applied:
+        return
+    from .search import install_search_index
+    install_search_index(connection)
+
+
+class ApiConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'api'
+
+    def ready(self):
+        post_migrate.connect(ensure_search_index, sender=self)
+
+        from .authentication import forget_user_state
+        from .models import User
+        post_save.connect(forget_user_state, sender=User)
+        post_delete.connect(forget_user_state, sender=User)
@@ -0,0 +1,162 @@
+"""
+Buffered SecurityLog writes.
+
+record() doesn't touch the database: events are queued in-process and
+written with one bulk_create by a background thread, as soon as
+AUDIT_BUFFER_SIZE events are waiting or every AUDIT_FLUSH_SECONDS, so
+logins, exports and imports don't pay for an INSERT each.
+
+Repeated events with the same coalesce key (failed logins from one IP for
+one username) that arrive before a flush are merged into a single row
+whose count says how many there were. A credential-stuffing burst then
+costs a handful of rows per flush instead of one insert per attempt.
+
+If the bulk insert fails, the rows are saved one at a time, and those
+that still fail go back into the buffer for the next flush. An event is
+only dropped (and logged in full) after AUDIT_MAX_ATTEMPTS failed flushes.
+
+The buffer is flushed at interpreter exit (gunicorn worker shutdown,
+runworker stopping). Events still buffered when a process is killed
+outright are lost. AUDIT_FLUSH_SECONDS = 0 writes every event at once.
+"""
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import SecurityLog
+
+logger = logging.getLogger(__name__)
+
+BUFFER_SIZE = getattr(settings, 'AUDIT_BUFFER_SIZE', 100)
+FLUSH_SECONDS = getattr(settings, 'AUDIT_FLUSH_SECONDS', 2.0)
+MAX_ATTEMPTS = getattr(settings, 'AUDIT_MAX_ATTEMPTS', 5)
+
+
+def client_ip(request):
+    """Client address, honoring the first X-Forwarded-For hop."""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    return x_forwarded_for.split(',')[0] if x_forwarded_for else request.META.get('REMOTE_ADDR')
+
+
+class AuditBuffer:
+    """Pending SecurityLog rows, keyed by coalesce key (or a unique one)."""
+
+    def __init__(self, size=BUFFER_SIZE, interval=FLUSH_SECONDS):
+        self.size = size
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending = {}
+        self._attempts = {}  # key -> failed flushes of its pending row
+        self._serial = 0
+        self._pid = None
+
+    def add(self, entry: SecurityLog, key=None) -> None:
+        with self._lock:
+            if key is not None and key in self._pending:
+                self._pending[key].count += 1
+                return
+            if key is None:
+                self._serial += 1
+                key = ('serial', self._serial)
+            self._pending[key] = entry
+            full = len(self._pending) >= self.size
+        self._ensure_flusher()
+        if full:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """Writes every pending row. Returns how many rows were written."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            failed = {}
+            try:
+                SecurityLog.objects.bulk_create(list(pending.values()), batch_size=self.size)
+            except Exception:
+                # All or nothing: find the rows that can't be written
+                logger.warning('Could not bulk write %s audit events, saving them one by one', len(pending), exc_info=True)
+                for key, entry in pending.items():
+                    try:
+                        entry.save(force_insert=True)
+                    except Exception:
+                        failed[key] = entry
+            self._requeue(pending, failed)
+            return len(pending) - len(failed)
+
+    def _requeue(self, flushed: dict, failed: dict) -> None:
+        """Puts failed rows back for the next flush, up to MAX_ATTEMPTS each."""
+        with self._lock:
+            for key in flushed:
+                attempts = self._attempts.pop(key, 0) + 1
+                if key not in failed:
+                    continue
+                entry = failed[key]
+                if attempts >= MAX_ATTEMPTS:
+                    logger.error(
+                        'Dropping audit event after %s failed writes: %s user=%s ip=%s count=%s %s',
+                        attempts, entry.action, entry.user_id, entry.ip_address, entry.count, entry.details,
+                    )
+                    continue
+                if key in self._pending:
+                    # Coalesced again meanwhile: one row counts both
+                    self._pending[key].count += entry.count
+                else:
+                    self._pending[key] = entry
+                self._attempts[key] = attempts
+
+    def _ensure_flusher(self) -> None:
+        # One thread per process, started lazily so forked workers get their own
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+        threading.Thread(target=self._run, name='audit-flusher', daemon=True).start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+            # This thread has its own connection: let Django recycle it like a request's
+            close_old_connections()
+
+
+BUFFER = AuditBuffer()
+atexit.register(BUFFER.flush)
+
+
+def record(action: str, user=None, ip=None, details='', coalesce=None) -> None:
+    """
+    Queues a SecurityLog event. Events with the same action and coalesce
+    value, pending at the same time, become one row with a count.
+    """
+    entry = SecurityLog(user=user, action=action, ip_address=ip, details=details, timestamp=timezone.now())
+    if not FLUSH_SECONDS:
+        entry.save()
+        return
+    BUFFER.add(entry, key=(action, coalesce) if coalesce is not None else None)
+
+
+def login_succeeded(user, ip) -> None:
+    record('LOGIN_SUCCESS', user=user, ip=ip, details=f"User {user.username} logged in.")
+
+
+def login_failed(username, ip) -> None:
+    # Cannot trust username in failed attempt: it only goes to the details
+    record(
+        'LOGIN_FAIL', ip=ip,
+        details=f"Failed login attempt for username: {username}",
+        coalesce=(ip, username),
+    )
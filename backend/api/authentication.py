@@ -0,0 +1,106 @@
+"""
+JWT authentication without a user query per request.
+
+Access tokens issued at login (CustomTokenObtainPairSerializer.get_token)
+carry the claims the API authorizes with: username, role, is_staff,
+is_superuser, is_active, plus a keyed fingerprint of the password hash.
+ClaimsJWTAuthentication builds request.user from those claims as a User
+instance whose other fields are deferred (loaded on first access, which
+the API itself never needs).
+
+Claims are only trusted while they still match the user's row. That state
+is read once per AUTH_STATE_TTL seconds per process (the 'default' cache)
+and dropped in this process as soon as the user is saved. A token is
+rejected when the user is gone or inactive, when the password changed, or
+when the privileges in it are outdated, so it can't outlive a revocation by
+more than AUTH_STATE_TTL.
+
+Tokens without these claims (issued before) go through the regular
+JWTAuthentication lookup.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.crypto import salted_hmac
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+
+STATE_TTL = getattr(settings, 'AUTH_STATE_TTL', 60)
+
+# Claims that must match the user's current row for the token to be accepted
+CHECKED_CLAIMS = ('is_active', 'is_staff', 'is_superuser', 'role')
+CLAIMS = ('username',) + CHECKED_CLAIMS + ('pwd',)
+
+MISSING = {'missing': True}  # Cached for deleted users too, so bad tokens don't query every time
+
+
+def password_fingerprint(password_hash: str) -> str:
+    """Changes whenever the password does, without revealing the hash."""
+    return salted_hmac('api.authentication.password', password_hash or '').hexdigest()[:16]
+
+
+def add_claims(token, user):
+    """Embeds the claims ClaimsJWTAuthentication trusts into a login token."""
+    token['username'] = user.username
+    token['role'] = user.role
+    token['is_staff'] = user.is_staff
+    token['is_superuser'] = user.is_superuser
+    token['is_active'] = user.is_active
+    token['pwd'] = password_fingerprint(user.password)
+    return token
+
+
+def state_key(user_id) -> str:
+    return f'auth:user_state:{user_id}'
+
+
+def user_state(user_id) -> dict:
+    """Authorization-relevant state of a user, cached for STATE_TTL seconds."""
+    cache = caches['default']
+    state = cache.get(state_key(user_id))
+    if state is None:
+        row = User.objects.filter(pk=user_id).values('password', *CHECKED_CLAIMS).first()
+        if row is None:
+            state = MISSING
+        else:
+            state = {claim: row[claim] for claim in CHECKED_CLAIMS}
+            state['pwd'] = password_fingerprint(row['password'])
+        cache.set(state_key(user_id), state, STATE_TTL)
+    return state
+
+
+def forget_user_state(sender, instance, **kwargs):
+    """post_save/post_delete receiver: re-check this user's tokens on their next request."""
+    caches['default'].delete(state_key(instance.pk))
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that takes the user from the token's claims (see module docstring)."""
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in CLAIMS):
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            return super().get_user(validated_token)
+
+        state = user_state(user_id)
+        if state.get('missing'):
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if not state['is_active']:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        if state['pwd'] != validated_token['pwd']:
+            raise AuthenticationFailed('Token revoked by a password change', code='token_revoked')
+        if any(state[claim] != validated_token[claim] for claim in CHECKED_CLAIMS):
+            raise AuthenticationFailed('Token privileges are outdated, log in again', code='token_outdated')
+
+        # Deferred fields (email, password...) are loaded only if something reads them.
+        # from_db() expects the values in model field order.
+        data = {claim: validated_token[claim] for claim in ('username',) + CHECKED_CLAIMS}
+        data[User._meta.pk.attname] = user_id
+        names = [f.attname for f in User._meta.concrete_fields if f.attname in data]
+        return User.from_db(DEFAULT_DB_ALIAS, names, [data[name] for name in names])
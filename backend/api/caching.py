@@ -0,0 +1,148 @@
+"""
+Versioned result cache for the agents API.
+
+Cached responses are keyed by the normalized request parameters plus a
+global dataset version. Every write path calls invalidate_agents(), which
+replaces the version once the transaction commits: old entries simply stop
+being addressed and expire on their own, so invalidation is O(1) with no key
+scanning.
+
+The same version doubles as a validator for HTTP conditional requests: the
+ETag of a response is a hash of its cache key and Last-Modified is the time
+of the version, so an unchanged poll is answered with 304 Not Modified
+before any agent row is read.
+
+The cache alias (settings.CACHES['agents']) has to be shared by all workers
+for invalidation to reach them; see AGENTS_CACHE_BACKEND in settings.
+"""
+import hashlib
+import json
+import threading
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+CACHE_ALIAS = 'agents'
+VERSION_KEY = 'agents:version'
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def dataset_version() -> int:
+    """
+    Current dataset version. Versions are nanosecond timestamps of the last write,
+    so a version lost to eviction can never be reissued for different data.
+    """
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY) or 0
+    return version
+
+
+def bump_version() -> None:
+    # A plain set (not incr): concurrent bumps can't be lost on backends without atomic incr.
+    get_cache().set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def invalidate_agents() -> None:
+    """Marks the agents dataset as changed once the current transaction commits."""
+    transaction.on_commit(bump_version)
+
+
+def make_key(namespace: str, request, version=None) -> str:
+    """Builds a cache key from the namespace, dataset version, host and normalized query params."""
+    if version is None:
+        version = dataset_version()
+    params = sorted((k, sorted(v)) for k, v in request.query_params.lists())
+    raw = json.dumps([request.get_host(), request.path, params], separators=(',', ':'))
+    return f'agents:{namespace}:v{version}:{hashlib.sha1(raw.encode()).hexdigest()}'
+
+
+def record(hit: bool) -> None:
+    with _stats_lock:
+        _stats['hits' if hit else 'misses'] += 1
+
+
+def stats() -> dict:
+    """Hit/miss counters of this worker process."""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else None,
+        'version': dataset_version(),
+        'backend': get_cache().__class__.__name__,
+    }
+
+
+def cached_response(namespace: str, request, compute, version=None) -> Response:
+    """
+    Returns the cached Response data for this request, or calls compute()
+    and caches its data when it succeeds.
+    """
+    key = make_key(namespace, request, version)
+    cache = get_cache()
+    data = cache.get(key)
+    if data is not None:
+        record(hit=True)
+        response = Response(data)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    record(hit=False)
+    response = compute()
+    if response.status_code == 200:
+        cache.set(key, response.data)
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+def make_etag(namespace: str, request, version) -> str:
+    """Strong ETag of a response: changes with the dataset version and the request params."""
+    return '"%s"' % hashlib.sha1(make_key(namespace, request, version).encode()).hexdigest()
+
+
+def last_modified(version) -> int:
+    """Last-Modified timestamp (seconds) of a dataset version, rounded up to the next second."""
+    return -(-version // 1_000_000_000)
+
+
+def set_validators(response, etag: str, version) -> None:
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified(version))
+    # Lets the browser keep the body and revalidate it on every request
+    response['Cache-Control'] = 'private, no-cache'
+
+
+def conditional_response(namespace: str, request, compute, cache=True, version=None):
+    """
+    Answers If-None-Match / If-Modified-Since against the current dataset
+    version (or the version given): 304 Not Modified when the client's copy is
+    still current, else the (cached, unless cache=False) result of compute()
+    with ETag and Last-Modified attached.
+    """
+    if version is None:
+        version = dataset_version()
+    etag = make_etag(namespace, request, version)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified(version))
+    if not_modified is not None:
+        set_validators(not_modified, etag, version)
+        return not_modified
+
+    response = cached_response(namespace, request, compute, version) if cache else compute()
+    if response.status_code == 200:
+        set_validators(response, etag, version)
+    return response
@@ -0,0 +1,184 @@
+"""
+Change tracking for delta sync (/api/agents/changes/?since=<seq>).
+
+Every write transaction takes the next number of a global change sequence
+(ChangeCounter, a single row) and stamps it on the agents it writes
+(Agent.change_seq) or on the tombstones of the agents it deletes
+(AgentTombstone.seq). Bumping the counter locks its row until the
+transaction ends, so sequence numbers become visible in commit order: once a
+reader sees seq N, every change numbered N or lower is already committed, and
+"everything in (since, N]" is a complete delta.
+
+A delta is read in pages of at most AGENT_CHANGES_PAGE_SIZE changes, in
+(seq, deletions first, id) order; a page can end inside a sequence number
+(one bulk import writes thousands of agents under one), so the next page
+starts from a cursor holding the last change sent.
+
+Tombstones older than AGENT_TOMBSTONE_RETENTION_DAYS are purged by
+`manage.py runworker`; clients whose since is older than the purge point get
+410 Gone and must reload the full roster (e.g. from /api/agents/snapshot/).
+"""
+import base64
+import json
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+from .caching import invalidate_agents
+from .models import Agent, AgentTombstone, ChangeCounter
+
+COUNTER_PK = 1
+
+TOMBSTONE_RETENTION = timedelta(days=getattr(settings, 'AGENT_TOMBSTONE_RETENTION_DAYS', 30))
+
+CHUNK_SIZE = 2000
+
+PAGE_SIZE = getattr(settings, 'AGENT_CHANGES_PAGE_SIZE', 1000)
+MAX_PAGE_SIZE = getattr(settings, 'AGENT_CHANGES_MAX_PAGE_SIZE', 10000)
+
+# Order of the changes within a sequence number: a re-created agent's deletion comes first
+DELETED, UPSERTED = 0, 1
+
+
+def next_seq() -> int:
+    """
+    Takes the next change sequence number. Must run inside the write's
+    transaction: the counter row stays locked until it commits.
+    """
+    updated = ChangeCounter.objects.filter(pk=COUNTER_PK).update(seq=F('seq') + 1)
+    if not updated:
+        # Counter row missing (e.g. a database flushed after migrating)
+        ChangeCounter.objects.get_or_create(pk=COUNTER_PK)
+        ChangeCounter.objects.filter(pk=COUNTER_PK).update(seq=F('seq') + 1)
+    return ChangeCounter.objects.values_list('seq', flat=True).get(pk=COUNTER_PK)
+
+
+def current() -> ChangeCounter:
+    """The counter as committed right now (last seq handed out, purge point)."""
+    return ChangeCounter.objects.filter(pk=COUNTER_PK).first() or ChangeCounter(pk=COUNTER_PK)
+
+
+def record_deletions(agent_ids, seq=None) -> int:
+    """
+    Writes tombstones for agent_ids (any iterable, consumed in chunks), all
+    under one sequence number. Call inside the transaction that deletes them.
+    Returns the number of tombstones written.
+    """
+    if seq is None:
+        seq = next_seq()
+    count = 0
+    batch = []
+    for agent_id in agent_ids:
+        batch.append(AgentTombstone(agent_id=agent_id, seq=seq))
+        if len(batch) >= CHUNK_SIZE:
+            AgentTombstone.objects.bulk_create(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        AgentTombstone.objects.bulk_create(batch)
+        count += len(batch)
+    return count
+
+
+def delete_agents(queryset, progress=None) -> int:
+    """
+    Deletes the agents of queryset, leaving a tombstone for each.
+    Returns the number of agents deleted.
+
+    With progress (a jobs.Progress), deletes CHUNK_SIZE agents per transaction
+    and reports after each commit, invalidating the agents cache as it goes: a
+    heartbeat written inside one long transaction would stay invisible to the
+    other workers' fail_stale().
+    """
+    if progress is None:
+        with transaction.atomic():
+            record_deletions(queryset.values_list('id', flat=True).iterator(chunk_size=CHUNK_SIZE))
+            count, _ = queryset.delete()
+        return count
+
+    count = 0
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.order_by('pk').values_list('id', flat=True)[:CHUNK_SIZE])
+            if not ids:
+                break
+            record_deletions(ids)
+            deleted, _ = Agent.objects.filter(pk__in=ids).delete()
+            invalidate_agents()
+        count += deleted
+        progress(count)
+    return count
+
+
+def read_page(since: int, until: int, limit: int = PAGE_SIZE, position=None):
+    """
+    Up to limit changes numbered in (since, until], after position (the last
+    change of the previous page, see encode_position()) when given.
+
+    Returns (changes, has_more); each change is a (seq, kind, key, agent_id)
+    tuple, kind being DELETED (key: tombstone pk) or UPSERTED (key: agent id).
+    """
+    seq, kind, key = position or (since, UPSERTED, None)
+    tombstones, agents = Q(seq__gt=seq), Q(change_seq__gt=seq)
+    if kind == DELETED:
+        tombstones |= Q(seq=seq, pk__gt=key)
+        agents |= Q(change_seq=seq)
+    elif key is not None:
+        agents |= Q(change_seq=seq, id__gt=key)
+
+    deleted = (
+        AgentTombstone.objects.filter(tombstones, seq__lte=until)
+        .order_by('seq', 'pk').values_list('seq', 'pk', 'agent_id')[:limit + 1]
+    )
+    upserted = (
+        Agent.objects.filter(agents, change_seq__lte=until)
+        .order_by('change_seq', 'id').values_list('change_seq', 'id')[:limit + 1]
+    )
+    page = sorted(
+        [(seq, DELETED, pk, agent_id) for seq, pk, agent_id in deleted]
+        + [(seq, UPSERTED, agent_id, agent_id) for seq, agent_id in upserted],
+        key=lambda change: change[:3],
+    )
+    return page[:limit], len(page) > limit
+
+
+def encode_position(change) -> str:
+    """Opaque cursor for the change a page ended with."""
+    seq, kind, key, _ = change
+    payload = json.dumps([seq, kind, str(key)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_position(encoded: str):
+    """(seq, kind, key) from encode_position(). Raises ValueError on a malformed cursor."""
+    try:
+        seq, kind, key = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+        if kind == DELETED:
+            return int(seq), kind, int(key)
+        if kind == UPSERTED:
+            return int(seq), kind, uuid.UUID(key)
+    except (TypeError, ValueError):
+        pass
+    raise ValueError(f'Invalid changes cursor: {encoded!r}')
+
+
+def purge_tombstones() -> int:
+    """
+    Deletes tombstones older than the retention period and moves the purge
+    point up to the newest purged sequence. Returns the number removed.
+    """
+    cutoff = timezone.now() - TOMBSTONE_RETENTION
+    with transaction.atomic():
+        old = AgentTombstone.objects.filter(deleted_at__lt=cutoff)
+        purged_seq = old.aggregate(seq=Max('seq'))['seq']
+        if purged_seq is None:
+            return 0
+        count, _ = AgentTombstone.objects.filter(seq__lte=purged_seq).delete()
+        ChangeCounter.objects.filter(pk=COUNTER_PK, purged_seq__lt=purged_seq).update(purged_seq=purged_seq)
+        # Cached deltas from before the purge point must turn into 410 now
+        invalidate_agents()
+    return count
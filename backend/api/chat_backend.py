@@ -0,0 +1,161 @@
+"""
+Process-wide Groq client for /api/chat/.
+
+The client (and its httpx connection pool) is created once per worker and
+reused, so chat requests skip the TCP/TLS handshake after the first one.
+Every call has explicit connect/read timeouts and a bounded retry budget:
+at most CHAT_MAX_RETRIES retries, with exponential backoff and full jitter,
+and never past CHAT_RETRY_BUDGET seconds in total. A slow or failing
+upstream ties up a gunicorn worker for that long at most (before the first
+token, for streamed replies).
+
+Only transient failures are retried (connection errors, timeouts, 429 and
+5xx); anything else is raised at once. Latency per call is recorded and
+exposed by stats().
+"""
+import random
+import threading
+import time
+from collections import deque
+
+import httpx
+from django.conf import settings
+from groq import (
+    APIConnectionError, DefaultHttpxClient, Groq, InternalServerError, RateLimitError, Timeout,
+)
+
+CONNECT_TIMEOUT = getattr(settings, 'CHAT_CONNECT_TIMEOUT', 3.0)
+READ_TIMEOUT = getattr(settings, 'CHAT_READ_TIMEOUT', 15.0)
+MAX_RETRIES = getattr(settings, 'CHAT_MAX_RETRIES', 2)
+RETRY_BUDGET = getattr(settings, 'CHAT_RETRY_BUDGET', 20.0)  # Seconds, all attempts included
+BACKOFF_BASE = 0.25  # Seconds; doubles on every retry
+POOL_SIZE = getattr(settings, 'CHAT_POOL_SIZE', 10)
+
+RETRYABLE_ERRORS = (APIConnectionError, RateLimitError, InternalServerError)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> Groq:
+    """The shared Groq client, created on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = Groq(
+                    api_key=getattr(settings, 'GROQ_API_KEY', None),
+                    timeout=Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+                    max_retries=0,  # Retries are ours (budgeted, see call_with_retries())
+                    http_client=DefaultHttpxClient(
+                        limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE),
+                    ),
+                )
+    return _client
+
+
+class LatencyStats:
+    """Counters plus a rolling window of call latencies, for percentiles."""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+
+    def record(self, seconds: float, ok: bool, retries: int) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+            self.calls += 1
+            self.retries += retries
+            if not ok:
+                self.errors += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            calls, errors, retries = self.calls, self.errors, self.retries
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+
+        return {
+            'calls': calls,
+            'errors': errors,
+            'retries': retries,
+            'p50_ms': percentile(0.50),
+            'p90_ms': percentile(0.90),
+            'p99_ms': percentile(0.99),
+            'max_ms': round(latencies[-1] * 1000, 1) if latencies else None,
+        }
+
+
+STATS = LatencyStats()
+
+
+def call_with_retries(func):
+    """
+    Calls func(timeout) retrying transient errors within the retry budget;
+    each attempt's timeout is capped by the time left in the budget.
+    Records the total latency (all attempts) of the call.
+    """
+    start = time.monotonic()
+    attempt = 0
+    try:
+        while True:
+            remaining = RETRY_BUDGET - (time.monotonic() - start)
+            try:
+                result = func(Timeout(min(READ_TIMEOUT, remaining), connect=min(CONNECT_TIMEOUT, remaining)))
+            except RETRYABLE_ERRORS:
+                delay = random.uniform(0, BACKOFF_BASE * 2 ** attempt)
+                # Not worth another attempt if it couldn't even get connected in the time left
+                if attempt >= MAX_RETRIES or time.monotonic() - start + delay + CONNECT_TIMEOUT > RETRY_BUDGET:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            STATS.record(time.monotonic() - start, True, attempt)
+            return result
+    except Exception:
+        STATS.record(time.monotonic() - start, False, attempt)
+        raise
+
+
+def complete(messages, model: str, **kwargs) -> str:
+    """Text of a chat completion for messages."""
+    completion = call_with_retries(lambda timeout: get_client().chat.completions.create(
+        messages=messages, model=model, timeout=timeout, **kwargs
+    ))
+    return completion.choices[0].message.content
+
+
+def stream(messages, model: str, **kwargs):
+    """
+    Text deltas of a streamed chat completion, as a generator. Retries only
+    cover opening the stream: once tokens flow, an error ends the generator.
+    """
+    response = call_with_retries(lambda timeout: get_client().chat.completions.create(
+        messages=messages, model=model, stream=True, timeout=timeout, **kwargs
+    ))
+
+    def deltas():
+        with response:
+            for chunk in response:
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                if content:
+                    yield content
+    return deltas()
+
+
+def stats() -> dict:
+    """Latency and error counters of this worker process."""
+    return {
+        **STATS.snapshot(),
+        'connect_timeout': CONNECT_TIMEOUT,
+        'read_timeout': READ_TIMEOUT,
+        'max_retries': MAX_RETRIES,
+        'retry_budget': RETRY_BUDGET,
+    }
@@ -0,0 +1,87 @@
+"""
+Streaming agent exports (XLSX and CSV).
+
+Rows are read with a server-side cursor (QuerySet.iterator) as plain tuples,
+so memory stays flat regardless of how many agents are exported:
+
+- XLSX: an openpyxl write_only workbook spills rows to disk as they come and
+  is saved to a temporary file, which is then streamed in chunks.
+- CSV: each row is encoded and sent as soon as it's read.
+"""
+import csv
+from datetime import date
+
+import openpyxl
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+HEADERS = [
+    'Nombre Completo', 'DNI', 'CUIL', 'Sexo', 'Fecha Nac.',
+    'Fecha Retiro', 'Edad', 'Estado', 'Ley', 'Afiliado',
+    'Ministerio', 'Repartición', 'Localidad', 'Antigüedad', 'Convenio'
+]
+
+FIELDS = (
+    'full_name', 'dni', 'cuil', 'gender', 'birth_date', 'retirement_date', 'status',
+    'law', 'affiliate_status', 'ministry', 'branch', 'location', 'seniority', 'agreement',
+)
+
+CHUNK_SIZE = 2000
+
+
+def iter_rows(queryset, today=None):
+    """Yields one export row (list, in HEADERS order) per agent of the queryset."""
+    today = today or date.today()
+    for (full_name, dni, cuil, gender, birth_date, retirement_date, status,
+         law, affiliate_status, ministry, branch, location, seniority, agreement) in \
+            queryset.values_list(*FIELDS).iterator(chunk_size=CHUNK_SIZE):
+        # Calculate Age
+        age = None
+        if birth_date:
+            age = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+
+        # Format Status
+        status_label = status.get('label') if isinstance(status, dict) else str(status)
+
+        yield [
+            full_name, dni, cuil, gender, birth_date, retirement_date, age, status_label,
+            law, affiliate_status, ministry, branch, location, seniority, agreement,
+        ]
+
+
+def write_xlsx(rows, fileobj) -> int:
+    """
+    Writes rows to fileobj as an XLSX workbook in write-only (streaming) mode.
+    Returns the number of data rows written.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Agentes Filtrados")
+    ws.append(HEADERS)
+    count = 0
+    for row in rows:
+        ws.append(row)
+        count += 1
+    wb.save(fileobj)
+    return count
+
+
+class _Echo:
+    """File-like object whose write() just returns the value, for csv.writer."""
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows, on_complete=None):
+    """
+    Yields CSV lines for HEADERS + rows. on_complete(count) is called once the
+    last row has been produced (i.e. when the client has received everything).
+    """
+    writer = csv.writer(_Echo())
+    # BOM so Excel detects UTF-8 (accents in names/ministries)
+    yield '\ufeff' + writer.writerow(HEADERS)
+    count = 0
+    for row in rows:
+        count += 1
+        yield writer.writerow(['' if v is None else v for v in row])
+    if on_complete is not None:
+        on_complete(count)
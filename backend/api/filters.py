@@ -0,0 +1,58 @@
+"""
+Agent filtering shared by the API views and background jobs.
+
+Filters are read from a plain mapping of query parameters, so the same
+selection can be rebuilt outside of a request (e.g. an export job run by
+`manage.py runworker` from the params stored with the job).
+"""
+from django.db.models import QuerySet
+
+from . import search
+from .models import Agent
+
+# Query param -> Agent field. All of them go through the accent-insensitive
+# search_text index (see api/search.py) instead of icontains over the raw columns.
+FIELD_FILTERS = (
+    ('dni', 'dni'),
+    ('name', 'full_name'),                # Search in full_name
+    ('cuil', 'cuil'),
+    ('affiliate', 'affiliate_status'),
+    ('ministry', 'ministry'),             # Filter by jurisdiction (Col M)
+    ('agreement', 'agreement'),           # Filter by Convention (Col I)
+    ('surname', 'full_name'),             # Alias for name search
+)
+
+# Every param that changes which agents are selected
+FILTER_PARAMS = ('status', 'q') + tuple(param for param, _ in FIELD_FILTERS)
+
+
+def filter_agents(params, queryset: QuerySet = None) -> QuerySet:
+    """
+    Applies the status, field and free-text filters in params to queryset
+    (all agents by default). Ordered by relevance with ?q=, else alphabetically.
+    """
+    if queryset is None:
+        queryset = Agent.objects.all()
+
+    # Status Filter
+    status_param = params.get('status')
+    if status_param:
+        queryset = queryset.filter(status_code=status_param)
+
+    # Specific Field Filters
+    for param, field in FIELD_FILTERS:
+        value = params.get(param)
+        if value:
+            queryset = search.filter_segment(queryset, field, value)
+
+    # Free-text search across all fields, ordered by relevance
+    q = params.get('q')
+    if q and q.strip():
+        return search.search(queryset, q)
+
+    return queryset.order_by('full_name', 'id') # Sort alphabetically by default (id breaks ties for stable pages)
+
+
+def filter_params(params) -> dict:
+    """The filtering subset of a QueryDict, as a plain dict (e.g. to store with a job)."""
+    return {key: params.get(key) for key in FILTER_PARAMS if params.get(key)}
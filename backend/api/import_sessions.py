@@ -0,0 +1,162 @@
+"""
+Resumable chunked imports.
+
+Instead of one all-or-nothing POST of the whole spreadsheet, the client
+opens an ImportSession, sends the rows as numbered chunks and finally
+commits the session:
+
+    POST   /api/imports/                    {"mode": "insert"|"upsert", "total_chunks": N, "filename": ...}
+    PUT    /api/imports/<id>/chunks/<n>/    [rows, same camelCase format as /api/agents/bulk/]
+    GET    /api/imports/<id>/               status + indexes of the chunks already applied
+    POST   /api/imports/<id>/commit/        totals
+
+Each chunk is applied in its own transaction together with its ImportChunk
+record, so a chunk is either fully applied or not at all, and re-sending an
+applied chunk is a no-op that returns the stored result. After a dropped
+connection the client asks which chunks arrived and sends only the rest.
+
+DNIs seen by earlier chunks are tracked per session (ImportSessionDni): a
+DNI repeated anywhere in the file is skipped as a duplicate after its first
+occurrence, in both modes.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import audit, importer
+from .models import ImportChunk, ImportSession, ImportSessionDni
+
+# Rows accepted per chunk
+MAX_CHUNK_ROWS = 5000
+
+# Sessions not touched for this long (abandoned, or committed long ago) are deleted by runworker's housekeeping
+SESSION_TTL = timedelta(hours=getattr(settings, 'IMPORT_SESSION_TTL_HOURS', 48))
+
+
+class SessionClosed(Exception):
+    """The session was already committed."""
+
+
+def add_chunk(session: ImportSession, index: int, rows: list):
+    """
+    Applies chunk number index of the session, unless it was already applied.
+    Returns (chunk, applied_now).
+    """
+    existing = session.chunks.filter(index=index).first()
+    if existing is not None:
+        return existing, False
+
+    try:
+        with transaction.atomic():
+            # Serializes with commit() so no chunk lands in a committed session
+            locked = ImportSession.objects.select_for_update().get(pk=session.pk)
+            if locked.status != 'open':
+                raise SessionClosed()
+            chunk = ImportChunk.objects.create(session=session, index=index, rows=len(rows))
+            chunk.result = apply_rows(session, rows)
+            chunk.save(update_fields=['result'])
+            ImportSession.objects.filter(pk=session.pk).update(updated_at=timezone.now())
+    except IntegrityError:
+        # The same chunk sent twice at once: the other request applied it
+        existing = session.chunks.filter(index=index).first()
+        if existing is None:
+            raise
+        return existing, False
+    return chunk, True
+
+
+def apply_rows(session: ImportSession, rows: list) -> dict:
+    """Writes one chunk's rows, skipping DNIs already seen in the session. Returns the chunk's summary."""
+    user = session.created_by
+    agents = []
+    errors = []
+    for i, agent_data in enumerate(rows):
+        try:
+            agents.append(importer.agent_from_payload(agent_data, user))
+        except Exception as e:
+            errors.append(f"Row {i}: Error preparing data - {str(e)}")
+
+    dnis = {a.dni for a in agents if a.dni and a.dni not in importer.EMPTY_DNI_VALUES}
+    seen = set(ImportSessionDni.objects.filter(session=session, dni__in=dnis).values_list('dni', flat=True))
+
+    fresh = []
+    new_dnis = []
+    repeated = 0
+    for agent in agents:
+        if agent.dni in dnis:
+            if agent.dni in seen:
+                repeated += 1
+                continue
+            seen.add(agent.dni)
+            new_dnis.append(ImportSessionDni(session=session, dni=agent.dni))
+        fresh.append(agent)
+    ImportSessionDni.objects.bulk_create(new_dnis, batch_size=importer.CHUNK_SIZE)
+
+    summary = importer.new_summary(session.mode)
+    summary['skipped'] += repeated
+    importer.write_agents(fresh, summary, session.mode)
+    return {'rows': len(rows), **summary, 'error_count': len(errors), 'errors': errors[:importer.MAX_ERROR_MESSAGES]}
+
+
+def received_chunks(session: ImportSession) -> list:
+    return list(session.chunks.values_list('index', flat=True))
+
+
+def missing_chunks(session: ImportSession) -> list:
+    if session.total_chunks is None:
+        return []
+    received = set(received_chunks(session))
+    return [i for i in range(session.total_chunks) if i not in received]
+
+
+def totals(session: ImportSession) -> dict:
+    """Adds up the results of every applied chunk."""
+    total = {'chunks': 0, 'rows': 0, **importer.new_summary(session.mode), 'error_count': 0, 'errors': []}
+    for index, result in session.chunks.values_list('index', 'result'):
+        total['chunks'] += 1
+        for key, value in result.items():
+            if key == 'changes':
+                for name, count in value.items():
+                    total['changes'][name] = total['changes'].get(name, 0) + count
+            elif key == 'samples':
+                total['samples'].extend(value[:importer.MAX_DIFF_SAMPLES - len(total['samples'])])
+            elif key == 'errors':
+                room = importer.MAX_ERROR_MESSAGES - len(total['errors'])
+                total['errors'].extend(f"Chunk {index}: {e}" for e in value[:room])
+            else:
+                total[key] += value
+    return total
+
+
+def commit(session: ImportSession) -> dict:
+    """
+    Closes the session and returns its totals. Committing twice returns the
+    same totals again.
+    """
+    with transaction.atomic():
+        locked = ImportSession.objects.select_for_update().get(pk=session.pk)
+        if locked.status == 'committed':
+            return locked.result
+        result = totals(locked)
+        result['message'] = importer.summary_message(result)
+        locked.status = 'committed'
+        locked.committed_at = timezone.now()
+        locked.result = result
+        locked.save(update_fields=['status', 'committed_at', 'result', 'updated_at'])
+        # Only needed while chunks can still arrive
+        locked.seen_dnis.all().delete()
+
+        audit.record(
+            'BULK_IMPORT', user=locked.created_by, ip=locked.ip_address,
+            details=f"Session: {locked.pk}. Chunks: {result['chunks']}. Rows: {result['rows']}. {importer.audit_summary(result)} Errors: {result['error_count']}",
+        )
+    session.refresh_from_db()
+    return result
+
+
+def purge_expired() -> int:
+    """Deletes sessions idle for longer than SESSION_TTL. Agents from applied chunks stay imported."""
+    count, _ = ImportSession.objects.filter(updated_at__lt=timezone.now() - SESSION_TTL).delete()
+    return count
@@ -0,0 +1,494 @@
+"""
+Agent ingestion: mapping incoming rows to Agent instances and inserting them
+in fixed-size chunks.
+
+Two sources feed it:
+- JSON rows posted by the dashboard to /api/agents/bulk/ (camelCase keys,
+  already parsed by analyzeData() in static/script.js).
+- Raw .xlsx uploads to /api/agents/import/, parsed here with openpyxl in
+  read_only mode using the same column rules as analyzeData(), one row at a
+  time, so memory stays bounded regardless of file size.
+"""
+import re
+import unicodedata
+from datetime import date, datetime, timedelta
+
+from django.db import transaction
+
+from .caching import invalidate_agents
+from .changes import next_seq
+from .models import Agent
+from .retirement import compute_status
+
+CHUNK_SIZE = 1000
+
+# Only the first error messages are kept (the count is always exact)
+MAX_ERROR_MESSAGES = 100
+
+RETIREMENT_AGE_FEMALE = 60
+RETIREMENT_AGE_MALE = 65
+
+# Placeholders the spreadsheets use for "no DNI"
+EMPTY_DNI_VALUES = ('-', '')
+
+# insert: new DNIs only, existing ones are skipped.
+# upsert: existing DNIs are updated, but only when some field actually changed.
+MODES = ('insert', 'upsert')
+
+# Fields that come from the source file: what an upsert compares and rewrites
+SOURCE_FIELDS = (
+    'full_name', 'birth_date', 'gender', 'retirement_date', 'status', 'agreement', 'law',
+    'affiliate_status', 'ministry', 'location', 'branch', 'cuil', 'seniority',
+)
+
+# Changed rows listed in an upsert's diff summary (the per-field counts are always exact)
+MAX_DIFF_SAMPLES = 20
+
+
+# --- JSON rows (bulk endpoint) ---
+
+def normalize_dni(value):
+    if value is None or value == '':
+        return None
+    return str(value).strip()
+
+
+def agent_from_payload(agent_data: dict, user) -> Agent:
+    """Builds an (unsaved) Agent from a camelCase row as sent by the dashboard."""
+    agent = Agent(
+        user=user,
+        full_name=agent_data.get('fullName'),
+        birth_date=agent_data.get('birthDate'),
+        gender=agent_data.get('gender'),
+        retirement_date=agent_data.get('retirementDate'),
+        status=agent_data.get('status'),
+        agreement=agent_data.get('agreement'),
+        law=agent_data.get('law'),
+        affiliate_status=agent_data.get('affiliateStatus'),
+        ministry=agent_data.get('ministry'),
+        location=agent_data.get('location'),
+        branch=agent_data.get('branch'),
+        cuil=agent_data.get('cuil'),
+        dni=normalize_dni(agent_data.get('dni')),
+        seniority=agent_data.get('seniority')
+    )
+    # Python types (dates, str) so values compare equal to what's stored; bad dates fail here, per row
+    for name in SOURCE_FIELDS:
+        setattr(agent, name, Agent._meta.get_field(name).to_python(getattr(agent, name)))
+    return agent
+
+
+def new_summary(mode='insert') -> dict:
+    """Counters accumulated chunk by chunk by insert_agents() / upsert_agents()."""
+    summary = {'created': 0, 'skipped': 0}
+    if mode == 'upsert':
+        summary.update(updated=0, unchanged=0, changes={}, samples=[])
+    return summary
+
+
+def insert_agents(agents, summary) -> None:
+    """
+    Inserts a chunk of unsaved agents with one bulk_create, skipping DNI
+    placeholders and DNIs that already exist (in the database or earlier in
+    the chunk).
+    """
+    incoming_dnis = {a.dni for a in agents if a.dni}
+    existing_dnis = set(Agent.objects.filter(dni__in=incoming_dnis).values_list('dni', flat=True))
+
+    new_agents = []
+    for agent in agents:
+        if agent.dni in EMPTY_DNI_VALUES or (agent.dni and agent.dni in existing_dnis):
+            summary['skipped'] += 1
+            continue
+        if agent.dni:
+            existing_dnis.add(agent.dni)
+        # bulk_create() skips save(): fill id/search_text/status_code here
+        agent.populate_derived_fields()
+        new_agents.append(agent)
+
+    if new_agents:
+        with transaction.atomic():
+            seq = next_seq()
+            for agent in new_agents:
+                agent.change_seq = seq
+            Agent.objects.bulk_create(new_agents, batch_size=CHUNK_SIZE)
+            invalidate_agents()
+    summary['created'] += len(new_agents)
+
+
+def upsert_agents(agents, summary) -> None:
+    """
+    Inserts new DNIs and updates existing ones in a single
+    INSERT ... ON CONFLICT (dni) DO UPDATE, sending only the rows that are new
+    or differ from the stored values: unchanged rows cost one read, no write.
+    A DNI repeated within the chunk keeps its last occurrence.
+    """
+    by_dni = {}
+    no_dni = []
+    for agent in agents:
+        if agent.dni in EMPTY_DNI_VALUES:
+            summary['skipped'] += 1
+        elif agent.dni is None:
+            no_dni.append(agent)
+        else:
+            if agent.dni in by_dni:
+                summary['skipped'] += 1
+            by_dni[agent.dni] = agent
+
+    stored = {
+        row['dni']: row
+        for row in Agent.objects.filter(dni__in=by_dni.keys()).values('dni', *SOURCE_FIELDS)
+    }
+
+    to_write = list(no_dni)
+    created = len(no_dni)
+    for dni, agent in by_dni.items():
+        current = stored.get(dni)
+        if current is None:
+            created += 1
+            to_write.append(agent)
+            continue
+        changed = {
+            name: (current[name], getattr(agent, name))
+            for name in SOURCE_FIELDS if current[name] != getattr(agent, name)
+        }
+        if not changed:
+            summary['unchanged'] += 1
+            continue
+        summary['updated'] += 1
+        for name in changed:
+            summary['changes'][name] = summary['changes'].get(name, 0) + 1
+        if len(summary['samples']) < MAX_DIFF_SAMPLES:
+            summary['samples'].append({
+                'dni': dni,
+                'changes': {name: [_plain(old), _plain(new)] for name, (old, new) in changed.items()},
+            })
+        to_write.append(agent)
+
+    if to_write:
+        for agent in to_write:
+            # bulk_create() skips save(): fill id/search_text/status_code here.
+            # On conflict the stored id is kept (it's not in update_fields).
+            agent.populate_derived_fields()
+        with transaction.atomic():
+            seq = next_seq()
+            for agent in to_write:
+                agent.change_seq = seq
+            Agent.objects.bulk_create(
+                to_write, batch_size=CHUNK_SIZE,
+                update_conflicts=True, unique_fields=['dni'],
+                update_fields=list(SOURCE_FIELDS + Agent.DERIVED_FIELDS + Agent.TRACKING_FIELDS),
+            )
+            invalidate_agents()
+    summary['created'] += created
+
+
+def _plain(value):
+    """JSON-safe copy of a field value for the diff summary (it may be stored in a Job result)."""
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def summary_message(result: dict) -> str:
+    """User-facing summary of an import result."""
+    msg = f"Importación finalizada. Creados: {result['created']}."
+    if 'updated' in result:
+        msg += f" Actualizados: {result['updated']}. Sin cambios: {result['unchanged']}."
+    return msg + f" Duplicados omitidos: {result['skipped']}."
+
+
+def audit_summary(result: dict) -> str:
+    """Counts of an import result for the SecurityLog details."""
+    details = f"Created: {result['created']}."
+    if 'updated' in result:
+        details += f" Updated: {result['updated']}. Unchanged: {result['unchanged']}."
+    return details + f" Skipped: {result['skipped']}."
+
+
+def write_agents(agents, summary, mode='insert') -> None:
+    if mode == 'upsert':
+        upsert_agents(agents, summary)
+    else:
+        insert_agents(agents, summary)
+
+
+def import_payload(agents_data, user, chunk_size=CHUNK_SIZE, progress=None, mode='insert') -> dict:
+    """
+    Imports a list of camelCase rows chunk by chunk. Each chunk is one DNI
+    lookup plus one bulk_create. progress(rows_read) is called after every chunk.
+    """
+    summary = new_summary(mode)
+    errors = []
+
+    for start in range(0, len(agents_data), chunk_size):
+        chunk = []
+        for index, agent_data in enumerate(agents_data[start:start + chunk_size], start=start):
+            try:
+                # Prepare agent instance (no save() yet)
+                chunk.append(agent_from_payload(agent_data, user))
+            except Exception as e:
+                errors.append(f"Row {index}: Error preparing data - {str(e)}")
+
+        write_agents(chunk, summary, mode)
+        if progress is not None:
+            progress(min(start + chunk_size, len(agents_data)))
+
+    return {'rows': len(agents_data), **summary, 'errors': errors}
+
+
+# --- XLSX uploads (import endpoint) ---
+# Column rules mirror analyzeData() in static/script.js.
+
+# Columns fixed by user specification (0-based): C=DNI, E=Ley, H=Afiliado, L/M=Jurisdicción
+IDX_DNI = 2
+IDX_LEY = 4
+IDX_AFILIADO = 7
+IDX_JURIS_CODE = 11
+IDX_JURIS_NAME = 12
+
+HEADER_KEYS = {
+    'name': ['Nombre', 'Nombres', 'Name'],
+    'surname': ['Apellido', 'Apellidos', 'Surname'],
+    'full_name': ['Nombre Completo', 'Agente'],
+    'gender': ['Genero', 'Género', 'Sexo', 'Sex', 'Gender'],
+    'birth': ['Fecha Nacimiento', 'Fecha de Nacimiento', 'F. Nac', 'Nacimiento', 'Birth Date'],
+    'age': ['Edad', 'Age', 'Años'],
+    'seniority': ['Antig Total Años'],
+    'cuil': ['CUIL', 'Cuil', 'C.U.I.L.'],
+    'agreement': ['Convenio', 'Agreement'],
+    'location_desc': ['Unnamed: 15', 'Ubicacion Descripcion'],
+    'location_code': ['Ubicacion', 'Location', 'U1'],
+    'branch_code': ['Rama', 'Branch', 'RamCod'],
+    'branch_desc': ['Unnamed: 21', 'Rama Descripcion'],
+}
+
+_DIGITS = re.compile(r'^\d+$')
+_DNI_DIGITS = re.compile(r'^\d{7,8}$')
+
+
+def normalize_header(value) -> str:
+    text = unicodedata.normalize('NFD', str(value).lower().strip())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def detect_columns(header_row) -> dict:
+    """Maps each logical column to its index in the header row (-1 when absent)."""
+    headers = [normalize_header(h) if h is not None else '' for h in header_row]
+    columns = {}
+    for key, candidates in HEADER_KEYS.items():
+        columns[key] = -1
+        for candidate in candidates:
+            normalized = normalize_header(candidate)
+            if normalized in headers:
+                columns[key] = headers.index(normalized)
+                break
+    return columns
+
+
+def _cell(row, index):
+    if index < 0 or index >= len(row):
+        return None
+    return row[index]
+
+
+def _text(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def capitalize(value: str) -> str:
+    return re.sub(r'\b\w', lambda m: m.group(0).upper(), value.lower())
+
+
+def parse_birth_date(raw, age_raw, today):
+    if raw not in (None, ''):
+        if isinstance(raw, datetime):
+            return raw.date()
+        if isinstance(raw, date):
+            return raw
+        if isinstance(raw, (int, float)):
+            # Excel serial date
+            return (datetime(1899, 12, 30) + timedelta(days=raw)).date()
+        text = str(raw).strip()
+        try:
+            if '/' in text:
+                day, month, year = text.split('/')
+                return date(int(year), int(month), int(day))
+            return date.fromisoformat(text[:10])
+        except ValueError:
+            return None
+    if age_raw not in (None, ''):
+        try:
+            age = int(float(age_raw))
+        except (TypeError, ValueError):
+            return None
+        return add_years(today, -age)
+    return None
+
+
+def add_years(day, years):
+    try:
+        return day.replace(year=day.year + years)
+    except ValueError:
+        # Feb 29 -> Mar 1, as JavaScript's setFullYear does
+        return day.replace(year=day.year + years, month=3, day=1)
+
+
+def parse_row(row, columns, today) -> dict:
+    """Maps one spreadsheet row to Agent field values."""
+    # --- Name & Surname ---
+    name = _cell(row, columns['name']) or ''
+    surname = _cell(row, columns['surname']) or ''
+    if not name and not surname:
+        name = _cell(row, columns['full_name']) or 'Desconocido'
+    full_name = f"{capitalize(_text(surname))} {capitalize(_text(name))}".strip()
+
+    # --- Gender ---
+    gender_raw = _text(_cell(row, columns['gender']) or 'M').upper()
+    gender = gender_raw[0] if gender_raw[:1] in ('F', 'M') else 'M'
+
+    # --- DNI (Col C), falling back to neighbours if shifted ---
+    dni = _cell(row, IDX_DNI)
+    if not dni or dni == '-':
+        if _DIGITS.match(_text(_cell(row, 3))):
+            dni = _cell(row, 3)
+        elif _DIGITS.match(_text(_cell(row, 1))):
+            dni = _cell(row, 1)
+        elif _DNI_DIGITS.match(_text(_cell(row, 4))):
+            dni = _cell(row, 4)
+        else:
+            dni = '-'
+    dni = _text(dni).replace('.', '') if dni != '-' else '-'
+
+    # --- Ley (Col E), Afiliado (Col H) ---
+    law = _text(_cell(row, IDX_LEY))
+    affiliate_status = _text(_cell(row, IDX_AFILIADO))
+
+    # --- Jurisdicción (Col L + M, or M+1 if shifted) ---
+    juris_code = _text(_cell(row, IDX_JURIS_CODE))
+    juris_name = _text(_cell(row, IDX_JURIS_NAME))
+    if (not juris_name or juris_name == '-') and _cell(row, 13):
+        juris_name = _text(_cell(row, 13))
+    ministry = ''
+    if juris_code or juris_name:
+        ministry = f"{juris_code} - {juris_name}".strip()
+        if ministry == '-':
+            ministry = ''
+
+    agreement = _text(_cell(row, columns['agreement']))
+    location = _text(_cell(row, columns['location_desc']) or _cell(row, columns['location_code']))
+
+    branch_code = _text(_cell(row, columns['branch_code']))
+    branch_desc = _text(_cell(row, columns['branch_desc']))
+    branch = f"{branch_code} - {branch_desc}" if branch_code and branch_desc else (branch_desc or branch_code)
+
+    # --- CUIL (also infers gender when the Gender column is missing) ---
+    cuil = _text(_cell(row, columns['cuil']))
+    if cuil.startswith('27'):
+        gender = 'F'
+    elif cuil.startswith('20'):
+        gender = 'M'
+
+    seniority = _text(_cell(row, columns['seniority'])) or '-'
+
+    # --- Dates & status (server-side, see api/retirement.py) ---
+    birth_date = parse_birth_date(_cell(row, columns['birth']), _cell(row, columns['age']), today)
+    retirement_date = None
+    status = {'code': 'lejos', 'label': ''}
+    if birth_date:
+        retirement_age = RETIREMENT_AGE_FEMALE if gender == 'F' else RETIREMENT_AGE_MALE
+        retirement_date = add_years(birth_date, retirement_age)
+        status = compute_status(retirement_date, today)
+
+    return {
+        'full_name': full_name,
+        'birth_date': birth_date,
+        'gender': gender,
+        'retirement_date': retirement_date,
+        'status': status,
+        'agreement': agreement,
+        'law': law,
+        'affiliate_status': affiliate_status,
+        'ministry': ministry,
+        'location': location,
+        'branch': branch,
+        'cuil': cuil,
+        'dni': dni,
+        'seniority': seniority,
+    }
+
+
+def iter_workbook_rows(fileobj, today=None):
+    """
+    Streams parsed rows from the first sheet of an .xlsx file (read_only mode).
+    Yields (row_number, values) where values is a dict of Agent fields, or an Exception.
+    """
+    import openpyxl
+
+    today = today or date.today()
+    wb = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = detect_columns(header)
+        for row_number, row in enumerate(rows, start=2):
+            if not row or all(v is None or v == '' for v in row):
+                continue
+            try:
+                yield row_number, parse_row(row, columns, today)
+            except Exception as e:
+                yield row_number, e
+    finally:
+        wb.close()
+
+
+def count_rows(fileobj):
+    """
+    Data rows of the first sheet according to its stored dimensions (None if the
+    file doesn't declare them). Only an estimate, used for progress reporting.
+    """
+    import openpyxl
+
+    wb = openpyxl.load_workbook(fileobj, read_only=True)
+    try:
+        max_row = wb.worksheets[0].max_row
+    finally:
+        wb.close()
+        fileobj.seek(0)
+    return max(max_row - 1, 0) if max_row else None
+
+
+def import_workbook(fileobj, user, chunk_size=CHUNK_SIZE, progress=None, mode='insert') -> dict:
+    """
+    Imports an .xlsx file chunk by chunk. Each chunk is one bulk_create in its
+    own transaction. progress(rows_read) is called after every chunk.
+    """
+    summary = new_summary(mode)
+    rows_read = error_count = 0
+    errors = []
+    chunk = []
+
+    def flush():
+        if chunk:
+            write_agents(chunk, summary, mode)
+            chunk.clear()
+        if progress is not None:
+            progress(rows_read)
+
+    for row_number, values in iter_workbook_rows(fileobj):
+        rows_read += 1
+        if isinstance(values, Exception):
+            error_count += 1
+            if len(errors) < MAX_ERROR_MESSAGES:
+                errors.append(f"Row {row_number}: Error preparing data - {values}")
+            continue
+        chunk.append(Agent(user=user, **values))
+        if len(chunk) >= chunk_size:
+            flush()
+    flush()
+
+    return {'rows': rows_read, **summary, 'error_count': error_count, 'errors': errors}
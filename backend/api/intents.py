@@ -0,0 +1,184 @@
+"""
+Local fast path for the dashboard assistant (private mode of /api/chat/).
+
+The private prompt only ever turns a message into one of four commands
+(search_dni, filter_jurisdiction, filter_agreement, filter_surname) or a short
+greeting. Most messages are as plain as the prompt's own examples ("Busca al
+20300400", "Busca a Perez", "Mostrame salud"), so parse() recognizes them
+here and returns the same JSON contract the LLM would, without the round-trip:
+
+- A single 7-8 digit number (dots allowed) is a DNI.
+- Ministries and agreements are matched against the values actually stored
+  (vocabulary(), cached per dataset version). "ministerio"/"jurisdicción" and
+  "convenio" force the field.
+- "busca/buscá/encontrá a X", "quién es X" with a short alphabetic X is a surname.
+
+When the message doesn't fit one of these unambiguously, parse() returns None
+and the caller falls back to the LLM.
+"""
+import json
+import re
+import threading
+
+from . import caching
+from .models import Agent
+from .search import normalize_text
+
+GREETINGS = {'hola', 'buenas', 'buen dia', 'buenos dias', 'buenas tardes', 'buenas noches', 'hola pilin'}
+GREETING_REPLY = 'Hola, ¿qué buscás hoy?'
+
+DNI_RE = re.compile(r'\b\d{1,2}\.?\d{3}\.?\d{3}\b')
+NUMBER_RE = re.compile(r'\d')
+
+# Leading verbs; SEARCH_VERBS are the ones that also make a bare name a surname search
+SEARCH_VERBS = r'busca(?:me|r|lo|la)?|encontra(?:me|r|lo|la)?|quien(?:es)? (?:es|son)'
+FILTER_VERBS = r'mostra(?:me|r)?|filtra(?:me|r)?|ver|dame|traeme|quiero ver|lista(?:r)?'
+VERB_RE = re.compile(rf'^(?:por favor )?(?P<verb>{SEARCH_VERBS}|{FILTER_VERBS})\b\s*')
+FILLER_RE = re.compile(r'^(?:(?:a|al|a la|el|la|los|las|de|del|por|en|agentes|gente|personal)\b\s*)+')
+MINISTRY_RE = re.compile(r'^(?:(?:la )?jurisdiccion|(?:el )?ministerio)\b\s*(?:de\b\s*)?')
+AGREEMENT_RE = re.compile(r'^(?:el )?convenio\b\s*(?:de\b\s*)?')
+SURNAME_RE = re.compile(r'^(?:(?:el )?apellido|(?:el )?nombre)\b\s*')
+NAME_RE = re.compile(r'^[a-z]+(?: [a-z]+){0,2}$')
+
+# Command action -> /api/agents/ filter param it stands for
+COMMAND_FILTERS = {
+    'search_dni': 'dni',
+    'filter_jurisdiction': 'ministry',
+    'filter_agreement': 'agreement',
+    'filter_surname': 'surname',
+}
+
+JSON_OBJECT_RE = re.compile(r'\{[\s\S]*\}')
+
+_stats_lock = threading.Lock()
+_stats = {'fast_path': 0, 'fallback': 0}
+
+
+def command(action: str, value: str, reply: str) -> dict:
+    return {'intent': 'command', 'action': action, 'value': value, 'reply': reply}
+
+
+def vocabulary() -> dict:
+    """Normalized distinct ministries and agreements, cached until the next write."""
+    cache = caching.get_cache()
+    key = f'agents:intent_vocabulary:v{caching.dataset_version()}'
+    vocab = cache.get(key)
+    if vocab is None:
+        vocab = {
+            field: sorted({
+                normalize_text(value)
+                for value in Agent.objects.order_by().values_list(field, flat=True).distinct()
+                if value
+            })
+            for field in ('ministry', 'agreement')
+        }
+        cache.set(key, vocab)
+    return vocab
+
+
+def known_in(term: str, values) -> bool:
+    """Whether term appears as whole words inside any of values."""
+    pattern = re.compile(r'(?:^|\W)' + re.escape(term) + r'(?:$|\W)')
+    return any(pattern.search(value) for value in values)
+
+
+def parse(message: str):
+    """The command dict for message, or None when the LLM should decide."""
+    result = _parse(message)
+    with _stats_lock:
+        _stats['fast_path' if result is not None else 'fallback'] += 1
+    return result
+
+
+def _parse(message: str):
+    text = normalize_text(message)
+    text = re.sub(r'[¿?¡!,;:"\']', ' ', text)
+    text = ' '.join(text.rstrip('.').split())
+    if not text:
+        return None
+
+    if text in GREETINGS:
+        return {'intent': 'message', 'reply': GREETING_REPLY}
+
+    # DNI: exactly one 7-8 digit number and no other digits
+    dnis = DNI_RE.findall(text)
+    if dnis:
+        digits = re.sub(r'\D', '', dnis[0])
+        rest = DNI_RE.sub(' ', text, count=1)
+        if len(dnis) == 1 and 7 <= len(digits) <= 8 and not NUMBER_RE.search(rest):
+            return command('search_dni', digits, 'Buscando DNI...')
+        return None
+
+    verb_match = VERB_RE.match(text)
+    verb = verb_match.group('verb') if verb_match else None
+    rest = FILLER_RE.sub('', text[verb_match.end():] if verb_match else text)
+
+    field = None
+    for regex, forced in ((MINISTRY_RE, 'ministry'), (AGREEMENT_RE, 'agreement'), (SURNAME_RE, 'surname')):
+        forced_match = regex.match(rest)
+        if forced_match:
+            field, rest = forced, rest[forced_match.end():]
+            break
+    term = rest.strip()
+    if not term:
+        return None
+    value = term.title()
+
+    if field is None:
+        vocab = vocabulary()
+        in_ministry = known_in(term, vocab['ministry'])
+        in_agreement = known_in(term, vocab['agreement'])
+        if in_ministry and in_agreement:
+            return None  # Ambiguous
+        if in_ministry:
+            field = 'ministry'
+        elif in_agreement:
+            field = 'agreement'
+        elif verb and re.match(SEARCH_VERBS, verb) and NAME_RE.match(term):
+            field = 'surname'
+        else:
+            return None
+
+    if field == 'ministry':
+        return command('filter_jurisdiction', value, f'Filtrando por {value}.')
+    if field == 'agreement':
+        return command('filter_agreement', value, f'Filtrando por convenio {value}.')
+    if not NAME_RE.match(term):
+        return None
+    return command('filter_surname', value, f'Buscando apellido {value}...')
+
+
+def read_command(reply: str):
+    """
+    The command dict inside a private-mode reply (the LLM may wrap the JSON in
+    prose), or None when the reply isn't a command with a known action.
+    """
+    match = JSON_OBJECT_RE.search(reply or '')
+    if not match:
+        return None
+    try:
+        parsed = json.loads(match.group(0))
+    except ValueError:
+        return None
+    if not isinstance(parsed, dict) or parsed.get('intent') != 'command' or parsed.get('action') not in COMMAND_FILTERS:
+        return None
+    if not isinstance(parsed.get('value'), str) or not parsed['value'].strip():
+        return None
+    return parsed
+
+
+def command_filters(parsed: dict) -> dict:
+    """/api/agents/ query params that carry out a command from read_command()."""
+    return {COMMAND_FILTERS[parsed['action']]: parsed['value'].strip()}
+
+
+def stats() -> dict:
+    """Fast-path hit rate of this worker process."""
+    with _stats_lock:
+        fast, fallback = _stats['fast_path'], _stats['fallback']
+    total = fast + fallback
+    return {
+        'fast_path': fast,
+        'fallback': fallback,
+        'hit_rate': round(fast / total, 4) if total else None,
+    }
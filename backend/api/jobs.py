@@ -0,0 +1,243 @@
+"""
+Database-backed background jobs.
+
+Imports, exports and mass deletes can run outside the request: the view
+stores a Job row (plus the uploaded file under JOB_FILES_DIR) and answers
+202 right away, `manage.py runworker` executes it and the client polls
+/api/jobs/<id>/ for progress. The jobs table is the queue, so there is no
+broker to run.
+
+Claiming is safe with several workers: SELECT ... FOR UPDATE SKIP LOCKED
+where the database supports it (PostgreSQL), otherwise a conditional
+UPDATE ... WHERE status = 'queued' that only one worker can win (SQLite).
+"""
+import json
+import logging
+import os
+import time
+import zipfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import audit, exports, filters, importer
+from .changes import delete_agents
+from .models import Agent, Job
+
+logger = logging.getLogger(__name__)
+
+JOB_FILES_DIR = Path(getattr(settings, 'JOB_FILES_DIR', Path(settings.BASE_DIR) / 'jobs'))
+
+# A running job whose heartbeat is older than this is considered lost (worker killed)
+STALE_AFTER = timedelta(seconds=getattr(settings, 'JOB_STALE_SECONDS', 900))
+
+# Finished jobs (and their files) are removed after this long
+RETENTION = timedelta(hours=getattr(settings, 'JOB_RETENTION_HOURS', 24))
+
+# Minimum seconds between two progress writes
+PROGRESS_INTERVAL = 1.0
+
+HANDLERS = {}
+
+
+def handler(kind):
+    """Registers the function that executes jobs of the given kind."""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+# --- Enqueueing (web side) ---
+
+def enqueue(kind, user, params=None, upload=None, payload=None, ip=None) -> Job:
+    """
+    Creates a queued job. upload (an UploadedFile) or payload (JSON-serializable)
+    are written to JOB_FILES_DIR so the worker can read them back.
+    """
+    job = Job(kind=kind, created_by=user, params=params or {}, ip_address=ip)
+    if upload is not None or payload is not None:
+        JOB_FILES_DIR.mkdir(parents=True, exist_ok=True)
+        if upload is not None:
+            path = JOB_FILES_DIR / f'{job.id}-input{Path(upload.name).suffix.lower()}'
+            with open(path, 'wb') as f:
+                for chunk in upload.chunks():
+                    f.write(chunk)
+        else:
+            path = JOB_FILES_DIR / f'{job.id}-input.json'
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f)
+        job.input_file = str(path)
+    job.save()
+    return job
+
+
+# --- Claiming and running (worker side) ---
+
+def claim_next(worker: str):
+    """Marks the oldest queued job as running for this worker and returns it (None if the queue is empty)."""
+    now = timezone.now()
+    claim = {'status': 'running', 'worker': worker, 'started_at': now, 'heartbeat_at': now}
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = Job.objects.select_for_update(skip_locked=True).filter(status='queued').order_by('created_at').first()
+            if job is None:
+                return None
+            Job.objects.filter(pk=job.pk).update(**claim)
+        return Job.objects.get(pk=job.pk)
+
+    while True:
+        pk = Job.objects.filter(status='queued').order_by('created_at').values_list('pk', flat=True).first()
+        if pk is None:
+            return None
+        # Only one worker can flip it from queued; losers just try the next one
+        if Job.objects.filter(pk=pk, status='queued').update(**claim):
+            return Job.objects.get(pk=pk)
+
+
+class Progress:
+    """progress(done, total=None) callback that writes to the job row at most once per PROGRESS_INTERVAL."""
+
+    def __init__(self, job):
+        self.job = job
+        self.last_write = 0.0
+
+    def __call__(self, done, total=None, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_write < PROGRESS_INTERVAL:
+            return
+        self.last_write = now
+        fields = {'progress': done, 'heartbeat_at': timezone.now()}
+        if total is not None:
+            fields['total'] = total
+        Job.objects.filter(pk=self.job.pk).update(**fields)
+
+
+def run(job: Job) -> Job:
+    """Executes a claimed job and records its result or error."""
+    progress = Progress(job)
+    try:
+        func = HANDLERS[job.kind]
+        job.result = func(job, progress)
+        job.status = 'done'
+    except Exception as e:
+        logger.exception('Job %s (%s) failed', job.pk, job.kind)
+        job.status = 'failed'
+        job.error = str(e)
+    finally:
+        remove_file(job.input_file)
+
+    job.refresh_from_db(fields=['progress', 'total'])
+    if job.status == 'done' and job.total is not None:
+        job.progress = job.total
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'progress', 'finished_at'])
+    return job
+
+
+def fail_stale() -> int:
+    """Fails running jobs whose worker stopped reporting (killed or crashed)."""
+    cutoff = timezone.now() - STALE_AFTER
+    return Job.objects.filter(status='running', heartbeat_at__lt=cutoff).update(
+        status='failed', error='El proceso que ejecutaba la tarea se detuvo.', finished_at=timezone.now()
+    )
+
+
+def purge_finished() -> int:
+    """Deletes finished jobs older than RETENTION together with their output files."""
+    old = Job.objects.filter(status__in=('done', 'failed'), finished_at__lt=timezone.now() - RETENTION)
+    for result in old.exclude(result=None).values_list('result', flat=True):
+        remove_file((result or {}).get('file'))
+    count, _ = old.delete()
+    return count
+
+
+def remove_file(path):
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def output_path(job: Job, extension: str) -> Path:
+    JOB_FILES_DIR.mkdir(parents=True, exist_ok=True)
+    return JOB_FILES_DIR / f'{job.id}-output.{extension}'
+
+
+def audit_job(job: Job, action: str, details: str) -> None:
+    audit.record(action, user=job.created_by, ip=job.ip_address, details=details)
+
+
+# --- Handlers ---
+
+@handler('import')
+def run_import(job, progress):
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    with open(job.input_file, 'rb') as f:
+        try:
+            progress(0, importer.count_rows(f), force=True)
+            result = importer.import_workbook(f, job.created_by, progress=progress, mode=job.params.get('mode', 'insert'))
+        except (zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+            raise ValueError(f'No se pudo leer el archivo Excel: {e}')
+    # The sheet's declared size is only an estimate: settle on the real row count
+    progress(result['rows'], result['rows'], force=True)
+    audit_job(job, 'BULK_IMPORT', f"File: {job.params.get('filename')}. Rows: {result['rows']}. {importer.audit_summary(result)} Errors: {result['error_count']}")
+    return {'message': importer.summary_message(result), **result}
+
+
+@handler('bulk')
+def run_bulk(job, progress):
+    with open(job.input_file, encoding='utf-8') as f:
+        agents_data = json.load(f)
+    progress(0, len(agents_data), force=True)
+    result = importer.import_payload(agents_data, job.created_by, progress=progress, mode=job.params.get('mode', 'insert'))
+    audit_job(job, 'BULK_IMPORT', f"{importer.audit_summary(result)} Errors: {len(result['errors'])}")
+    return {'message': importer.summary_message(result), **result}
+
+
+@handler('export')
+def run_export(job, progress):
+    queryset = filters.filter_agents(job.params.get('filters', {}))
+    progress(0, queryset.order_by().count(), force=True)
+
+    def counted(rows):
+        for count, row in enumerate(rows, start=1):
+            if count % exports.CHUNK_SIZE == 0:
+                progress(count)
+            yield row
+
+    rows = counted(exports.iter_rows(queryset))
+    if job.params.get('format') == 'csv':
+        path = output_path(job, 'csv')
+        count = 0
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            def done(n):
+                nonlocal count
+                count = n
+            for line in exports.iter_csv(rows, on_complete=done):
+                f.write(line)
+        filename, content_type = 'agentes_filtrados.csv', 'text/csv; charset=utf-8'
+    else:
+        path = output_path(job, 'xlsx')
+        with open(path, 'wb') as f:
+            count = exports.write_xlsx(rows, f)
+        filename, content_type = 'agentes_filtrados.xlsx', exports.XLSX_CONTENT_TYPE
+
+    audit_job(job, 'EXPORT', f"Exported {count} agents.")
+    return {'count': count, 'file': str(path), 'filename': filename, 'content_type': content_type}
+
+
+@handler('delete_all')
+def run_delete_all(job, progress):
+    queryset = Agent.objects.filter(user=job.created_by)
+    progress(0, queryset.count(), force=True)
+    # In chunks, each committed one refreshing the heartbeat, so fail_stale() leaves a long delete alone
+    count = delete_agents(queryset, progress=progress)
+    audit_job(job, 'DELETE_ALL', f"Deleted {count} agents.")
+    return {'count': count}
@@ -0,0 +1,97 @@
+import gzip
+import json
+import os
+import re
+from collections import defaultdict
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from api.models import SecurityLog
+
+AGE_RE = re.compile(r'^(\d+)([dh]?)$')
+
+FIELDS = ('id', 'timestamp', 'action', 'count', 'user_id', 'user__username', 'ip_address', 'details')
+
+
+def parse_age(value: str) -> timedelta:
+    """'90d', '36h' or a bare number of days."""
+    match = AGE_RE.match(value.strip().lower())
+    if not match:
+        raise CommandError(f'Invalid --older-than {value!r}: use e.g. 90d or 36h.')
+    amount, unit = int(match.group(1)), match.group(2) or 'd'
+    return timedelta(hours=amount) if unit == 'h' else timedelta(days=amount)
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves SecurityLog rows older than --older-than to gzipped JSONL files, one per day '
+        '(<dir>/YYYY/MM/security_logs-YYYY-MM-DD.jsonl.gz), then deletes them in small batches. '
+        'Each batch is written and synced before it is deleted; a run that stops halfway '
+        'can simply be repeated (rows carry their id, so repeats can be told apart).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', default='90d', help='Age of the rows to archive, e.g. 90d or 36h.')
+        parser.add_argument(
+            '--dir', default=getattr(settings, 'SECURITY_LOG_ARCHIVE_DIR', str(Path(settings.BASE_DIR) / 'archive' / 'security_logs')),
+            help='Archive directory.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows written and deleted per batch.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be archived.')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - parse_age(options['older_than'])
+        old = SecurityLog.objects.filter(timestamp__lt=cutoff)
+
+        if options['dry_run']:
+            days = old.order_by().annotate(day=TruncDate('timestamp')).values('day').annotate(rows=Count('id')).order_by('day')
+            total = 0
+            for day in days:
+                self.stdout.write(f"{day['day']}: {day['rows']}")
+                total += day['rows']
+            self.stdout.write(f'{total} rows older than {cutoff:%Y-%m-%d %H:%M} would be archived.')
+            return
+
+        directory = Path(options['dir'])
+        batch_size = max(1, options['batch_size'])
+        total = 0
+        last_pk = 0
+        while True:
+            # Keyset batches: each one is a short index range scan plus a short DELETE
+            batch = list(
+                old.filter(pk__gt=last_pk).order_by('pk').values(*FIELDS)[:batch_size].iterator()
+            )
+            if not batch:
+                break
+            self.write_batch(directory, batch)
+            last_pk = batch[-1]['id']
+            SecurityLog.objects.filter(pk__in=[row['id'] for row in batch]).delete()
+            total += len(batch)
+            self.stdout.write(f'Archived {total} rows...')
+
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} rows older than {cutoff:%Y-%m-%d %H:%M} to {directory}.'))
+
+    def write_batch(self, directory: Path, batch) -> None:
+        """Appends the rows to their day's file and syncs it to disk."""
+        by_day = defaultdict(list)
+        for row in batch:
+            row['username'] = row.pop('user__username')
+            by_day[row['timestamp'].date()].append(row)
+
+        for day, rows in by_day.items():
+            path = directory / f'{day:%Y}' / f'{day:%m}' / f'security_logs-{day:%Y-%m-%d}.jsonl.gz'
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Each append is a new gzip member; gzip readers concatenate them
+            with open(path, 'ab') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='ab') as f:
+                    for row in rows:
+                        f.write(json.dumps(row, default=str, ensure_ascii=False).encode('utf-8'))
+                        f.write(b'\n')
+                raw.flush()
+                os.fsync(raw.fileno())
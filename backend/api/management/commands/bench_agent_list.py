@@ -0,0 +1,80 @@
+import gc
+import time
+import uuid
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Agent, User
+from api.serializers import AgentSerializer, AgentRowEncoder
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks one large page of the agent list: AgentSerializer over model instances '
+        '(the previous path) vs raw values + AgentRowEncoder, both rendered to JSON. '
+        'Synthetic agents are created inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help='Page size to benchmark.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per path (best time is reported).')
+        parser.add_argument('--fields', default='', help='Optional ?fields= value for the fast path.')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        encoder = AgentRowEncoder(AgentRowEncoder.parse_fields(options['fields']))
+        renderer = JSONRenderer()
+
+        with transaction.atomic():
+            missing = rows - Agent.objects.count()
+            if missing > 0:
+                self.seed(missing)
+            queryset = Agent.objects.order_by('full_name', 'id')
+
+            def serializer_path():
+                page = list(queryset.select_related('user')[:rows])
+                return renderer.render(AgentSerializer(page, many=True).data)
+
+            def encoder_path():
+                page = list(encoder.queryset(queryset)[:rows])
+                return renderer.render(encoder.encode(page))
+
+            if not options['fields'] and serializer_path() != encoder_path():
+                self.stderr.write(self.style.ERROR('Outputs differ!'))
+
+            slow = self.best_of(serializer_path, options['repeat'])
+            fast = self.best_of(encoder_path, options['repeat'])
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'Rows per page:        {rows}')
+        self.stdout.write(f'AgentSerializer:      {slow * 1000:8.1f} ms  ({rows / slow:,.0f} rows/s)')
+        self.stdout.write(f'AgentRowEncoder:      {fast * 1000:8.1f} ms  ({rows / fast:,.0f} rows/s)')
+        self.stdout.write(self.style.SUCCESS(f'Speedup: {slow / fast:.1f}x'))
+
+    def best_of(self, func, repeat):
+        best = None
+        for _ in range(max(1, repeat)):
+            gc.collect()
+            start = time.process_time()
+            func()
+            elapsed = time.process_time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def seed(self, count):
+        user, _ = User.objects.get_or_create(username='bench_agent_list')
+        agents = []
+        for i in range(count):
+            agent = Agent(
+                user=user, full_name=f'Agente Bench {i:07d}', birth_date=date(1960 + i % 40, 1 + i % 12, 1 + i % 28),
+                gender='F' if i % 2 else 'M', retirement_date=date(2025 + i % 40, 1 + i % 12, 1 + i % 28),
+                status={'code': 'lejos', 'label': 'Lejos'}, agreement='Convenio', law='Ley 1', affiliate_status='Activo',
+                ministry='01 - Ministerio', location='Capital', branch='Rama', cuil=f'20-{i:08d}-1',
+                dni=f'B{uuid.uuid4().hex[:12]}', seniority='10',
+            )
+            agent.populate_derived_fields()
+            agents.append(agent)
+        Agent.objects.bulk_create(agents, batch_size=2000)
@@ -0,0 +1,69 @@
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from api.throttling import CacheThrottleStore, SQLiteThrottleStore
+
+
+# Set before forking: stores hold connections and can't be pickled to the workers
+_store = None
+
+
+def run_worker(args):
+    """Hits one key from a separate process; returns (allowed, sorted latencies)."""
+    hits, limit = args
+    store = _store
+    allowed = 0
+    latencies = []
+    for _ in range(hits):
+        start = time.perf_counter()
+        ok, _wait = store.hit('bench', limit, 3600)
+        latencies.append(time.perf_counter() - start)
+        allowed += ok
+    return allowed, sorted(latencies)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the shared throttle store (api/throttling.py) with several processes '
+        'hitting the same key at once: latency per check and whether exactly --limit '
+        'requests got through. The SQLite store runs on a temporary file.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent processes.')
+        parser.add_argument('--hits', type=int, default=2000, help='Checks per process.')
+        parser.add_argument('--limit', type=int, default=1000, help='Requests allowed per window.')
+        parser.add_argument('--cache', metavar='ALIAS', help='Benchmark the cache store on this CACHES alias instead.')
+
+    def handle(self, *args, **options):
+        global _store
+        workers, hits, limit = options['workers'], options['hits'], options['limit']
+        with tempfile.TemporaryDirectory() as tmp:
+            if options['cache']:
+                _store = CacheThrottleStore(options['cache'])
+            else:
+                _store = SQLiteThrottleStore(Path(tmp) / 'throttle.sqlite3')
+
+            # fork: workers inherit Django's configured settings
+            context = multiprocessing.get_context('fork')
+            start = time.perf_counter()
+            with context.Pool(workers) as pool:
+                results = pool.map(run_worker, [(hits, limit)] * workers)
+            elapsed = time.perf_counter() - start
+
+        allowed = sum(count for count, _ in results)
+        latencies = sorted(latency for _, worker_latencies in results for latency in worker_latencies)
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+        total = workers * hits
+        self.stdout.write(f'{type(_store).__name__}: {workers} processes x {hits} checks in {elapsed:.2f}s ({total / elapsed:,.0f} checks/s)')
+        self.stdout.write(f'Latency p50 {percentile(0.5):.3f} ms, p90 {percentile(0.9):.3f} ms, p99 {percentile(0.99):.3f} ms')
+        expected = min(limit, total)
+        style = self.style.SUCCESS if allowed == expected else self.style.ERROR
+        self.stdout.write(style(f'Allowed {allowed} of {total} (expected {expected}).'))
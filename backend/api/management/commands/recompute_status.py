@@ -0,0 +1,91 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from api.caching import invalidate_agents
+from api.changes import next_seq
+from api.models import Agent, StatusRecomputeRun
+from api.retirement import compute_status, crossing_windows
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes Agent.status from retirement_date. By default only re-examines agents '
+        'whose retirement date crossed a bucket threshold since the last run (plus agents '
+        'added or edited since then); use --full to scan every agent.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Re-examine every agent with a retirement date.')
+        parser.add_argument('--as-of', help='Reference date (YYYY-MM-DD). Defaults to today.')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per read chunk and per bulk_update.')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing.')
+
+    def handle(self, *args, **options):
+        try:
+            as_of = date.fromisoformat(options['as_of']) if options['as_of'] else timezone.localdate()
+        except ValueError:
+            raise CommandError('--as-of must be a date in YYYY-MM-DD format.')
+        batch_size = max(1, options['batch_size'])
+        dry_run = options['dry_run']
+
+        last_run = StatusRecomputeRun.objects.filter(finished_at__isnull=False).first()
+        full = options['full'] or last_run is None or as_of < last_run.as_of
+
+        queryset = Agent.objects.filter(retirement_date__isnull=False)
+        if full:
+            self.stdout.write(f'Full recompute as of {as_of}.')
+        else:
+            self.stdout.write(f'Incremental recompute from {last_run.as_of} to {as_of}.')
+            crossed = Q()
+            for start, end in crossing_windows(last_run.as_of, as_of):
+                crossed |= Q(retirement_date__gte=start, retirement_date__lt=end)
+            # Agents imported or edited since the last run carry whatever status the client computed
+            changed = Q(created_at__gte=last_run.started_at) | Q(updated_at__gte=last_run.started_at)
+            queryset = queryset.filter(crossed | changed)
+
+        run = None
+        if not dry_run:
+            run = StatusRecomputeRun.objects.create(as_of=as_of, full=full)
+
+        examined = 0
+        updated = 0
+        pending = []
+
+        def flush():
+            nonlocal updated
+            if pending and not dry_run:
+                with transaction.atomic():
+                    # bulk_update() skips save(): stamp the change tracking fields here
+                    seq, now = next_seq(), timezone.now()
+                    for agent in pending:
+                        agent.change_seq, agent.updated_at = seq, now
+                    Agent.objects.bulk_update(pending, ['status', 'status_code', *Agent.TRACKING_FIELDS], batch_size=batch_size)
+                    invalidate_agents()
+            updated += len(pending)
+            pending.clear()
+
+        rows = queryset.only('id', 'retirement_date', 'status', 'status_code').order_by('pk')
+        for agent in rows.iterator(chunk_size=batch_size):
+            examined += 1
+            new_status = compute_status(agent.retirement_date, as_of)
+            if new_status['code'] == agent.status_code:
+                continue
+            agent.status = new_status
+            agent.status_code = new_status['code']
+            pending.append(agent)
+            if len(pending) >= batch_size:
+                flush()
+        flush()
+
+        if run is not None:
+            run.examined = examined
+            run.updated = updated
+            run.finished_at = timezone.now()
+            run.save(update_fields=['examined', 'updated', 'finished_at'])
+
+        verb = 'Would update' if dry_run else 'Updated'
+        self.stdout.write(self.style.SUCCESS(f'Examined {examined} agents. {verb} {updated}.'))
@@ -0,0 +1,62 @@
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api import changes, import_sessions, jobs, outbox
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs queued background jobs (imports, exports, mass deletes) from the jobs table '
+        'and sends the email outbox. '
+        'Several workers can run at once; each job is claimed by exactly one of them.'
+    )
+
+    # Seconds between housekeeping passes (lost jobs, expired files, import sessions and tombstones)
+    HOUSEKEEPING_INTERVAL = 60
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the jobs currently queued, then exit.')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when the queue is empty.')
+
+    def handle(self, *args, **options):
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = False
+        # Finish the current job before exiting on SIGTERM/SIGINT (deploys, Ctrl+C)
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.stdout.write(f'Worker {worker} started.')
+        last_housekeeping = 0.0
+        while not self.stopping:
+            close_old_connections()
+            if time.monotonic() - last_housekeeping >= self.HOUSEKEEPING_INTERVAL:
+                jobs.fail_stale()
+                jobs.purge_finished()
+                import_sessions.purge_expired()
+                changes.purge_tombstones()
+                last_housekeeping = time.monotonic()
+
+            # Queued emails (account activation...) go out between jobs
+            outbox.dispatch()
+
+            job = jobs.claim_next(worker)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            self.stdout.write(f'Running job {job.pk} ({job.kind})...')
+            job = jobs.run(job)
+            style = self.style.SUCCESS if job.status == 'done' else self.style.ERROR
+            self.stdout.write(style(f'Job {job.pk} {job.status}.'))
+
+        self.stdout.write(f'Worker {worker} stopped.')
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,44 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api import outbox
+
+
+class Command(BaseCommand):
+    help = (
+        'Sends queued emails (account activation...) from the outbox table in batches, '
+        'retrying failures with backoff. Several dispatchers can run at once.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Send the emails currently due, then exit.')
+        parser.add_argument('--batch-size', type=int, default=outbox.BATCH_SIZE, help='Emails sent per connection.')
+        parser.add_argument('--sleep', type=float, default=5.0, help='Seconds to wait when nothing is due.')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        if options['once']:
+            counts = outbox.dispatch_all(batch_size)
+            self.stdout.write(f"Sent {counts['sent']}, retrying {counts['retried']}, dead {counts['dead']}.")
+            return
+
+        self.stopping = False
+        # Finish the current batch before exiting on SIGTERM/SIGINT
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.stdout.write('Outbox dispatcher started.')
+        while not self.stopping:
+            close_old_connections()
+            counts = outbox.dispatch(batch_size)
+            if any(counts.values()):
+                self.stdout.write(f"Sent {counts['sent']}, retrying {counts['retried']}, dead {counts['dead']}.")
+            else:
+                time.sleep(options['sleep'])
+        self.stdout.write('Outbox dispatcher stopped.')
+
+    def stop(self, signum, frame):
+        self.stopping = True
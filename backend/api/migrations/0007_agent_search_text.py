@@ -0,0 +1,80 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:00
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The index is (re)installed after every migrate too (see apps.py): it always follows api.search
+from api.search import drop_search_index, install_search_index
+
+# Frozen copy of api.search.build_search_text as of this migration
+SEGMENT_SEP = '|'
+SEGMENTS = ('full_name', 'dni', 'cuil', 'ministry', 'agreement', 'affiliate_status')
+NUMERIC_SEGMENTS = {'dni', 'cuil'}
+
+
+def normalize_segment(field, value):
+    if value is None:
+        return ''
+    text = unicodedata.normalize('NFKD', str(value))
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    text = ' '.join(text.casefold().replace(SEGMENT_SEP, ' ').split())
+    if field in NUMERIC_SEGMENTS:
+        text = re.sub(r'[\s.\-/]', '', text)
+    return text
+
+
+def build_search_text(agent):
+    return SEGMENT_SEP.join(normalize_segment(f, getattr(agent, f, None)) for f in SEGMENTS)
+
+
+def backfill_search_text(apps, schema_editor):
+    Agent = apps.get_model('api', 'Agent')
+    batch = []
+    for agent in Agent.objects.all().iterator(chunk_size=2000):
+        agent.search_text = build_search_text(agent)
+        batch.append(agent)
+        if len(batch) >= 2000:
+            Agent.objects.bulk_update(batch, ['search_text'])
+            batch = []
+    if batch:
+        Agent.objects.bulk_update(batch, ['search_text'])
+
+
+def create_search_index(apps, schema_editor):
+    install_search_index(schema_editor.connection)
+
+
+def remove_search_index(apps, schema_editor):
+    drop_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_securitylog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agent',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(backfill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, remove_search_index),
+        migrations.CreateModel(
+            name='AgentSearchIndex',
+            fields=[
+                ('agent', models.OneToOneField(db_column='agent_id', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='fts', serialize=False, to='api.agent')),
+                ('search_text', models.TextField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'api_agent_fts',
+                'managed': False,
+            },
+        ),
+    ]
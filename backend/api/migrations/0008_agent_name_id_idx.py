@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-17 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_agent_search_text'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agent',
+            index=models.Index(fields=['full_name', 'id'], name='agent_name_id_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.4 on 2026-10-17 16:00
+
+import json
+
+from django.db import migrations, models
+
+
+def status_code_from(status):
+    """Frozen copy of api.retirement.status_code_from as of this migration."""
+    if isinstance(status, dict):
+        return str(status.get('code') or '')
+    if not status:
+        return ''
+    if isinstance(status, str):
+        try:
+            parsed = json.loads(status)
+        except ValueError:
+            return status.strip()
+        if isinstance(parsed, dict):
+            return str(parsed.get('code') or '')
+        return str(parsed)
+    return str(status)
+
+
+def backfill_status_code(apps, schema_editor):
+    Agent = apps.get_model('api', 'Agent')
+    batch = []
+    for agent in Agent.objects.only('id', 'status').iterator(chunk_size=2000):
+        agent.status_code = status_code_from(agent.status)
+        batch.append(agent)
+        if len(batch) >= 2000:
+            Agent.objects.bulk_update(batch, ['status_code'])
+            batch = []
+    if batch:
+        Agent.objects.bulk_update(batch, ['status_code'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_agent_name_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agent',
+            name='status_code',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=20),
+        ),
+        migrations.RunPython(backfill_status_code, migrations.RunPython.noop),
+    ]
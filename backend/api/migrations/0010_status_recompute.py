@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-17 16:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_agent_status_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusRecomputeRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateField()),
+                ('full', models.BooleanField(default=False)),
+                ('examined', models.PositiveIntegerField(default=0)),
+                ('updated', models.PositiveIntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-as_of', '-started_at'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='agent',
+            name='retirement_date',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.4 on 2026-10-17 16:14
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_status_recompute'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('import', 'Importación Excel'), ('bulk', 'Importación Masiva'), ('export', 'Exportación'), ('delete_all', 'Eliminación Masiva')], max_length=20)),
+                ('status', models.CharField(choices=[('queued', 'En cola'), ('running', 'En curso'), ('done', 'Finalizado'), ('failed', 'Fallido')], default='queued', max_length=10)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('input_file', models.CharField(blank=True, default='', max_length=500)),
+                ('progress', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(blank=True, null=True)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('worker', models.CharField(blank=True, default='', max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='job_queue_idx')],
+            },
+        ),
+    ]
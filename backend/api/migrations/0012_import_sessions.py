@@ -0,0 +1,61 @@
+# Generated by Django 5.1.4 on 2026-10-17 16:21
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('mode', models.CharField(choices=[('insert', 'Insertar'), ('upsert', 'Insertar y actualizar')], default='insert', max_length=10)),
+                ('status', models.CharField(choices=[('open', 'Abierta'), ('committed', 'Confirmada')], default='open', max_length=10)),
+                ('filename', models.CharField(blank=True, default='', max_length=255)),
+                ('total_chunks', models.PositiveIntegerField(blank=True, null=True)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('committed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField()),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('result', models.JSONField(default=dict)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='api.importsession')),
+            ],
+            options={
+                'ordering': ['index'],
+                'constraints': [models.UniqueConstraint(fields=('session', 'index'), name='import_chunk_session_index_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportSessionDni',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dni', models.CharField(max_length=20)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seen_dnis', to='api.importsession')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('session', 'dni'), name='import_session_dni_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.1.4 on 2026-10-17 17:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def seed_counter(apps, schema_editor):
+    # Existing agents count as change 1, so a client syncing from since=0 receives them
+    Agent = apps.get_model('api', 'Agent')
+    ChangeCounter = apps.get_model('api', 'ChangeCounter')
+    seq = 1 if Agent.objects.update(change_seq=1) else 0
+    ChangeCounter.objects.update_or_create(pk=1, defaults={'seq': seq})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_import_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agent',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='agent',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='ChangeCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.BigIntegerField(default=0)),
+                ('purged_seq', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AgentTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('agent_id', models.UUIDField()),
+                ('seq', models.BigIntegerField(db_index=True)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'ordering': ['seq'],
+            },
+        ),
+        migrations.RunPython(seed_counter, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.4 on 2026-10-17 18:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_change_tracking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('to', models.EmailField(max_length=254)),
+                ('from_email', models.CharField(blank=True, default='', max_length=255)),
+                ('subject', models.CharField(max_length=255)),
+                ('body', models.TextField()),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('sent', 'Enviado'), ('dead', 'Descartado')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx')],
+            },
+        ),
+    ]
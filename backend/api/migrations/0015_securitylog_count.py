@@ -0,0 +1,24 @@
+# Generated by Django 5.1.4 on 2026-10-17 19:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_outbound_email'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='securitylog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='securitylog',
+            name='count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
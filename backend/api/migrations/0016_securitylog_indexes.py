@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-17 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_securitylog_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='securitylog',
+            index=models.Index(fields=['-timestamp'], name='securitylog_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='securitylog',
+            index=models.Index(fields=['action', '-timestamp'], name='securitylog_action_ts_idx'),
+        ),
+    ]
@@ -1,5 +1,9 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
+from .search import FTSMatch
 
 class User(AbstractUser):
     ROLE_CHOICES = (
@@ -18,7 +22,7 @@ class Agent(models.Model):
     full_name = models.CharField(max_length=255, db_index=True)
     birth_date = models.DateField(null=True, blank=True)
     gender = models.CharField(max_length=10)
-    retirement_date = models.DateField(null=True, blank=True)
+    retirement_date = models.DateField(null=True, blank=True, db_index=True) # Indexed for the incremental status recompute
     status = models.JSONField(default=dict) # Stores {code: '...', label: '...'}
     agreement = models.CharField(max_length=255, blank=True, null=True)
     law = models.CharField(max_length=255, blank=True, null=True)
@@ -30,12 +34,217 @@ class Agent(models.Model):
     dni = models.CharField(max_length=20, blank=True, null=True, db_index=True, unique=True)       # DNI
     seniority = models.CharField(max_length=50, blank=True, null=True) # Antiguedad
     created_at = models.DateTimeField(auto_now_add=True)
+    # Accent-folded copy of the searchable fields (see api/search.py). Never edit by hand.
+    search_text = models.TextField(blank=True, default='', editable=False)
+    # Copy of status['code'], indexed for filtering and GROUP BY stats. Never edit by hand.
+    status_code = models.CharField(max_length=20, blank=True, default='', db_index=True, editable=False)
 
-    def save(self, *args, **kwargs):
+    # Change tracking for /api/agents/changes/ (see api/changes.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    change_seq = models.BigIntegerField(default=0, db_index=True, editable=False)
+
+    # Fields computed by populate_derived_fields()
+    DERIVED_FIELDS = ('search_text', 'status_code')
+    # Fields every write must refresh, besides the changed ones
+    TRACKING_FIELDS = ('updated_at', 'change_seq')
+
+    class Meta:
+        indexes = [
+            # Keyset pagination seeks on (full_name, id), see api/pagination.py
+            models.Index(fields=['full_name', 'id'], name='agent_name_id_idx'),
+        ]
+
+    def populate_derived_fields(self):
+        """
+        Fills the fields computed from the others (id, search_text, status_code).
+        bulk_create() skips save(), so bulk paths must call this explicitly.
+        """
         if not self.id:
             import uuid
             self.id = uuid.uuid4()
-        super().save(*args, **kwargs)
+        from .search import build_search_text
+        from .retirement import status_code_from
+        self.search_text = build_search_text(self)
+        self.status_code = status_code_from(self.status)
+
+    def save(self, *args, **kwargs):
+        self.populate_derived_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | set(self.DERIVED_FIELDS) | set(self.TRACKING_FIELDS)
+        from .changes import next_seq
+        with transaction.atomic():
+            self.change_seq = next_seq()
+            super().save(*args, **kwargs)
+        from .caching import invalidate_agents
+        invalidate_agents()
+
+    def delete(self, *args, **kwargs):
+        from .changes import record_deletions
+        with transaction.atomic():
+            record_deletions([self.pk])
+            result = super().delete(*args, **kwargs)
+        from .caching import invalidate_agents
+        invalidate_agents()
+        return result
+
+class AgentSearchIndex(models.Model):
+    """
+    Read-only mapping of the SQLite FTS5 shadow table (api/search.py).
+    The table only exists on SQLite; it is filled by triggers, never through the ORM.
+    """
+    agent = models.OneToOneField(Agent, primary_key=True, db_column='agent_id', on_delete=models.DO_NOTHING, related_name='fts', db_constraint=False)
+    search_text = models.TextField()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'api_agent_fts'
+
+AgentSearchIndex._meta.get_field('search_text').register_lookup(FTSMatch)
+
+class ChangeCounter(models.Model):
+    """
+    Single row (pk=1) holding the last agent change sequence number handed out,
+    and the sequence up to which tombstones have been purged. See api/changes.py.
+    """
+    seq = models.BigIntegerField(default=0)
+    purged_seq = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"seq {self.seq} (purged through {self.purged_seq})"
+
+class AgentTombstone(models.Model):
+    """A deleted agent, kept so delta sync clients (/api/agents/changes/) learn about the deletion."""
+    agent_id = models.UUIDField()
+    seq = models.BigIntegerField(db_index=True)
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['seq']
+
+    def __str__(self):
+        return f"{self.agent_id} - deleted at seq {self.seq}"
+
+class StatusRecomputeRun(models.Model):
+    """
+    One execution of the recompute_status command. The last finished run's
+    as_of date is where the next incremental run picks up.
+    """
+    as_of = models.DateField()
+    full = models.BooleanField(default=False)
+    examined = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-as_of', '-started_at']
+
+    def __str__(self):
+        return f"{self.as_of} - {'full' if self.full else 'incremental'} - {self.updated}/{self.examined}"
+
+class Job(models.Model):
+    """
+    Background job (import, export, mass delete) executed by `manage.py runworker`.
+    The table itself is the queue, see api/jobs.py.
+    """
+    KIND_CHOICES = (
+        ('import', 'Importación Excel'),
+        ('bulk', 'Importación Masiva'),
+        ('export', 'Exportación'),
+        ('delete_all', 'Eliminación Masiva'),
+    )
+    STATUS_CHOICES = (
+        ('queued', 'En cola'),
+        ('running', 'En curso'),
+        ('done', 'Finalizado'),
+        ('failed', 'Fallido'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    params = models.JSONField(default=dict, blank=True)      # Filters, format, original file name...
+    input_file = models.CharField(max_length=500, blank=True, default='')  # Uploaded file / payload, under JOB_FILES_DIR
+    progress = models.PositiveIntegerField(default=0)        # Rows processed so far
+    total = models.PositiveIntegerField(null=True, blank=True)  # Rows expected, when known up front
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Workers claim the oldest queued job
+            models.Index(fields=['status', 'created_at'], name='job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.created_at} - {self.kind} - {self.status}"
+
+class ImportSession(models.Model):
+    """
+    Resumable import: rows arrive as numbered chunks (ImportChunk), each one
+    committed on its own, and the session is closed with a final commit call.
+    See api/import_sessions.py.
+    """
+    MODE_CHOICES = (
+        ('insert', 'Insertar'),
+        ('upsert', 'Insertar y actualizar'),
+    )
+    STATUS_CHOICES = (
+        ('open', 'Abierta'),
+        ('committed', 'Confirmada'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES, default='insert')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='open')
+    filename = models.CharField(max_length=255, blank=True, default='')
+    total_chunks = models.PositiveIntegerField(null=True, blank=True)  # Declared by the client, enables the missing-chunks check
+    result = models.JSONField(null=True, blank=True)                   # Totals, filled on commit
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='import_sessions')
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    committed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.created_at} - {self.mode} - {self.status}"
+
+class ImportChunk(models.Model):
+    """One applied chunk of an ImportSession. Its (session, index) uniqueness is what makes re-sends no-ops."""
+    session = models.ForeignKey(ImportSession, on_delete=models.CASCADE, related_name='chunks')
+    index = models.PositiveIntegerField()
+    rows = models.PositiveIntegerField(default=0)
+    result = models.JSONField(default=dict)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['index']
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'index'], name='import_chunk_session_index_uniq'),
+        ]
+
+class ImportSessionDni(models.Model):
+    """DNIs already seen by an open ImportSession (deleted on commit)."""
+    session = models.ForeignKey(ImportSession, on_delete=models.CASCADE, related_name='seen_dnis')
+    dni = models.CharField(max_length=20)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'dni'], name='import_session_dni_uniq'),
+        ]
 
 class SecurityLog(models.Model):
     ACTION_CHOICES = (
@@ -51,11 +260,53 @@ class SecurityLog(models.Model):
     action = models.CharField(max_length=50, choices=ACTION_CHOICES)
     details = models.TextField(blank=True, null=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens, not when the buffered row is written (api/audit.py)
+    timestamp = models.DateTimeField(default=timezone.now)
+    # Identical events merged into this row (repeated failed logins)
+    count = models.PositiveIntegerField(default=1)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Admin changelist (newest first), its action filter and archive_security_logs
+            models.Index(fields=['-timestamp'], name='securitylog_ts_idx'),
+            models.Index(fields=['action', '-timestamp'], name='securitylog_action_ts_idx'),
+        ]
 
     def __str__(self):
         username = self.user.username if self.user else 'Anon'
         return f"{self.timestamp} - {username} - {self.action}"
+
+class OutboundEmail(models.Model):
+    """
+    Transactional email outbox: rows are written in the same transaction as
+    whatever triggers them and sent later by `manage.py send_outbox` (or the
+    runworker loop). See api/outbox.py.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pendiente'),
+        ('sent', 'Enviado'),
+        ('dead', 'Descartado'),
+    )
+
+    to = models.EmailField()
+    from_email = models.CharField(max_length=255, blank=True, default='')
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    # Due time of the next attempt; also leases a row to the dispatcher that claimed it
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Dispatchers claim due pending rows
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.created_at} - {self.to} - {self.status}"
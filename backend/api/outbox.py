@@ -0,0 +1,121 @@
+"""
+Transactional email outbox.
+
+Requests don't talk to the email provider. enqueue() writes an OutboundEmail
+row inside the caller's transaction (so an email exists if and only if what
+triggered it was committed), and dispatch() sends due rows later, from
+`manage.py send_outbox` or the runworker loop:
+
+- Rows are claimed in batches by pushing next_attempt_at past a lease, so
+  several dispatchers never send the same email twice at once; a dispatcher
+  that dies mid-batch leaves its rows to be retried when the lease expires.
+- A batch is sent over one backend connection (EmailBackend.open()).
+- Failures are retried with exponential backoff and jitter; after
+  OUTBOX_MAX_ATTEMPTS the row is marked 'dead' and kept for inspection.
+
+Any Django email backend works, including locmem in tests.
+"""
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'OUTBOX_BATCH_SIZE', 50)
+MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+BACKOFF_BASE = timedelta(seconds=getattr(settings, 'OUTBOX_BACKOFF_SECONDS', 30))
+BACKOFF_MAX = timedelta(hours=6)
+# How long a claimed batch is reserved for the dispatcher sending it
+LEASE = timedelta(minutes=5)
+
+
+def enqueue(to: str, subject: str, body: str, from_email: str = '') -> OutboundEmail:
+    """Queues one email. Call it inside the transaction of the change that triggers it."""
+    return OutboundEmail.objects.create(to=to, subject=subject, body=body, from_email=from_email)
+
+
+def claim_batch(limit: int = BATCH_SIZE) -> list:
+    """Leases up to limit due pending emails to this dispatcher and returns them."""
+    now = timezone.now()
+    due = OutboundEmail.objects.filter(status='pending', next_attempt_at__lte=now).order_by('next_attempt_at')
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            batch = list(due.select_for_update(skip_locked=True)[:limit])
+            OutboundEmail.objects.filter(pk__in=[e.pk for e in batch]).update(next_attempt_at=now + LEASE)
+        return batch
+
+    batch = []
+    for email in due[:limit]:
+        # Only one dispatcher can move the due time it read; losers skip the row
+        if OutboundEmail.objects.filter(pk=email.pk, next_attempt_at=email.next_attempt_at).update(next_attempt_at=now + LEASE):
+            batch.append(email)
+    return batch
+
+
+def backoff(attempts: int) -> timedelta:
+    """Delay before retry number attempts: exponential with full jitter, capped."""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def dispatch(limit: int = BATCH_SIZE) -> dict:
+    """Sends one batch of due emails. Returns the counts of sent, retried and dead rows."""
+    batch = claim_batch(limit)
+    counts = {'sent': 0, 'retried': 0, 'dead': 0}
+    if not batch:
+        return counts
+
+    backend = get_connection(fail_silently=False)
+    try:
+        backend.open()
+    except Exception as e:
+        # Provider unreachable: the batch stays leased and is retried when the lease expires
+        logger.warning('Outbox could not open the email connection: %s', e)
+        return counts
+    try:
+        for email in batch:
+            message = EmailMessage(
+                subject=email.subject, body=email.body, to=[email.to],
+                from_email=email.from_email or settings.DEFAULT_FROM_EMAIL, connection=backend,
+            )
+            try:
+                message.send()
+            except Exception as e:
+                logger.warning('Outbox email %s to %s failed: %s', email.pk, email.to, e)
+                email.attempts += 1
+                email.last_error = str(e)
+                if email.attempts >= MAX_ATTEMPTS:
+                    email.status = 'dead'
+                    counts['dead'] += 1
+                else:
+                    email.next_attempt_at = timezone.now() + backoff(email.attempts)
+                    counts['retried'] += 1
+                email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+                continue
+            email.attempts += 1
+            email.status = 'sent'
+            email.sent_at = timezone.now()
+            email.save(update_fields=['attempts', 'status', 'sent_at'])
+            counts['sent'] += 1
+    finally:
+        backend.close()
+    return counts
+
+
+def dispatch_all(limit: int = BATCH_SIZE) -> dict:
+    """Sends batches until no email is due. Returns the summed counts."""
+    totals = {'sent': 0, 'retried': 0, 'dead': 0}
+    while True:
+        counts = dispatch(limit)
+        for key, value in counts.items():
+            totals[key] += value
+        if not any(counts.values()):
+            return totals
@@ -0,0 +1,176 @@
+"""
+Pagination for /api/agents/.
+
+Two modes share the same response shape ({count, next, previous, results}):
+
+- Page numbers (default): DRF's PageNumberPagination, honouring the
+  PAGE_SIZE_QUERY_PARAM / MAX_PAGE_SIZE keys of settings.REST_FRAMEWORK.
+- Keyset (opt-in with ?pagination=cursor): seeks on (full_name, id) with an
+  opaque cursor, so page N costs the same as page 1 and there's no COUNT(*)
+  unless the client asks for it with ?total=exact or ?total=estimate.
+"""
+import base64
+import hashlib
+import json
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from . import caching
+
+REST_SETTINGS = getattr(settings, 'REST_FRAMEWORK', {})
+
+
+
+class AgentPageNumberPagination(PageNumberPagination):
+    page_size_query_param = REST_SETTINGS.get('PAGE_SIZE_QUERY_PARAM', 'page_size')
+    max_page_size = REST_SETTINGS.get('MAX_PAGE_SIZE')
+
+
+class AgentCursorPagination(BasePagination):
+    """
+    Keyset pagination over ORDER BY full_name, id.
+
+    The cursor encodes the (full_name, id) of the boundary row and the
+    direction; the next page is fetched with a seek predicate backed by the
+    (full_name, id) index instead of OFFSET.
+    """
+    cursor_query_param = 'cursor'
+    total_query_param = 'total'
+    page_size = REST_SETTINGS.get('PAGE_SIZE', 100)
+    page_size_query_param = REST_SETTINGS.get('PAGE_SIZE_QUERY_PARAM', 'page_size')
+    max_page_size = REST_SETTINGS.get('MAX_PAGE_SIZE')
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        return self.paginate(queryset, request.query_params, request.build_absolute_uri())
+
+    def paginate(self, queryset, params, base_url):
+        """
+        One page of queryset for the query params in params (a QueryDict or
+        plain dict), with links built on base_url. Works without a request,
+        e.g. for the agents a chat command resolves to.
+        """
+        self.base_url = base_url
+        page_size = self.get_page_size(params)
+
+        cursor = self.decode_cursor(params)
+        self.count = self.get_total(queryset, params)
+
+        if cursor is None:
+            reverse = False
+            page = queryset.order_by('full_name', 'id')
+        else:
+            name, pk, reverse = cursor
+            if reverse:
+                page = queryset.filter(Q(full_name__lt=name) | Q(full_name=name, id__lt=pk)).order_by('-full_name', '-id')
+            else:
+                page = queryset.filter(Q(full_name__gt=name) | Q(full_name=name, id__gt=pk)).order_by('full_name', 'id')
+
+        # One extra row tells us whether there is another page in that direction
+        results = list(page[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        self.page = results
+        if reverse:
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        return results
+
+    def get_page_size(self, params):
+        try:
+            size = int(params[self.page_size_query_param])
+            if size > 0:
+                return min(size, self.max_page_size) if self.max_page_size else size
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def get_total(self, queryset, params):
+        """
+        Optional total: 'exact' is a COUNT(*) cached per filter combination and dataset version,
+        'estimate' uses the planner statistics when the table is unfiltered (PostgreSQL).
+        """
+        mode = params.get(self.total_query_param)
+        if mode not in ('exact', 'estimate'):
+            return None
+
+        if mode == 'estimate' and connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] >= 0:
+                return row[0]
+
+        params = sorted(
+            (k, v) for k, v in params.items()
+            if k not in (self.cursor_query_param, self.page_size_query_param, self.total_query_param)
+        )
+        key = f'agents:count:v{caching.dataset_version()}:' + hashlib.sha1(json.dumps(params).encode()).hexdigest()
+        cache = caching.get_cache()
+        total = cache.get(key)
+        if total is None:
+            total = queryset.order_by().count()
+            cache.set(key, total)
+        return total
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        name, pk = self.row_key(self.page[-1])
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(name, pk, False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        name, pk = self.row_key(self.page[0])
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(name, pk, True))
+
+    @staticmethod
+    def row_key(row):
+        """(full_name, id) of a page row: a model instance or a named values_list() row."""
+        return row.full_name, row.id
+
+    def encode_cursor(self, name, pk, reverse):
+        payload = json.dumps({'n': name, 'i': str(pk), 'r': int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, params):
+        encoded = params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            return str(payload['n']), uuid.UUID(payload['i']), bool(payload['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+def wants_cursor_pagination(request) -> bool:
+    """Keyset mode is opt-in and only applies to the default (alphabetical) ordering."""
+    params = request.query_params
+    if params.get('q', '').strip():
+        return False
+    return params.get('pagination') == 'cursor' or AgentCursorPagination.cursor_query_param in params
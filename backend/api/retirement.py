@@ -0,0 +1,76 @@
+"""
+Retirement status helpers.
+
+Agent.status is a JSON object ({code, label}) written by the frontend at
+import time; Agent.status_code is its denormalized, indexed copy, used for
+filtering and aggregation. The status engine below derives the same status
+server-side from retirement_date (see the recompute_status command), so it
+doesn't go stale as days pass.
+"""
+import json
+from datetime import timedelta
+
+STATUS_CODES = ('vencido', 'inminente', 'proximo', 'lejos')
+
+
+def status_code_from(status) -> str:
+    """
+    Extracts the status code from an Agent.status value.
+    Accepts the standard dict, a legacy JSON string, or a bare code string.
+    """
+    if isinstance(status, dict):
+        return str(status.get('code') or '')
+    if not status:
+        return ''
+    if isinstance(status, str):
+        try:
+            parsed = json.loads(status)
+        except ValueError:
+            return status.strip()
+        if isinstance(parsed, dict):
+            return str(parsed.get('code') or '')
+        return str(parsed)
+    return str(status)
+
+
+# --- Status engine ---
+# Mirrors getRetirementStatus() in static/script.js: the bucket depends only on
+# how many days are left until retirement_date.
+
+STATUS_LABELS = {
+    'vencido': 'VENCIDO',
+    'inminente': 'INMINENTE (< 6 meses)',
+    'proximo': 'PRÓXIMO (< 1 año)',
+    'lejos': 'LEJOS',
+}
+
+# Upper bound (days left, exclusive) of each bucket, in order.
+BUCKET_THRESHOLDS = (
+    ('vencido', 0),
+    ('inminente', 180),
+    ('proximo', 365),
+)
+
+
+def compute_status_code(retirement_date, today) -> str:
+    days_left = (retirement_date - today).days
+    for code, limit in BUCKET_THRESHOLDS:
+        if days_left < limit:
+            return code
+    return 'lejos'
+
+
+def compute_status(retirement_date, today) -> dict:
+    """Returns the {code, label} status for a retirement date as of ``today``."""
+    code = compute_status_code(retirement_date, today)
+    return {'code': code, 'label': STATUS_LABELS[code]}
+
+
+def crossing_windows(since, today):
+    """
+    Date ranges [start, end) of retirement dates whose bucket changed between
+    ``since`` and ``today``. An agent moves bucket exactly when
+    retirement_date - day crosses a threshold, i.e. when
+    since + limit <= retirement_date < today + limit for some limit.
+    """
+    return [(since + timedelta(days=limit), today + timedelta(days=limit)) for _, limit in BUCKET_THRESHOLDS]
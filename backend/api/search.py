@@ -0,0 +1,239 @@
+"""
+Accent-insensitive search over the agent roster.
+
+Every agent carries a denormalized ``search_text`` column: the searchable
+fields folded to lowercase ASCII and joined with ``SEGMENT_SEP`` in a fixed
+order (see ``SEGMENTS``). The column is indexed per backend:
+
+- PostgreSQL: a pg_trgm GIN index, which serves ``LIKE '%...%'`` patterns.
+- SQLite: an FTS5 shadow table (``api_agent_fts``) with the trigram
+  tokenizer, kept in sync by triggers. It serves ranked ``MATCH`` queries
+  and ``GLOB '*...*'`` patterns, both as substring matches.
+
+Both backends match substrings, so ``?q=300400`` finds DNI 20300400 on
+either. Field filters (``?name=``, ``?dni=``...) match inside a single
+segment by anchoring the pattern on the separators, so they stay on the
+index instead of running ``icontains`` over the raw columns.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import F, Field, Lookup, QuerySet
+
+SEGMENT_SEP = '|'
+
+# Order matters: it defines the segment positions inside search_text.
+SEGMENTS = ('full_name', 'dni', 'cuil', 'ministry', 'agreement', 'affiliate_status')
+
+# Identifiers are matched without punctuation ("20.300.400" == "20300400").
+NUMERIC_SEGMENTS = {'dni', 'cuil'}
+
+FTS_TABLE = 'api_agent_fts'
+
+# Trigram MATCH and GLOB need at least this many characters to use the index.
+# Shorter terms GLOB the base column: SQLite 3.40 segfaults when a GLOB the FTS5
+# table can't serve shares a query with MATCH ... ORDER BY rank.
+MIN_MATCH_LENGTH = 3
+
+_LIKE_ESCAPE = str.maketrans({'\\': '\\\\', '%': '\\%', '_': '\\_'})
+# GLOB has no ESCAPE clause (and LIKE ... ESCAPE skips the FTS5 index): one-character classes instead
+_GLOB_ESCAPE = str.maketrans({'*': '[*]', '?': '[?]', '[': '[[]'})
+
+
+@Field.register_lookup
+class Like(Lookup):
+    """Raw ``LIKE`` with a caller-built pattern (wildcards are not escaped)."""
+    lookup_name = 'like'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} LIKE {rhs} ESCAPE '\\'", lhs_params + rhs_params
+
+
+@Field.register_lookup
+class Glob(Lookup):
+    """Raw ``GLOB`` with a caller-built pattern (case-sensitive; search_text is already folded)."""
+    lookup_name = 'glob'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} GLOB {rhs}", lhs_params + rhs_params
+
+
+class FTSMatch(Lookup):
+    """FTS5 full-text match; only registered on AgentSearchIndex.search_text."""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", lhs_params + rhs_params
+
+
+def normalize_text(value) -> str:
+    """
+    Folds a value for comparison: strips accents, casefolds and collapses
+    whitespace. The segment separator is removed so values can't span segments.
+    """
+    if value is None:
+        return ''
+    text = unicodedata.normalize('NFKD', str(value))
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    text = text.casefold().replace(SEGMENT_SEP, ' ')
+    return ' '.join(text.split())
+
+
+def normalize_segment(field: str, value) -> str:
+    text = normalize_text(value)
+    if field in NUMERIC_SEGMENTS:
+        text = re.sub(r'[\s.\-/]', '', text)
+    return text
+
+
+def build_search_text(agent) -> str:
+    """Builds the search_text value for an Agent instance (or any object with the same attributes)."""
+    return SEGMENT_SEP.join(normalize_segment(f, getattr(agent, f, None)) for f in SEGMENTS)
+
+
+def filter_segment(queryset: QuerySet, field: str, value: str) -> QuerySet:
+    """
+    Filters agents whose ``field`` contains ``value`` (accent/case-insensitive).
+
+    The pattern requires exactly ``index`` separators before the match and the
+    remaining ones after it, which pins the match to that field's segment.
+    """
+    term = normalize_segment(field, value)
+    if not term:
+        return queryset
+    index = SEGMENTS.index(field)
+    after = len(SEGMENTS) - 1 - index
+
+    if connection.vendor == 'sqlite' and _fts_available():
+        pattern = '*' + (SEGMENT_SEP + '*') * index + term.translate(_GLOB_ESCAPE) + '*' + (SEGMENT_SEP + '*') * after
+        return _glob(queryset, term, pattern)
+
+    pattern = '%' + (SEGMENT_SEP + '%') * index + term.translate(_LIKE_ESCAPE) + '%' + (SEGMENT_SEP + '%') * after
+    return queryset.filter(search_text__like=pattern)
+
+
+def search(queryset: QuerySet, q: str) -> QuerySet:
+    """
+    Free-text search across all segments, ordered by relevance.
+    Every whitespace-separated term must appear somewhere in the agent's search_text.
+    """
+    terms = normalize_text(q).split()
+    if not terms:
+        return queryset
+
+    if connection.vendor == 'sqlite' and _fts_available():
+        # Joins the FTS5 shadow table, so SQLite drives the query from the index.
+        for term in terms:
+            if len(term) < MIN_MATCH_LENGTH:
+                queryset = _glob(queryset, term, '*' + term.translate(_GLOB_ESCAPE) + '*')
+        long_terms = [t for t in terms if len(t) >= MIN_MATCH_LENGTH]
+        if not long_terms:
+            return queryset.order_by('full_name', 'id')
+        # Quoted trigram phrases: each term matches as a substring, like LIKE '%term%'
+        match = ' '.join('"%s"' % t.replace('"', '""') for t in long_terms)
+        return queryset.filter(fts__search_text__match=match).annotate(
+            search_rank=F('fts__rank')  # bm25: lower is better
+        ).order_by('search_rank', 'full_name', 'id')
+
+    for term in terms:
+        queryset = queryset.filter(search_text__contains=term)
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramSimilarity
+        return queryset.annotate(
+            search_rank=TrigramSimilarity('search_text', ' '.join(terms))
+        ).order_by('-search_rank', 'full_name', 'id')
+
+    return queryset.order_by('full_name', 'id')
+
+
+def _glob(queryset: QuerySet, term: str, pattern: str) -> QuerySet:
+    """GLOBs the FTS5 table when term has a trigram to look up, else api_agent.search_text."""
+    if len(term) < MIN_MATCH_LENGTH:
+        return queryset.filter(search_text__glob=pattern)
+    return queryset.filter(fts__search_text__glob=pattern)
+
+
+_fts_checked = None
+
+
+def _fts_available() -> bool:
+    """Older SQLite builds may lack FTS5; install_search_index() skips the shadow table then."""
+    global _fts_checked
+    if _fts_checked is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _fts_checked = cursor.fetchone() is not None
+    return _fts_checked
+
+
+def install_search_index(conn) -> None:
+    """
+    Creates the backend-specific index for search_text. Idempotent.
+
+    On SQLite the sync triggers live on api_agent, and migrations that rebuild
+    that table drop them, so this also runs after every migrate (see apps.py)
+    and resyncs the shadow table if it drifted.
+    """
+    global _fts_checked
+    if conn.vendor == 'postgresql':
+        with conn.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS api_agent_search_trgm '
+                'ON api_agent USING gin (search_text gin_trgm_ops)'
+            )
+    elif conn.vendor == 'sqlite':
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            existing = cursor.fetchone()
+            if existing and 'trigram' not in existing[0]:
+                # Built with word tokens (prefix matches only): rebuilt for substring matches
+                cursor.execute(f'DROP TABLE {FTS_TABLE}')
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                    f"USING fts5(agent_id UNINDEXED, search_text, tokenize='trigram')"
+                )
+            except Exception:
+                # SQLite without FTS5 or older than 3.34 (no trigram tokenizer): search
+                # falls back to LIKE scans. Triggers must not point at a missing table.
+                drop_search_index(conn)
+                return
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS api_agent_fts_ai AFTER INSERT ON api_agent BEGIN '
+                f'INSERT INTO {FTS_TABLE} (agent_id, search_text) VALUES (new.id, new.search_text); END'
+            )
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS api_agent_fts_ad AFTER DELETE ON api_agent BEGIN '
+                f'DELETE FROM {FTS_TABLE} WHERE agent_id = old.id; END'
+            )
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS api_agent_fts_au AFTER UPDATE OF search_text ON api_agent BEGIN '
+                f'UPDATE {FTS_TABLE} SET search_text = new.search_text WHERE agent_id = old.id; END'
+            )
+            cursor.execute(f'SELECT (SELECT COUNT(*) FROM api_agent), (SELECT COUNT(*) FROM {FTS_TABLE})')
+            agents, indexed = cursor.fetchone()
+            if agents != indexed:
+                cursor.execute(f'DELETE FROM {FTS_TABLE}')
+                cursor.execute(f'INSERT INTO {FTS_TABLE} (agent_id, search_text) SELECT id, search_text FROM api_agent')
+        _fts_checked = None
+
+
+def drop_search_index(conn) -> None:
+    global _fts_checked
+    with conn.cursor() as cursor:
+        if conn.vendor == 'postgresql':
+            cursor.execute('DROP INDEX IF EXISTS api_agent_search_trgm')
+        elif conn.vendor == 'sqlite':
+            for trigger in ('api_agent_fts_ai', 'api_agent_fts_ad', 'api_agent_fts_au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    _fts_checked = None
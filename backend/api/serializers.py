@@ -1,7 +1,12 @@
+import json
 from typing import Any, Dict
+
+from django.db.models import TextField
+from django.db.models.functions import Cast
 from rest_framework import serializers
-from .models import User, Agent
+from .models import User, Agent, Job, ImportSession
 from django.contrib.auth.password_validation import validate_password
+from django.urls import reverse
 
 class UserSerializer(serializers.ModelSerializer):
     email = serializers.EmailField(required=True)
@@ -45,3 +50,139 @@ class AgentSerializer(serializers.ModelSerializer):
             'branch', 'cuil', 'dni', 'seniority'
         ]
         read_only_fields = ['user']
+
+def _uuid_text(value):
+    # SQLite stores UUIDs as 32 hex digits; PostgreSQL's uuid::text is already hyphenated
+    return f'{value[:8]}-{value[8:12]}-{value[12:16]}-{value[16:20]}-{value[20:]}' if len(value) == 32 else value
+
+
+def _memoized(convert, limit=1024):
+    """
+    Caches conversions of repeated raw values within one query (e.g. the few
+    distinct status objects). Rows then share the converted object, which is
+    fine for output that is only rendered.
+    """
+    memo = {}
+
+    def cached(value):
+        result = memo.get(value)
+        if result is None:
+            result = convert(value)
+            if len(memo) < limit:
+                memo[value] = result
+        return result
+    return cached
+
+
+# Model field types read as text (Cast in SQL, so neither the database driver nor
+# Django builds Python objects the renderer would only turn back into text),
+# with the conversion the text still needs to match AgentSerializer's output.
+TEXT_COLUMNS = {
+    'UUIDField': _uuid_text,
+    'DateField': None,           # ISO text already
+    'JSONField': json.loads,     # Memoized per query
+}
+
+
+class AgentRowEncoder:
+    """
+    Fast path for the agent list: produces exactly what AgentSerializer would
+    output (same keys, order and JSON types) from values_list() rows, without
+    building model instances or running per-field serializer code.
+
+    fields restricts the output to a subset of AgentSerializer.Meta.fields (?fields=).
+    """
+    FIELDS = tuple(AgentSerializer.Meta.fields)
+
+    def __init__(self, fields=None):
+        self.fields = tuple(fields) if fields else self.FIELDS
+
+    @classmethod
+    def parse_fields(cls, value):
+        """Validates a comma-separated ?fields= value. Returns the field tuple (None when absent)."""
+        if not value:
+            return None
+        fields = tuple(dict.fromkeys(f.strip() for f in value.split(',') if f.strip()))
+        unknown = [f for f in fields if f not in cls.FIELDS]
+        if unknown or not fields:
+            raise serializers.ValidationError({'fields': f"Campos inválidos: {', '.join(unknown) or value}. Disponibles: {', '.join(cls.FIELDS)}."})
+        return fields
+
+    def queryset(self, queryset, extra=()):
+        """
+        queryset as named values_list() rows for rows()/encode(): the requested
+        fields plus any extra columns the caller needs (e.g. pagination keys,
+        read as row.full_name, row.id).
+        """
+        self.columns = tuple(dict.fromkeys(self.fields + tuple(extra)))
+        self.converters = []
+        names, casts = [], {}
+        for name in self.columns:
+            kind = Agent._meta.get_field(name).get_internal_type()
+            if kind in TEXT_COLUMNS and name not in extra:
+                # Aliased: an annotation can't reuse the field's name
+                casts[f'{name}_text'] = Cast(name, TextField())
+                names.append(f'{name}_text')
+                convert = TEXT_COLUMNS[kind]
+                self.converters.append(_memoized(convert) if convert is json.loads else convert)
+            else:
+                names.append(name)
+                self.converters.append(str if kind == 'UUIDField' else None)
+        return queryset.annotate(**casts).values_list(*names, named=True)
+
+    def rows(self, values):
+        """Yields the output dict of each row read through queryset()."""
+        fields, columns = self.fields, self.columns
+        converted = [(i, convert) for i, convert in enumerate(self.converters) if convert is not None]
+        dropped = len(columns) != len(fields)
+        for row in values:
+            row = list(row)
+            for i, convert in converted:
+                value = row[i]
+                if value is not None:
+                    row[i] = convert(value)
+            row = dict(zip(columns, row))
+            yield {name: row[name] for name in fields} if dropped else row
+
+    def encode(self, values) -> list:
+        """Output dicts of rows read through queryset(), without the extra columns."""
+        return list(self.rows(values))
+
+class JobSerializer(serializers.ModelSerializer):
+    result = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'kind', 'status', 'progress', 'total', 'result', 'error',
+            'created_at', 'started_at', 'finished_at', 'download_url'
+        ]
+
+    def get_result(self, job):
+        # The output file path is server-side only; it's served through download_url
+        if not job.result:
+            return job.result
+        return {k: v for k, v in job.result.items() if k != 'file'}
+
+    def get_download_url(self, job):
+        if job.status != 'done' or not (job.result or {}).get('file'):
+            return None
+        url = reverse('job-download', kwargs={'pk': job.pk})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+class ImportSessionSerializer(serializers.ModelSerializer):
+    received_chunks = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImportSession
+        fields = [
+            'id', 'mode', 'status', 'filename', 'total_chunks', 'received_chunks',
+            'result', 'created_at', 'committed_at'
+        ]
+        read_only_fields = ['status', 'result', 'created_at', 'committed_at']
+
+    def get_received_chunks(self, session):
+        # Lets a client resume after a dropped connection by sending only the missing chunks
+        return list(session.chunks.values_list('index', flat=True))
@@ -0,0 +1,157 @@
+"""
+Columnar roster snapshots for dashboard preloading (/api/agents/snapshot/).
+
+The whole roster is laid out as one array per field instead of one object per
+row, and low-cardinality columns are dictionary-encoded:
+
+    {
+      "version": 1718000000000000000,
+      "seq": 42,
+      "count": 2,
+      "fields": ["id", "full_name", "ministry", ...],
+      "columns": {
+        "id": ["…", "…"],
+        "full_name": ["ANA", "JUAN"],
+        "ministry": {"dictionary": ["01 - Salud", "02 - Educación"], "codes": [0, 1]},
+        ...
+      }
+    }
+
+Row i is rebuilt as {field: column[i]} (or dictionary[codes[i]] for encoded
+columns). Values have the same JSON form as in the list endpoint. seq is the
+change sequence the snapshot reflects, to continue with delta sync
+(/api/agents/changes/?since=<seq>).
+
+Snapshots are written once per dataset version (api/caching.py), gzip- and,
+when the optional `brotli` package is installed, brotli-compressed, under
+SNAPSHOT_DIR. Files of older versions are removed when a new one is built;
+never those of newer ones, which other workers may be serving.
+"""
+import gzip
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+from . import changes
+from .models import Agent
+from .serializers import AgentRowEncoder
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip is always available
+    brotli = None
+
+SNAPSHOT_DIR = Path(getattr(settings, 'SNAPSHOT_DIR', Path(settings.BASE_DIR) / 'cache' / 'snapshots'))
+
+FIELDS = tuple(f for f in AgentRowEncoder.FIELDS if f != 'user')
+
+# Columns stored as dictionary + codes
+DICTIONARY_FIELDS = ('gender', 'status', 'agreement', 'law', 'affiliate_status', 'ministry', 'location', 'branch')
+
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+CHUNK_SIZE = 2000
+
+SNAPSHOT_NAME_RE = re.compile(r'^agents-v(\d+)\.')
+
+
+def available_encodings():
+    return [(encoding, suffix) for encoding, suffix in ENCODINGS if encoding != 'br' or brotli is not None]
+
+
+def build(queryset=None) -> dict:
+    """Reads the roster (all agents by default) into the columnar layout."""
+    if queryset is None:
+        queryset = Agent.objects.order_by('full_name', 'id')
+    encoder = AgentRowEncoder(FIELDS)
+
+    columns = {field: [] for field in FIELDS}
+    dictionaries = {field: {} for field in DICTIONARY_FIELDS}
+    count = 0
+    for row in encoder.rows(encoder.queryset(queryset).iterator(chunk_size=CHUNK_SIZE)):
+        count += 1
+        for field in FIELDS:
+            value = row[field]
+            if field in dictionaries:
+                # The status object is keyed by its JSON text
+                key = json.dumps(value, sort_keys=True) if isinstance(value, dict) else value
+                value = dictionaries[field].setdefault(key, (len(dictionaries[field]), value))[0]
+            columns[field].append(value)
+
+    for field, dictionary in dictionaries.items():
+        columns[field] = {
+            'dictionary': [value for _, value in dictionary.values()],
+            'codes': columns[field],
+        }
+    return {'count': count, 'fields': list(FIELDS), 'columns': columns}
+
+
+def snapshot_path(version, suffix: str) -> Path:
+    return SNAPSHOT_DIR / f'agents-v{version}.json{suffix}'
+
+
+def ensure_snapshot(version) -> None:
+    """Writes the compressed snapshot files of version unless they already exist."""
+    if all(snapshot_path(version, suffix).exists() for _, suffix in available_encodings()):
+        return
+
+    # Read first: a delta sync from this seq (/api/agents/changes/) can only repeat changes, never miss one
+    seq = changes.current().seq
+    data = {'version': version, 'seq': seq, **build()}
+    raw = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    for encoding, suffix in available_encodings():
+        body = brotli.compress(raw, quality=9) if encoding == 'br' else gzip.compress(raw, compresslevel=6)
+        # Written aside and renamed, so concurrent readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=SNAPSHOT_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(body)
+        os.replace(tmp, snapshot_path(version, suffix))
+
+    # A worker that built an older version last must not remove a newer one
+    purge(before=version)
+
+
+def purge(before=None) -> int:
+    """
+    Deletes the snapshot files of versions older than before (all of them by
+    default). Returns the number of files removed.
+    """
+    if not SNAPSHOT_DIR.exists():
+        return 0
+    removed = 0
+    for path in SNAPSHOT_DIR.glob('agents-v*'):
+        match = SNAPSHOT_NAME_RE.match(path.name)
+        if match is None or (before is not None and int(match.group(1)) >= int(before)):
+            continue
+        try:
+            path.unlink()
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def iter_decompressed(version, chunk_size=64 * 1024):
+    """Yields the uncompressed JSON of version's snapshot, for clients that accept no encoding."""
+    f = gzip.open(snapshot_path(version, '.gz'), 'rb')  # Opened now: a later purge can't pull it away
+
+    def chunks():
+        with f:
+            yield from iter(lambda: f.read(chunk_size), b'')
+    return chunks()
+
+
+def pick_encoding(accept_encoding: str):
+    """(Content-Encoding, file suffix) to serve for an Accept-Encoding header, or None."""
+    accepted = {part.split(';')[0].strip().lower() for part in (accept_encoding or '').split(',')}
+    for encoding, suffix in available_encodings():
+        if encoding in accepted:
+            return encoding, suffix
+    return None
@@ -0,0 +1,869 @@
+import gzip
+import io
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from datetime import date, timedelta
+from unittest import mock
+
+import groq
+import httpx
+from django.core.management import call_command
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import audit, caching, changes, chat, chat_backend, filters, importer, intents, jobs, outbox, search, snapshots, throttling
+from .management.commands import archive_security_logs
+from .serializers import AgentRowEncoder, AgentSerializer
+from .models import Agent, AgentTombstone, ImportSession, OutboundEmail, SecurityLog, User
+
+
+class APITestCase(TestCase):
+    """
+    Runs each test with its own temporary directory, throttle store and
+    dataset version (so no cached response leaks between tests), and writes
+    audit events at once instead of from the background flusher.
+    """
+
+    def setUp(self):
+        caching.bump_version()
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.patch(throttling, '_store', throttling.SQLiteThrottleStore(self.tmp / 'throttle.sqlite3'))
+        self.patch(audit, 'FLUSH_SECONDS', 0)
+
+    def patch(self, target, name, value):
+        patcher = mock.patch.object(target, name, value)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class SharedThrottleTests(APITestCase):
+    """Throttles go through the real views, counting in a temporary SQLite store."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='ana', password='secreta-123', role='user')
+        self.client = APIClient()
+
+    def login(self, password='secreta-123'):
+        return self.client.post('/api/auth/login/', {'username': 'ana', 'password': password}, format='json')
+
+    def test_sixth_login_in_a_minute_is_throttled(self):
+        # 'login' scope: 5/minute
+        statuses = [self.login(password='incorrecta').status_code for _ in range(6)]
+        self.assertEqual(statuses[:5], [401] * 5)
+        self.assertEqual(statuses[5], 429)
+
+    def test_authenticated_views_pass_the_throttles(self):
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['token']}")
+        for url in ('/api/agents/', '/api/agents/stats/', '/api/jobs/'):
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+
+
+class CursorPaginationTests(APITestCase):
+    """?pagination=cursor seeks on (full_name, id); ?total= adds a count only when asked."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='ana', password='secreta-123')
+        for name in ('Diaz, Eva', 'Abad, Ana', 'Cruz, Luis', 'Benitez, Rosa', 'Abad, Ana'):
+            Agent.objects.create(user=self.user, full_name=name, dni=None, gender='F', status={})
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def names(self, response):
+        return [row['full_name'] for row in response.data['results']]
+
+    def test_pages_forward_and_back(self):
+        response = self.client.get('/api/agents/', {'pagination': 'cursor', 'page_size': 2})
+        self.assertIsNone(response.data['count'])  # No COUNT(*) unless ?total=
+        self.assertIsNone(response.data['previous'])
+        pages = [self.names(response)]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            pages.append(self.names(response))
+        self.assertEqual(pages, [['Abad, Ana', 'Abad, Ana'], ['Benitez, Rosa', 'Cruz, Luis'], ['Diaz, Eva']])
+
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(self.names(response), ['Benitez, Rosa', 'Cruz, Luis'])
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(self.names(response), ['Abad, Ana', 'Abad, Ana'])
+
+    def test_total_is_counted_when_asked(self):
+        response = self.client.get('/api/agents/', {'pagination': 'cursor', 'page_size': 2, 'total': 'exact', 'name': 'abad'})
+        self.assertEqual(response.data['count'], 2)
+        self.assertIsNone(response.data['next'])
+        response = self.client.get('/api/agents/', {'pagination': 'cursor', 'total': 'estimate'})
+        self.assertEqual(response.data['count'], 5)  # No planner statistics on SQLite: counted
+
+    def test_bad_cursor_is_not_found(self):
+        self.assertEqual(self.client.get('/api/agents/', {'cursor': 'not-a-cursor'}).status_code, 404)
+
+
+class ResultCacheTests(APITestCase):
+    """List pages and stats are cached per dataset version; a committed write moves it."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='ana', password='secreta-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_agent(self, dni):
+        with self.captureOnCommitCallbacks(execute=True):
+            Agent.objects.create(user=self.user, full_name=f'Perez, Juan {dni}', dni=dni, gender='M', status={'code': 'vencido'})
+
+    def test_hits_until_a_write_commits(self):
+        self.add_agent('20300400')
+        first = self.client.get('/api/agents/stats/')
+        self.assertEqual((first['X-Cache'], first.data['total'], first.data['vencido']), ('MISS', 1, 1))
+        self.assertEqual(self.client.get('/api/agents/stats/')['X-Cache'], 'HIT')
+
+        self.add_agent('20300401')
+        response = self.client.get('/api/agents/stats/')
+        self.assertEqual((response['X-Cache'], response.data['total']), ('MISS', 2))
+
+    def test_list_pages_are_keyed_by_normalized_params(self):
+        self.add_agent('20300400')
+        self.assertEqual(self.client.get('/api/agents/?name=perez&page_size=5')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/agents/?page_size=5&name=perez')['X-Cache'], 'HIT')
+        response = self.client.get('/api/agents/?page_size=5&name=gomez')
+        self.assertEqual((response['X-Cache'], response.data['count']), ('MISS', 0))
+
+
+class ConditionalRequestTests(APITestCase):
+    """Agent reads carry ETag/Last-Modified and answer 304 while the dataset is unchanged."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='ana', password='secreta-123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.agent = Agent.objects.create(user=self.user, full_name='Perez, Juan', dni='20300400', gender='M', status={})
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_unchanged_reads_are_not_modified(self):
+        for url in ('/api/agents/', '/api/agents/stats/', '/api/agents/facets/', f'/api/agents/{self.agent.pk}/'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertEqual(response['Cache-Control'], 'private, no-cache')
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304, url)
+            self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304, url)
+
+    def test_a_write_or_other_params_change_the_etag(self):
+        etag = self.client.get('/api/agents/')['ETag']
+        self.assertNotEqual(self.client.get('/api/agents/?name=perez')['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.agent.ministry = '01 - Salud'
+            self.agent.save()
+        response = self.client.get('/api/agents/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['results'][0]['ministry'], '01 - Salud')
+
+
+class UpsertImportTests(APITestCase):
+    """?mode=upsert updates existing DNIs, writes only changed rows and reports the diff."""
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='secreta-123', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def row(self, dni, ministry='01 - Salud', name='Perez, Juan'):
+        return {'fullName': name, 'dni': dni, 'gender': 'M', 'status': {}, 'ministry': ministry}
+
+    def test_upsert_reports_what_changed(self):
+        response = self.client.post('/api/agents/bulk/', [self.row('20300400'), self.row('20300401')], format='json')
+        self.assertEqual(response.data['created'], 2)
+        kept = Agent.objects.get(dni='20300400')
+        unchanged_seq = Agent.objects.get(dni='20300401').change_seq
+
+        response = self.client.post('/api/agents/bulk/?mode=upsert', [
+            self.row('20300400', ministry='02 - Educación'),
+            self.row('20300401'),
+            self.row('20300402', name='Gomez, Ana'),
+            self.row('20300402', name='Gómez, Ana'),  # Repeated DNI: the last one wins
+        ], format='json')
+
+        self.assertEqual(response.status_code, 200, response.data)
+        data = response.data
+        self.assertEqual(
+            (data['created'], data['updated'], data['unchanged'], data['skipped']), (1, 1, 1, 1)
+        )
+        self.assertEqual(data['changes'], {'ministry': 1})
+        self.assertEqual(data['samples'], [{'dni': '20300400', 'changes': {'ministry': ['01 - Salud', '02 - Educación']}}])
+        self.assertIn('Actualizados: 1. Sin cambios: 1.', data['message'])
+
+        updated = Agent.objects.get(dni='20300400')
+        self.assertEqual((updated.pk, updated.ministry), (kept.pk, '02 - Educación'))  # Same row, new value
+        self.assertEqual(Agent.objects.get(dni='20300401').change_seq, unchanged_seq)  # Not rewritten
+        self.assertEqual(Agent.objects.get(dni='20300402').full_name, 'Gómez, Ana')
+
+    def test_insert_mode_skips_existing_dnis(self):
+        self.client.post('/api/agents/bulk/', [self.row('20300400')], format='json')
+        response = self.client.post('/api/agents/bulk/', [self.row('20300400', ministry='02 - Educación')], format='json')
+        self.assertEqual((response.data['created'], response.data['skipped']), (0, 1))
+        self.assertNotIn('updated', response.data)
+        self.assertEqual(Agent.objects.get().ministry, '01 - Salud')
+        self.assertEqual(self.client.post('/api/agents/bulk/?mode=merge', [], format='json').status_code, 400)
+
+
+class ImportSessionTests(APITestCase):
+    """Chunked imports: re-sent chunks are no-ops, missing ones block the commit."""
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='secreta-123', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        response = self.client.post('/api/imports/', {'mode': 'insert', 'total_chunks': 2, 'filename': 'agentes.xlsx'}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.url = f"/api/imports/{response.data['id']}/"
+
+    def chunk(self, index, dnis):
+        rows = [{'fullName': f'Perez, Juan {dni}', 'dni': dni, 'gender': 'M', 'status': {}} for dni in dnis]
+        return self.client.put(f'{self.url}chunks/{index}/', rows, format='json')
+
+    def test_resending_a_chunk_is_a_no_op(self):
+        first = self.chunk(0, ['20300400', '20300401'])
+        self.assertEqual((first.status_code, first.data['result']['created']), (201, 2))
+
+        again = self.chunk(0, ['20300400', '20300401'])
+        self.assertEqual((again.status_code, again.data['applied']), (200, False))
+        self.assertEqual(again.data['result'], first.data['result'])
+        self.assertEqual(Agent.objects.count(), 2)
+
+    def test_commit_waits_for_every_chunk_and_adds_them_up(self):
+        self.chunk(1, ['20300402', '20300400'])
+        response = self.client.post(f'{self.url}commit/')
+        self.assertEqual((response.status_code, response.data['missing']), (409, [0]))
+        self.assertEqual(self.client.get(self.url).data['received_chunks'], [1])
+
+        self.chunk(0, ['20300400', '20300401'])  # 20300400 already came in chunk 1: a duplicate
+        response = self.client.post(f'{self.url}commit/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['chunks'], response.data['rows'], response.data['created'], response.data['skipped']), (2, 4, 3, 1))
+        self.assertEqual(self.client.post(f'{self.url}commit/').data, response.data)  # Idempotent
+        self.assertEqual(self.chunk(0, ['20300409']).status_code, 200)  # Already applied: stored result
+        self.assertEqual(self.client.put(f'{self.url}chunks/1/', [], format='json').status_code, 200)
+        self.assertEqual(self.chunk(2, ['20300409']).status_code, 400)  # Out of range
+
+    def test_chunks_after_the_commit_are_refused(self):
+        session = ImportSession.objects.get()
+        session.total_chunks = 3
+        session.save()
+        self.chunk(0, ['20300400'])
+        self.chunk(1, ['20300401'])
+        self.chunk(2, ['20300402'])
+        self.client.post(f'{self.url}commit/')
+        session.chunks.filter(index=2).delete()  # As if it were never received
+        self.assertEqual(self.chunk(2, ['20300402']).status_code, 409)
+
+
+class BackgroundJobTests(APITestCase):
+    """Jobs run the way runworker runs them: enqueue, claim_next, run."""
+
+    def setUp(self):
+        super().setUp()
+        self.patch(jobs, 'JOB_FILES_DIR', self.tmp)
+        self.user = User.objects.create_user(username='admin', password='secreta-123', is_staff=True)
+
+    def run_next(self):
+        job = jobs.claim_next('test-worker')
+        self.assertIsNotNone(job)
+        return jobs.run(job)
+
+    def test_bulk_job_imports_and_audits(self):
+        payload = [{'fullName': 'Perez, Juan', 'dni': '20300400', 'gender': 'M', 'status': {}}]
+        jobs.enqueue('bulk', self.user, params={'mode': 'insert'}, payload=payload, ip='127.0.0.1')
+
+        job = self.run_next()
+
+        self.assertEqual(job.status, 'done', job.error)
+        self.assertEqual(job.result['created'], 1)
+        self.assertTrue(Agent.objects.filter(dni='20300400').exists())
+        self.assertTrue(SecurityLog.objects.filter(action='BULK_IMPORT', user=self.user).exists())
+
+    def test_delete_all_job_deletes_in_chunks_and_audits(self):
+        payload = [{'fullName': f'Perez, Juan {n}', 'dni': f'2030040{n}', 'gender': 'M', 'status': {}} for n in range(3)]
+        jobs.enqueue('bulk', self.user, payload=payload)
+        self.run_next()
+        jobs.enqueue('delete_all', self.user)
+
+        with mock.patch.object(changes, 'CHUNK_SIZE', 2), mock.patch.object(jobs.Progress, '__call__', autospec=True, side_effect=jobs.Progress.__call__) as progress:
+            job = self.run_next()
+
+        self.assertEqual(job.status, 'done', job.error)
+        self.assertEqual(job.result['count'], 3)
+        # Reported after each committed chunk: heartbeats other workers can see
+        self.assertEqual([c.args[1] for c in progress.call_args_list], [0, 2, 3])
+        self.assertFalse(Agent.objects.exists())
+        self.assertEqual(AgentTombstone.objects.count(), 3)
+        self.assertTrue(SecurityLog.objects.filter(action='DELETE_ALL', user=self.user).exists())
+
+
+class AuditBufferTests(APITestCase):
+    """A failed flush keeps the security events instead of dropping the batch."""
+
+    def setUp(self):
+        super().setUp()
+        self.buffer = audit.AuditBuffer(size=100, interval=3600)
+        self.patch(self.buffer, '_ensure_flusher', lambda: None)  # Flushed by the test only
+        for n in range(2):
+            self.buffer.add(SecurityLog(action='EXPORT', details=f'export {n}', timestamp=timezone.now()))
+        for _ in range(3):
+            self.buffer.add(SecurityLog(action='LOGIN_FAIL', ip_address='10.0.0.1', timestamp=timezone.now()), key='burst')
+
+    def test_rows_are_saved_one_by_one_when_the_bulk_insert_fails(self):
+        with mock.patch.object(SecurityLog.objects, 'bulk_create', side_effect=RuntimeError('database is locked')), \
+                self.assertLogs('api.audit', 'WARNING'):
+            self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(SecurityLog.objects.count(), 3)
+        self.assertEqual(SecurityLog.objects.get(action='LOGIN_FAIL').count, 3)
+
+    def test_unwritable_rows_are_retried_then_dropped(self):
+        self.patch(audit, 'MAX_ATTEMPTS', 2)
+        with mock.patch.object(SecurityLog.objects, 'bulk_create', side_effect=RuntimeError('database is locked')), \
+                mock.patch.object(SecurityLog, 'save', side_effect=RuntimeError('database is locked')), \
+                self.assertLogs('api.audit', 'WARNING'):
+            self.assertEqual(self.buffer.flush(), 0)
+            self.buffer.add(SecurityLog(action='LOGIN_FAIL', ip_address='10.0.0.1', timestamp=timezone.now()), key='burst')
+        self.assertEqual(self.buffer.flush(), 3)  # Back up: the retried rows are written
+        self.assertEqual(SecurityLog.objects.get(action='LOGIN_FAIL').count, 4)
+
+        self.buffer.add(SecurityLog(action='EXPORT', timestamp=timezone.now()))
+        with mock.patch.object(SecurityLog.objects, 'bulk_create', side_effect=RuntimeError('disk full')), \
+                mock.patch.object(SecurityLog, 'save', side_effect=RuntimeError('disk full')), \
+                self.assertLogs('api.audit', 'ERROR') as logs:
+            self.buffer.flush()
+            self.buffer.flush()
+        self.assertIn('Dropping audit event after 2 failed writes: EXPORT', logs.output[-1])
+        self.assertEqual(self.buffer.flush(), 0)  # Given up after MAX_ATTEMPTS
+
+
+class AgentRowEncoderTests(APITestCase):
+    """The list's fast path renders exactly what AgentSerializer does."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='ana', password='secreta-123')
+        Agent.objects.create(
+            user=self.user, full_name='Pérez, Juan', dni='20300400', gender='M', birth_date=date(1960, 5, 1),
+            retirement_date=date(2025, 5, 1), status={'code': 'vencido', 'label': 'VENCIDO'},
+        )
+        Agent.objects.create(user=self.user, full_name='Gómez, Ana', dni='27111222', gender='F', status={})
+
+    def test_matches_the_serializer(self):
+        queryset = Agent.objects.order_by('full_name', 'id')
+        encoder = AgentRowEncoder()
+        rows = encoder.encode(encoder.queryset(queryset))
+        self.assertEqual(json.dumps(rows), json.dumps(AgentSerializer(queryset, many=True).data))
+
+    def test_selected_fields_and_cursor_pages(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/agents/', {'fields': 'full_name,retirement_date', 'pagination': 'cursor', 'page_size': 1})
+        self.assertEqual(response.data['results'], [{'full_name': 'Gómez, Ana', 'retirement_date': None}])
+
+        response = client.get(response.data['next'])
+        self.assertEqual(response.data['results'], [{'full_name': 'Pérez, Juan', 'retirement_date': '2025-05-01'}])
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(client.get('/api/agents/', {'fields': 'full_name,nope'}).status_code, 400)
+
+
+class SnapshotTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.patch(snapshots, 'SNAPSHOT_DIR', self.tmp)
+
+    def test_building_an_older_version_keeps_newer_files(self):
+        snapshots.ensure_snapshot(2)
+        snapshots.ensure_snapshot(1)  # A worker that read the version before the last write
+        self.assertTrue(snapshots.snapshot_path(2, '.gz').exists())
+
+        snapshots.ensure_snapshot(3)
+        self.assertFalse(snapshots.snapshot_path(1, '.gz').exists())
+        self.assertFalse(snapshots.snapshot_path(2, '.gz').exists())
+
+    def test_view_serves_the_newer_version_when_its_files_are_purged(self):
+        user = User.objects.create_user(username='ana', password='secreta-123')
+        client = APIClient()
+        client.force_authenticate(user)
+        real_ensure = snapshots.ensure_snapshot
+
+        def ensure_then_purged(version):
+            # Another worker builds a newer version right after this one is ready
+            real_ensure(version)
+            if version == 1:
+                real_ensure(2)
+
+        with mock.patch.object(caching, 'dataset_version', side_effect=[1, 2]), \
+                mock.patch.object(snapshots, 'ensure_snapshot', side_effect=ensure_then_purged):
+            response = client.get('/api/agents/snapshot/', HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response.status_code, 200)
+        body = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(json.loads(body)['version'], 2)
+
+
+class ChangesTests(APITestCase):
+    """/api/agents/changes/ pages through deltas and asks for a resync past the purge point."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='ana', password='secreta-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def import_agents(self, count):
+        # Writes only bump the dataset version on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            payload = [{'fullName': f'Perez, Juan {n}', 'dni': f'2030040{n}', 'gender': 'M', 'status': {}} for n in range(count)]
+            importer.import_payload(payload, self.user)  # All under one change seq
+
+    def test_pages_split_a_sequence_number(self):
+        self.import_agents(5)
+        with self.captureOnCommitCallbacks(execute=True):
+            deleted = Agent.objects.order_by('dni').first()
+            deleted_id = str(deleted.pk)
+            deleted.delete()
+
+        upserted, removed, pages = [], [], 0
+        url, params = '/api/agents/changes/', {'since': 0, 'limit': 2}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200, response.data)
+            upserted += [row['id'] for row in response.data['upserted']]
+            removed += response.data['deleted']
+            pages += 1
+            url, params = response.data['next'], None
+        self.assertEqual(pages, 3)  # 4 agents and 1 deletion
+        self.assertEqual(response.data['has_more'], False)
+        self.assertEqual(response.data['seq'], changes.current().seq)
+        self.assertEqual(sorted(upserted), sorted(str(pk) for pk in Agent.objects.values_list('id', flat=True)))
+        self.assertEqual(removed, [deleted_id])
+
+        response = self.client.get('/api/agents/changes/', {'since': response.data['seq']})
+        self.assertEqual((response.data['upserted'], response.data['deleted'], response.data['has_more']), ([], [], False))
+
+    def test_since_before_the_purged_tombstones_requires_a_resync(self):
+        self.import_agents(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Agent.objects.get().delete()
+        self.assertEqual(self.client.get('/api/agents/changes/', {'since': 1}).status_code, 200)  # Now cached
+
+        AgentTombstone.objects.update(deleted_at=timezone.now() - changes.TOMBSTONE_RETENTION - timedelta(days=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(changes.purge_tombstones(), 1)
+
+        response = self.client.get('/api/agents/changes/', {'since': 1})
+        self.assertEqual(response.status_code, 410)
+        self.assertTrue(response.data['resync'])
+
+    def test_bad_limit_and_cursor(self):
+        for params in ({'limit': 0}, {'limit': changes.MAX_PAGE_SIZE + 1}, {'cursor': 'nope'}):
+            self.assertEqual(self.client.get('/api/agents/changes/', params).status_code, 400, params)
+
+
+class ChatAnswerCacheTests(APITestCase):
+    """Deterministic chat answers are served from memory for the same normalized question."""
+
+    def setUp(self):
+        super().setUp()
+        self.patch(chat, 'ANSWER_CACHE', chat.AnswerCache(max_entries=2, ttl=60))
+        self.client = APIClient()
+
+    def ask(self, message, mode='public'):
+        return self.client.post('/api/chat/', {'message': message, 'mode': mode}, format='json')
+
+    def test_repeated_questions_skip_the_llm(self):
+        with mock.patch.object(chat_backend, 'complete', return_value='Con 30 años de aportes.') as complete:
+            first = self.ask('¿Qué edad necesito para jubilarme?')
+            again = self.ask('  ¿que EDAD necesito   para jubilarme?')
+        self.assertEqual((first['X-Cache'], again['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(again.data['response'], 'Con 30 años de aportes.')
+        self.assertEqual(complete.call_count, 1)
+        self.assertEqual(chat.ANSWER_CACHE.stats()['hits'], 1)
+
+    def test_modes_and_failures_are_not_shared(self):
+        with mock.patch.object(chat_backend, 'complete', side_effect=RuntimeError('timeout')):
+            self.assertEqual(self.ask('¿Qué es el retiro especial?').status_code, 500)
+        with mock.patch.object(chat_backend, 'complete', return_value='Respuesta') as complete:
+            self.assertEqual(self.ask('¿Qué es el retiro especial?')['X-Cache'], 'MISS')  # Errors aren't cached
+            self.assertEqual(self.ask('¿Qué es el retiro especial?', mode='private')['X-Cache'], 'MISS')
+        self.assertEqual(complete.call_count, 2)
+
+    def test_lru_and_ttl(self):
+        cache = chat.ANSWER_CACHE
+        for n in range(3):
+            cache.set(f'k{n}', n)
+        self.assertIsNone(cache.get('k0'))  # Evicted: max_entries=2
+        self.assertEqual(cache.get('k2'), 2)
+        with mock.patch('api.chat.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(cache.get('k2'))
+
+
+class ChatStreamTests(APITestCase):
+    """?stream=1 relays the reply as Server-Sent Events."""
+
+    def setUp(self):
+        super().setUp()
+        self.patch(chat, 'ANSWER_CACHE', chat.AnswerCache())
+        self.client = APIClient()
+
+    def events(self, response):
+        self.assertEqual(response['Content-Type'], 'text/event-stream; charset=utf-8')
+        body = b''.join(response.streaming_content).decode()
+        frames = [frame.split('\n') for frame in body.strip().split('\n\n')]
+        return [(event[len('event: '):], json.loads(data[len('data: '):])) for event, data in frames]
+
+    def test_deltas_then_done_and_the_reply_is_cached(self):
+        with mock.patch.object(chat_backend, 'stream', return_value=iter(['Hola', ', ¿cómo', ' estás?'])):
+            response = self.client.post('/api/chat/?stream=1', {'message': 'Hola PILIN'}, format='json')
+            events = self.events(response)
+        self.assertEqual(events, [
+            ('delta', {'delta': 'Hola'}), ('delta', {'delta': ', ¿cómo'}), ('delta', {'delta': ' estás?'}),
+            ('done', {'response': 'Hola, ¿cómo estás?'}),
+        ])
+        self.assertEqual(response['X-Accel-Buffering'], 'no')
+
+        response = self.client.post('/api/chat/', {'message': 'hola pilin'}, format='json', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(self.events(response)[-1], ('done', {'response': 'Hola, ¿cómo estás?'}))
+
+    def test_upstream_failure_is_an_error_event(self):
+        def failing():
+            yield 'Hola'
+            raise RuntimeError('connection reset')
+
+        with mock.patch.object(chat_backend, 'stream', return_value=failing()):
+            response = self.client.post('/api/chat/', {'message': 'Hola PILIN', 'stream': True}, format='json')
+            events = self.events(response)
+        self.assertEqual(events[-1], ('error', {'response': chat.ERROR_REPLY}))
+        self.assertIsNone(chat.ANSWER_CACHE.get(chat.AnswerCache.make_key('public', 'Hola PILIN')))
+
+
+class ChatBackendRetryTests(APITestCase):
+    """Groq calls retry transient errors within a bounded budget and share one client."""
+
+    def setUp(self):
+        super().setUp()
+        self.patch(chat_backend, 'STATS', chat_backend.LatencyStats())
+        self.patch(chat_backend.time, 'sleep', lambda seconds: None)
+        self.connection_error = groq.APIConnectionError(request=httpx.Request('POST', 'https://api.groq.com'))
+
+    def test_transient_errors_are_retried_up_to_max_retries(self):
+        func = mock.Mock(side_effect=[self.connection_error, self.connection_error, 'ok'])
+        self.assertEqual(chat_backend.call_with_retries(func), 'ok')
+        self.assertEqual(func.call_count, 1 + chat_backend.MAX_RETRIES)
+        self.assertEqual(chat_backend.stats()['retries'], 2)
+
+        func = mock.Mock(side_effect=self.connection_error)
+        with self.assertRaises(groq.APIConnectionError):
+            chat_backend.call_with_retries(func)
+        self.assertEqual(func.call_count, 1 + chat_backend.MAX_RETRIES)
+        self.assertEqual(chat_backend.stats()['errors'], 1)
+
+    def test_other_errors_are_not_retried(self):
+        func = mock.Mock(side_effect=ValueError('bad request'))
+        with self.assertRaises(ValueError):
+            chat_backend.call_with_retries(func)
+        self.assertEqual(func.call_count, 1)
+
+    def test_attempts_stop_at_the_budget(self):
+        self.patch(chat_backend, 'RETRY_BUDGET', 2.0)
+        clock = iter([0.0, 0.0, 1.5, 1.5, 1.5])  # The first attempt used most of the budget
+        with mock.patch.object(chat_backend.time, 'monotonic', side_effect=lambda: next(clock)):
+            func = mock.Mock(side_effect=self.connection_error)
+            with self.assertRaises(groq.APIConnectionError):
+                chat_backend.call_with_retries(func)
+        self.assertEqual(func.call_count, 1)
+        timeout = func.call_args.args[0]
+        self.assertLessEqual(timeout.read, 2.0)  # Capped by the budget, not READ_TIMEOUT
+
+    def test_one_client_per_process(self):
+        self.patch(chat_backend, '_client', None)
+        self.assertIs(chat_backend.get_client(), chat_backend.get_client())
+        self.assertEqual(chat_backend.get_client().max_retries, 0)
+
+
+class IntentParserTests(APITestCase):
+    """Plain dashboard commands are parsed locally; anything unclear is left to the LLM."""
+
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(username='ana', password='secreta-123')
+        with self.captureOnCommitCallbacks(execute=True):
+            Agent.objects.create(user=user, full_name='Perez, Juan', dni='20300400', gender='M', status={},
+                                 ministry='01 - Salud', agreement='Ley 643')
+            Agent.objects.create(user=user, full_name='Gomez, Ana', dni='27111222', gender='F', status={},
+                                 ministry='Educación', agreement='Convenio Educación')
+
+    def action(self, message):
+        parsed = intents.parse(message)
+        return parsed and (parsed.get('action'), parsed.get('value'))
+
+    def test_commands(self):
+        self.assertEqual(self.action('Busca al 20.300.400'), ('search_dni', '20300400'))
+        self.assertEqual(self.action('Busca a Perez'), ('filter_surname', 'Perez'))
+        self.assertEqual(self.action('¿Quién es Juan?'), ('filter_surname', 'Juan'))
+        self.assertEqual(self.action('Mostrame salud'), ('filter_jurisdiction', 'Salud'))
+        self.assertEqual(self.action('ver el convenio ley 643'), ('filter_agreement', 'Ley 643'))
+        self.assertEqual(intents.parse('Hola'), {'intent': 'message', 'reply': intents.GREETING_REPLY})
+
+    def test_unclear_messages_go_to_the_llm(self):
+        self.assertIsNone(intents.parse('Mostrame educacion'))  # Both a ministry and an agreement
+        self.assertIsNone(intents.parse('Busca al 20300400 y al 27111222'))
+        self.assertIsNone(intents.parse('Mostrame cultura'))  # Not a stored value
+        self.assertIsNone(intents.parse('¿Cuántos agentes se jubilan este año?'))
+
+    def test_chat_answers_locally_without_the_llm(self):
+        with mock.patch.object(chat_backend, 'complete') as complete:
+            response = APIClient().post('/api/chat/', {'message': 'Busca al 20300400', 'mode': 'private'}, format='json')
+        complete.assert_not_called()
+        self.assertEqual(response['X-Cache'], 'LOCAL')
+        self.assertEqual(json.loads(response.data['response'])['action'], 'search_dni')
+
+
+class ChatCommandTests(APITestCase):
+    """Private-mode commands with resolve: true come back with their first page of agents."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='ana', password='secreta-123')
+        for n in range(3):
+            Agent.objects.create(user=self.user, full_name=f'Perez, Juan {n}', dni=f'2030040{n}', gender='M', status={})
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_resolved_command_pages_like_the_agent_list(self):
+        response = self.client.post('/api/chat/', {
+            'message': 'Busca a Perez', 'mode': 'private', 'resolve': True, 'page_size': 2, 'fields': 'full_name',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['command']['action'], 'filter_surname')
+        agents = response.data['agents']
+        self.assertEqual(agents['count'], 3)
+        self.assertEqual(agents['results'], [{'full_name': 'Perez, Juan 0'}, {'full_name': 'Perez, Juan 1'}])
+        self.assertIn('/api/agents/?', agents['next'])
+        self.assertEqual(self.client.get(agents['next']).data['results'], [{'full_name': 'Perez, Juan 2'}])
+
+    def test_resolving_does_not_go_through_the_list_view_throttles(self):
+        self.client.post('/api/chat/', {'message': 'Busca a Perez', 'mode': 'private', 'resolve': True}, format='json')
+        # Answered locally: neither the chat scope nor the list view's user rate was counted
+        self.assertEqual(throttling._store.snapshot(), [])
+
+    def test_anonymous_users_get_only_the_command(self):
+        response = APIClient().post('/api/chat/', {'message': 'Busca a Perez', 'mode': 'private', 'resolve': True}, format='json')
+        self.assertEqual(response.data['command']['value'], 'Perez')
+        self.assertNotIn('agents', response.data)
+
+
+class SearchTests(APITestCase):
+    """?q= and the field filters match substrings, through the FTS5 index on SQLite."""
+
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(username='ana', password='secreta-123')
+        for full_name, dni, ministry in (
+            ('Pérez, Juan', '20300400', '01 - Salud'),
+            ('Gómez, Ana', '27111222', '02 - Educación'),
+        ):
+            Agent.objects.create(user=user, full_name=full_name, dni=dni, gender='M', status={}, ministry=ministry)
+
+    def names(self, **params):
+        return [agent.full_name for agent in filters.filter_agents(params)]
+
+    def test_index_is_used_on_sqlite(self):
+        self.assertTrue(search._fts_available())
+
+    def test_q_matches_substrings(self):
+        self.assertEqual(self.names(q='300400'), ['Pérez, Juan'])
+        self.assertEqual(self.names(q='erez'), ['Pérez, Juan'])
+        self.assertEqual(self.names(q='ez'), ['Gómez, Ana', 'Pérez, Juan'])  # Shorter than a trigram
+        self.assertEqual(self.names(q='educacion gom'), ['Gómez, Ana'])
+
+    def test_field_filters_match_inside_their_segment(self):
+        self.assertEqual(self.names(dni='300400'), ['Pérez, Juan'])
+        self.assertEqual(self.names(dni='20.300.400'), ['Pérez, Juan'])
+        self.assertEqual(self.names(name='perez'), ['Pérez, Juan'])
+        self.assertEqual(self.names(name='salud'), [])  # Ministry text, not the name
+        self.assertEqual(self.names(ministry='salud', q='juan'), ['Pérez, Juan'])
+
+    def test_short_and_long_terms_together(self):
+        # Short terms can't use the trigram index; next to MATCH on it they crashed SQLite 3.40
+        self.assertEqual(self.names(q='juan 3'), ['Pérez, Juan'])
+        self.assertEqual(self.names(q='ana 9'), [])
+        self.assertEqual(self.names(dni='3', q='juan'), ['Pérez, Juan'])
+        self.assertEqual(self.names(ministry='02', q='ana'), ['Gómez, Ana'])
+
+
+class ArchiveSecurityLogsTests(APITestCase):
+    """Old SecurityLog rows move to daily gzipped JSONL files, batch by batch."""
+
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(username='ana', password='secreta-123')
+        now = timezone.now()
+        self.old = [
+            SecurityLog.objects.create(user=user, action='LOGIN_SUCCESS', details=f'old {n}', timestamp=now - timedelta(days=100 + n % 2))
+            for n in range(5)
+        ]
+        self.recent = SecurityLog.objects.create(action='LOGIN_FAIL', ip_address='10.0.0.1', timestamp=now)
+
+    def archive(self, *args):
+        out = io.StringIO()
+        call_command('archive_security_logs', '--older-than', '90d', '--dir', str(self.tmp), *args, stdout=out)
+        return out.getvalue()
+
+    def archived_rows(self):
+        rows = []
+        for path in sorted(self.tmp.rglob('security_logs-*.jsonl.gz')):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                rows += [json.loads(line) for line in f]
+        return rows
+
+    def test_archives_in_batches_into_daily_files(self):
+        output = self.archive('--batch-size', '2')
+
+        self.assertIn('Archived 2 rows...\nArchived 4 rows...\nArchived 5 rows...', output)
+        self.assertEqual(len(list(self.tmp.rglob('*.jsonl.gz'))), 2)  # Two days
+        rows = self.archived_rows()
+        self.assertEqual(sorted(row['id'] for row in rows), [log.pk for log in self.old])
+        self.assertEqual(rows[0]['username'], 'ana')
+        self.assertEqual(list(SecurityLog.objects.values_list('pk', flat=True)), [self.recent.pk])
+
+    def test_rows_are_deleted_only_once_written(self):
+        real_write = archive_security_logs.Command.write_batch
+        calls = []
+
+        def write_then_fail(command, directory, batch):
+            calls.append(len(batch))
+            if len(calls) == 2:
+                raise OSError('disk full')
+            real_write(command, directory, batch)
+
+        with mock.patch.object(archive_security_logs.Command, 'write_batch', autospec=True, side_effect=write_then_fail), \
+                self.assertRaises(OSError):
+            self.archive('--batch-size', '2')
+        self.assertEqual(SecurityLog.objects.count(), 4)  # First batch archived, the rest kept
+
+        self.archive()  # Repeating the run finishes the job
+        self.assertEqual(len(self.archived_rows()), 5)
+        self.assertEqual(SecurityLog.objects.count(), 1)
+
+    def test_dry_run_only_reports(self):
+        self.assertIn('5 rows older than', self.archive('--dry-run'))
+        self.assertEqual(SecurityLog.objects.count(), 6)
+        self.assertEqual(self.archived_rows(), [])
+
+
+class RecomputeStatusTests(APITestCase):
+
+    def test_incremental_run_picks_up_edited_retirement_dates(self):
+        user = User.objects.create_user(username='ana', password='secreta-123')
+        agent = Agent.objects.create(
+            user=user, full_name='Pérez, Juan', dni='20300400', gender='M', status={},
+            retirement_date=date(2060, 1, 1),
+        )
+        call_command('recompute_status', '--full', stdout=io.StringIO())
+        agent.refresh_from_db()
+        far_code = agent.status_code
+
+        agent.retirement_date = date(2000, 1, 1)
+        agent.save()
+        call_command('recompute_status', stdout=io.StringIO())
+
+        agent.refresh_from_db()
+        self.assertNotEqual(agent.status_code, far_code)
+
+
+@override_settings(TURNSTILE_SECRET_KEY='')
+class OutboxTests(APITestCase):
+    """Activation emails are queued by registration and sent by dispatch() (locmem backend)."""
+
+    def register(self):
+        return APIClient().post('/api/auth/register/', {
+            'username': 'ana', 'email': 'ana@example.com',
+            'password': 'Secreta@Larga123', 'confirm_password': 'Secreta@Larga123',
+        }, format='json')
+
+    def test_registration_queues_the_email_and_dispatch_sends_it(self):
+        response = self.register()
+        self.assertEqual(response.status_code, 201, response.data)
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.to, email.status), ('ana@example.com', 'pending'))
+        self.assertEqual(mail.outbox, [])
+
+        self.assertEqual(outbox.dispatch(), {'sent': 1, 'retried': 0, 'dead': 0})
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['ana@example.com'])
+        self.assertIn('/api/auth/activate/', mail.outbox[0].body)
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'sent')
+
+    def test_failed_send_is_retried_later(self):
+        self.register()
+        with mock.patch('django.core.mail.EmailMessage.send', side_effect=OSError('provider down')):
+            self.assertEqual(outbox.dispatch(), {'sent': 0, 'retried': 1, 'dead': 0})
+
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), ('pending', 1))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertEqual(outbox.dispatch(), {'sent': 0, 'retried': 0, 'dead': 0})  # Not due yet
+
+
+class ClaimsAuthenticationTests(APITestCase):
+    """Login tokens carry the user's claims, and stop working once those no longer match the user."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='ana', password='secreta-123', role='user')
+        self.client = APIClient()
+
+    def authenticate(self):
+        response = self.client.post('/api/auth/login/', {'username': 'ana', 'password': 'secreta-123'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['token']}")
+        self.assertEqual(self.client.get('/api/agents/').status_code, 200)
+
+    def assertRejected(self, code):
+        response = self.client.get('/api/agents/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data['code'], code)
+
+    def test_password_change_revokes_tokens(self):
+        self.authenticate()
+        self.user.set_password('otra-secreta@456')
+        self.user.save()
+        self.assertRejected('token_revoked')
+
+    def test_deactivation_revokes_tokens(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        self.assertRejected('user_inactive')
+
+    def test_role_change_outdates_tokens(self):
+        self.authenticate()
+        self.user.role = 'admin'
+        self.user.save()
+        self.assertRejected('token_outdated')
+
+    def test_deleted_user_is_rejected(self):
+        self.authenticate()
+        self.user.delete()
+        self.assertRejected('user_not_found')
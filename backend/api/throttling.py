@@ -0,0 +1,188 @@
+"""
+Rate-limit counters shared by every worker process.
+
+DRF's throttles keep their history in the 'default' cache, which is
+per-process LocMem here: with N gunicorn workers every limit is N times
+looser. The throttles below count in a store all workers share instead:
+
+- 'sqlite' (default): a small SQLite file in WAL mode next to the app
+  (THROTTLE_DB_PATH). Each check is one BEGIN IMMEDIATE transaction, so
+  concurrent processes on the host never both take the last slot. Works
+  with no extra service, on one host.
+- 'cache': a Django cache with atomic incr() (THROTTLE_CACHE_ALIAS), for
+  Redis or Memcached shared across hosts.
+
+Both count a sliding window approximately, with two fixed windows: the
+current count plus the previous window's count weighted by how much of it
+still overlaps. Memory is two counters per key, and bursts at a window
+boundary can't get twice the rate through. Rejected requests aren't counted.
+"""
+import os
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import AnonRateThrottle, ScopedRateThrottle, UserRateThrottle
+
+STORE = getattr(settings, 'THROTTLE_STORE', 'sqlite')
+DB_PATH = Path(getattr(settings, 'THROTTLE_DB_PATH', Path(settings.BASE_DIR) / 'cache' / 'throttle.sqlite3'))
+CACHE_ALIAS = getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')
+
+# Expired windows are deleted on about one check in this many
+PURGE_EVERY = 1000
+
+
+def estimate(current: int, previous: int, elapsed: float, duration: int) -> float:
+    """Requests in the last duration seconds, from two fixed-window counters."""
+    return current + previous * (1 - elapsed / duration)
+
+
+def retry_after(current: int, previous: int, elapsed: float, duration: int, limit: int) -> float:
+    """Seconds until one more request fits under limit (current excludes it)."""
+    free = limit - current - 1
+    if free < 0 or not previous:
+        # Only the next window can help
+        return duration - elapsed
+    # current + 1 + previous * (1 - t / duration) <= limit
+    return max(0.0, duration * (1 - free / previous) - elapsed)
+
+
+class SQLiteThrottleStore:
+    """Counters in a WAL-mode SQLite file shared by the processes of one host."""
+
+    def __init__(self, path=DB_PATH):
+        self.path = Path(path)
+        self._local = threading.local()
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        # A forked worker must not reuse its parent's connection
+        if conn is None or self._local.pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Counters aren't worth an fsync per request; WAL keeps the file consistent
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS throttle_hits ('
+                ' key TEXT NOT NULL, window INTEGER NOT NULL, count INTEGER NOT NULL,'
+                ' expires REAL NOT NULL, PRIMARY KEY (key, window)) WITHOUT ROWID'
+            )
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def hit(self, key: str, limit: int, duration: int):
+        """Counts a request if key is under limit per duration. Returns (allowed, wait seconds)."""
+        now = time.time()
+        window = int(now // duration)
+        elapsed = now - window * duration
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            counts = dict(conn.execute(
+                'SELECT window, count FROM throttle_hits WHERE key = ? AND window IN (?, ?)',
+                (key, window, window - 1),
+            ).fetchall())
+            current, previous = counts.get(window, 0), counts.get(window - 1, 0)
+            if estimate(current, previous, elapsed, duration) + 1 > limit:
+                conn.execute('COMMIT')
+                return False, retry_after(current, previous, elapsed, duration, limit)
+            conn.execute(
+                'INSERT INTO throttle_hits (key, window, count, expires) VALUES (?, ?, 1, ?) '
+                'ON CONFLICT (key, window) DO UPDATE SET count = count + 1',
+                (key, window, (window + 2) * duration),
+            )
+            if random.randrange(PURGE_EVERY) == 0:
+                conn.execute('DELETE FROM throttle_hits WHERE expires < ?', (now,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return True, None
+
+    def snapshot(self, limit: int = 100) -> list:
+        """Busiest keys, across the windows still in use."""
+        rows = self.connection().execute(
+            'SELECT key, window, count, expires FROM throttle_hits WHERE expires >= ? '
+            'ORDER BY count DESC LIMIT ?',
+            (time.time(), limit),
+        ).fetchall()
+        return [{'key': key, 'window': window, 'count': count} for key, window, count, _ in rows]
+
+
+class CacheThrottleStore:
+    """Counters in a Django cache; needs atomic incr() (Redis, Memcached) to be exact."""
+
+    def __init__(self, alias=CACHE_ALIAS):
+        self.alias = alias
+
+    def hit(self, key: str, limit: int, duration: int):
+        cache = caches[self.alias]
+        now = time.time()
+        window = int(now // duration)
+        elapsed = now - window * duration
+        current_key = f'throttle:{key}:{window}'
+        cache.add(current_key, 0, duration * 2)
+        # Count first, give the slot back if over: incr() is the only atomic step
+        current = cache.incr(current_key)
+        previous = cache.get(f'throttle:{key}:{window - 1}', 0)
+        if estimate(current, previous, elapsed, duration) > limit:
+            cache.decr(current_key)
+            return False, retry_after(current - 1, previous, elapsed, duration, limit)
+        return True, None
+
+    def snapshot(self, limit: int = 100):
+        return None  # Cache keys can't be listed
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """The configured store, created on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CacheThrottleStore() if STORE == 'cache' else SQLiteThrottleStore()
+    return _store
+
+
+class SharedThrottleMixin:
+    """Replaces SimpleRateThrottle's per-process history with get_store()."""
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        allowed, self._wait = get_store().hit(self.key, self.num_requests, self.duration)
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class SharedAnonRateThrottle(SharedThrottleMixin, AnonRateThrottle):
+    pass
+
+
+class SharedUserRateThrottle(SharedThrottleMixin, UserRateThrottle):
+    pass
+
+
+class SharedScopedRateThrottle(SharedThrottleMixin, ScopedRateThrottle):
+    def allow_request(self, request, view):
+        # ScopedRateThrottle.__init__ sets no rate: it depends on the view's scope
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
@@ -1,11 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
-    AgentViewSet, CustomTokenObtainPairView, RegisterView, ActivateAccountView, ChatView
+    AgentViewSet, JobViewSet, ImportSessionViewSet, CustomTokenObtainPairView, RegisterView, ActivateAccountView, ChatView, ChatCacheStatsView, ChatBackendStatsView, ChatIntentStatsView, ThrottleStatsView
 )
 
 router = DefaultRouter()
 router.register(r'agents', AgentViewSet, basename='agent')
+router.register(r'jobs', JobViewSet, basename='job')
+router.register(r'imports', ImportSessionViewSet, basename='import-session')
 
 urlpatterns = [
     path('auth/login/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
@@ -13,5 +15,9 @@ urlpatterns = [
     path('auth/activate/<str:uidb64>/<str:token>/', ActivateAccountView.as_view(), name='auth_activate'),
     # Token refresh if needed later: path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('chat/', ChatView.as_view(), name='chat'),
+    path('chat/cache_stats/', ChatCacheStatsView.as_view(), name='chat_cache_stats'),
+    path('chat/backend_stats/', ChatBackendStatsView.as_view(), name='chat_backend_stats'),
+    path('chat/intent_stats/', ChatIntentStatsView.as_view(), name='chat_intent_stats'),
+    path('throttle_stats/', ThrottleStatsView.as_view(), name='throttle_stats'),
     path('', include(router.urls)),
 ]
@@ -1,22 +1,33 @@
+import json
 from typing import Any, Dict
-from django.http import HttpResponse
-from django.db.models import QuerySet
-from rest_framework import viewsets, permissions, status, generics, views
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.db.models import Count, F, QuerySet, Value
+from rest_framework import viewsets, mixins, permissions, status, generics, views
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.db import transaction
-from .models import User, Agent, SecurityLog
-from .serializers import UserSerializer, AgentSerializer
-from rest_framework.throttling import ScopedRateThrottle
+from .models import User, Agent, Job, ImportSession
+from .serializers import UserSerializer, AgentSerializer, AgentRowEncoder, JobSerializer, ImportSessionSerializer
+from . import audit, authentication, caching, changes, chat, chat_backend, exports, filters, import_sessions, importer, intents, jobs, outbox, snapshots
+from .pagination import AgentPageNumberPagination, AgentCursorPagination, wants_cursor_pagination
+from .throttling import SharedScopedRateThrottle, get_store
+from rest_framework.utils.urls import replace_query_param
 from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
 
 # Custom Token Serializer to include user info in response
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        # Claims ClaimsJWTAuthentication authenticates with, without loading the user
+        return authentication.add_claims(super().get_token(user), user)
+
     def validate(self, attrs: Dict[str, Any]) -> Dict[str, Any]:
         """
         Validates the token request and adds custom claims (username, role).
@@ -39,11 +50,10 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
             
         return data
 
-from django.core.mail import send_mail
 from django.conf import settings
 from django.urls import reverse
 from django.utils.encoding import force_bytes, force_str
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+from django.utils.http import urlencode, urlsafe_base64_encode, urlsafe_base64_decode
 from django.contrib.auth.tokens import default_token_generator
 from django.shortcuts import redirect
 
@@ -51,38 +61,30 @@ import requests
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
-    throttle_classes = [ScopedRateThrottle]
+    throttle_classes = [SharedScopedRateThrottle]
     throttle_scope = 'login'
 
     def post(self, request, *args, **kwargs):
-        response = super().post(request, *args, **kwargs)
-        
-        # Audit Log
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        ip = x_forwarded_for.split(',')[0] if x_forwarded_for else request.META.get('REMOTE_ADDR')
-        
-        if response.status_code == 200:
-            user = User.objects.get(username=request.data.get('username'))
-            SecurityLog.objects.create(
-                user=user,
-                action='LOGIN_SUCCESS',
-                ip_address=ip,
-                details=f"User {user.username} logged in."
-            )
-        else:
-            SecurityLog.objects.create(
-                user=None, # Cannot trust username in failed attempt
-                action='LOGIN_FAIL',
-                ip_address=ip,
-                details=f"Failed login attempt for username: {request.data.get('username')}"
-            )
-        return response
+        # Same flow as TokenViewBase.post, keeping the serializer for its authenticated user
+        serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            audit.login_failed(request.data.get('username'), audit.client_ip(request))
+            raise InvalidToken(e.args[0])
+        except APIException:
+            audit.login_failed(request.data.get('username'), audit.client_ip(request))
+            raise
+
+        # Audit Log (buffered, see api/audit.py)
+        audit.login_succeeded(serializer.user, audit.client_ip(request))
+        return Response(serializer.validated_data, status=status.HTTP_200_OK)
 
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = (permissions.AllowAny,)
     serializer_class = UserSerializer
-    throttle_classes = [ScopedRateThrottle]
+    throttle_classes = [SharedScopedRateThrottle]
     throttle_scope = 'register'
 
     def create(self, request, *args, **kwargs):
@@ -126,8 +128,9 @@ class RegisterView(generics.CreateAPIView):
             ip = request.META.get('REMOTE_ADDR')
         return ip
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        # Create inactive user
+        # Create inactive user (in one transaction with its activation email)
         user = serializer.save(is_active=False)
         
         # Generate token and uid
@@ -138,13 +141,12 @@ class RegisterView(generics.CreateAPIView):
         # Uses request.scheme (http/https) and get_host() (domain) to build the correct URL
         activation_link = f"{self.request.scheme}://{self.request.get_host()}/api/auth/activate/{uid}/{token}/"
         
-        # Send Email
-        send_mail(
+        # Queue the email: the worker sends it (api/outbox.py), registration doesn't wait on the provider
+        outbox.enqueue(
+            to=user.email,
             subject='Activa tu cuenta en PILIN',
-            message=f'Hola {user.username},\n\nPor favor activa tu cuenta haciendo clic en el siguiente enlace:\n{activation_link}\n\nGracias!',
+            body=f'Hola {user.username},\n\nPor favor activa tu cuenta haciendo clic en el siguiente enlace:\n{activation_link}\n\nGracias!',
             from_email=settings.DEFAULT_FROM_EMAIL if hasattr(settings, 'DEFAULT_FROM_EMAIL') else 'noreply@pilin.local',
-            recipient_list=[user.email],
-            fail_silently=False,
         )
 
         try:
@@ -178,13 +180,28 @@ class ActivateAccountView(views.APIView):
 
 class AgentViewSet(viewsets.ModelViewSet):
     serializer_class = AgentSerializer
-    serializer_class = AgentSerializer
-    
+    pagination_class = AgentPageNumberPagination
+
+    # Tries to serve a snapshot while newer versions keep replacing it
+    SNAPSHOT_ATTEMPTS = 3
+
+    @property
+    def paginator(self):
+        """
+        Page numbers by default; keyset pagination on (full_name, id) with ?pagination=cursor.
+        """
+        if not hasattr(self, '_paginator'):
+            if wants_cursor_pagination(self.request):
+                self._paginator = AgentCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def get_permissions(self):
         """
         Instantiates and returns the list of permissions that this view requires.
         """
-        if self.action in ['create', 'update', 'partial_update', 'destroy', 'bulk', 'delete_all']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'bulk', 'import_file', 'delete_all', 'cache_stats']:
             permission_classes = [permissions.IsAdminUser]
         else:
             permission_classes = [permissions.IsAuthenticated]
@@ -193,210 +210,297 @@ class AgentViewSet(viewsets.ModelViewSet):
     def get_queryset(self) -> QuerySet:
         """
         Returns the list of agents belonging to the current user.
-        Supports filtering by specific fields and status.
+        Supports filtering by specific fields and status, and free-text search with ?q=.
         """
-        user = self.request.user
         # Shared DB: All authenticated users see all agents
-        queryset = Agent.objects.all().select_related('user')
-        
-        # Status Filter
-        status_param = self.request.query_params.get('status')
-        if status_param:
-            queryset = queryset.filter(status__code=status_param)
-
-        # Specific Field Filters
-        dni = self.request.query_params.get('dni')
-        if dni:
-            queryset = queryset.filter(dni__icontains=dni)
-
-        name = self.request.query_params.get('name') # Search in full_name
-        if name:
-            queryset = queryset.filter(full_name__icontains=name)
-
-        cuil = self.request.query_params.get('cuil')
-        if cuil:
-            queryset = queryset.filter(cuil__icontains=cuil)
-
-        affiliate = self.request.query_params.get('affiliate')
-        if affiliate:
-            queryset = queryset.filter(affiliate_status__icontains=affiliate)
-
-        ministry = self.request.query_params.get('ministry') # Filter by jurisdiction (Col M)
-        if ministry:
-            queryset = queryset.filter(ministry__icontains=ministry)
-
-        agreement = self.request.query_params.get('agreement') # Filter by Convention (Col I)
-        if agreement:
-            queryset = queryset.filter(agreement__icontains=agreement)
-
-        surname = self.request.query_params.get('surname') # Alias for name search
-        if surname:
-            queryset = queryset.filter(full_name__icontains=surname)
-            
-        return queryset.order_by('full_name') # Sort alphabetically by default as requested before
+        # (no select_related('user'): responses only carry the user id)
+        return filters.filter_agents(self.request.query_params, Agent.objects.all())
 
 
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Lists agents. Pages are served from the versioned result cache (api/caching.py),
+        or as 304 Not Modified when If-None-Match still matches the dataset version.
+        Rows are read as raw values and encoded by AgentRowEncoder (same JSON as AgentSerializer);
+        ?fields=id,full_name,... limits the columns.
+        """
+        encoder = AgentRowEncoder(AgentRowEncoder.parse_fields(request.query_params.get('fields')))
+
+        def compute():
+            # Keyset pagination needs the (full_name, id) of the boundary rows
+            queryset = encoder.queryset(self.filter_queryset(self.get_queryset()), extra=('full_name', 'id'))
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                return self.get_paginated_response(encoder.encode(page))
+            return Response(encoder.encode(queryset))
+
+        return caching.conditional_response('list', request, compute)
+
+    def retrieve(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Returns one agent, with the same ETag / 304 handling as the list (not cached).
+        """
+        return caching.conditional_response('retrieve', request, lambda: super(AgentViewSet, self).retrieve(request, *args, **kwargs), cache=False)
+
     @action(detail=False, methods=['get'])
     def stats(self, request: Request) -> Response:
         """
         Returns global statistics for the user's agents.
-        Calculates status in Python to ensure compatibility across all DBs (SQLite/Postgres).
+        A single GROUP BY over the indexed status_code column, cached until the next write.
         """
-        queryset = Agent.objects.all()
-        
-        # Fetch all agents to count in memory (robust against SQLite JSON limitations)
-        # Note: If database grows very large (>10k), this should be optimized back to DB-level queries 
-        # with proper Postgres JSONB support. For now, this fixes the "0 stats" bug.
-        
-        all_agents = list(queryset)
-        total = len(all_agents)
-        vencido = 0
-        proximo = 0
-        inminente = 0
-        
-        for agent in all_agents:
-            # Check if status is a dict (standard) or string (legacy)
-            s_code = ''
-            if isinstance(agent.status, dict):
-                s_code = agent.status.get('code', '')
+        def compute():
+            counts = dict(
+                Agent.objects.order_by().values_list('status_code').annotate(n=Count('pk'))
+            )
+            return Response({
+                'total': sum(counts.values()),
+                'vencido': counts.get('vencido', 0),
+                'proximo': counts.get('proximo', 0),
+                'inminente': counts.get('inminente', 0)
+            })
+
+        return caching.conditional_response('stats', request, compute)
+
+    # Facet name -> Agent field
+    FACET_FIELDS = (
+        ('ministry', 'ministry'),     # Jurisdiction (Col M)
+        ('agreement', 'agreement'),   # Convention (Col I)
+        ('law', 'law'),
+        ('gender', 'gender'),
+        ('status', 'status_code'),
+    )
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request: Request) -> Response:
+        """
+        Returns value -> count maps for ministry, agreement, law, gender and status,
+        restricted by the same filter params as the list.
+        One round-trip: a UNION ALL of one GROUP BY per field, cached until the next write.
+        """
+        def compute():
+            base = self.get_queryset().order_by()
+            parts = [
+                base.annotate(facet=Value(name), value=F(field))
+                    .values_list('facet', 'value')
+                    .annotate(n=Count('pk'))
+                    .order_by()
+                for name, field in self.FACET_FIELDS
+            ]
+            facets = {name: {} for name, _ in self.FACET_FIELDS}
+            for name, value, n in parts[0].union(*parts[1:], all=True):
+                key = value or ''
+                facets[name][key] = facets[name].get(key, 0) + n
+            return Response({
+                name: dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+                for name, counts in facets.items()
+            })
+
+        return caching.conditional_response('facets', request, compute)
+
+    @action(detail=False, methods=['get'])
+    def snapshot(self, request: Request) -> HttpResponse:
+        """
+        The full roster in one compressed columnar download (api/snapshots.py), for
+        dashboards that filter client-side. Built once per dataset version and served
+        from disk; 304 while the client's ETag is current.
+        """
+        picked = snapshots.pick_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        encoding = picked[0] if picked else 'identity'
+        # The same version for the ETag and the file served
+        version = caching.dataset_version()
+
+        def compute():
+            snapshots.ensure_snapshot(version)
+            if picked:
+                response = FileResponse(open(snapshots.snapshot_path(version, picked[1]), 'rb'), content_type='application/json')
+                response['Content-Encoding'] = encoding
             else:
-                # Fallback if stored as string
-                import json
-                try:
-                    s_dict = json.loads(agent.status)
-                    s_code = s_dict.get('code', '')
-                except:
-                    s_code = str(agent.status)
-            
-            if s_code == 'vencido':
-                vencido += 1
-            elif s_code == 'proximo':
-                proximo += 1
-            elif s_code == 'inminente':
-                inminente += 1
-        
-        return Response({
-            'total': total,
-            'vencido': vencido,
-            'proximo': proximo,
-            'inminente': inminente
-        })
+                # Client without gzip support: decompressed on the fly
+                response = StreamingHttpResponse(snapshots.iter_decompressed(version), content_type='application/json')
+            response['Vary'] = 'Accept-Encoding'
+            return response
+
+        # One ETag per encoding: each is a different byte representation
+        for attempt in range(self.SNAPSHOT_ATTEMPTS):
+            try:
+                return caching.conditional_response(f'snapshot:{encoding}', request, compute, cache=False, version=version)
+            except FileNotFoundError:
+                # A build of a newer version purged this one before it was opened: serve the new one
+                if attempt == self.SNAPSHOT_ATTEMPTS - 1:
+                    raise
+                version = caching.dataset_version()
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request: Request) -> Response:
+        """
+        Delta sync: agents written and deleted after change ?since=<seq> (api/changes.py).
+        Returns the rows upserted (same JSON as the list, ?fields= supported) and the ids
+        deleted, at most ?limit= changes per page. While has_more is true, next is the URL
+        of the following page; on the last page, seq is the since to pass next time.
+        410 with resync: true when since is older than the retained tombstones (or unknown):
+        the client has to reload the full roster.
+        """
+        params = request.query_params
+        try:
+            since = int(params.get('since', 0))
+            if since < 0:
+                raise ValueError
+        except ValueError:
+            raise ValidationError({'since': 'Debe ser un número de cambio (entero >= 0).'})
+        try:
+            limit = int(params.get('limit', changes.PAGE_SIZE))
+            if not 0 < limit <= changes.MAX_PAGE_SIZE:
+                raise ValueError
+        except ValueError:
+            raise ValidationError({'limit': f'Debe ser un entero entre 1 y {changes.MAX_PAGE_SIZE}.'})
+        try:
+            position = changes.decode_position(params['cursor']) if params.get('cursor') else None
+        except ValueError:
+            raise ValidationError({'cursor': 'Cursor inválido.'})
+        if position is not None and position[0] < since:
+            raise ValidationError({'cursor': 'Cursor inválido.'})
+        encoder = AgentRowEncoder(AgentRowEncoder.parse_fields(params.get('fields')))
+
+        def compute():
+            counter = changes.current()
+            start = position[0] if position else since
+            if start < counter.purged_seq or start > counter.seq:
+                return Response(
+                    {
+                        'error': 'Cambios no disponibles desde ese punto; recargue el listado completo.',
+                        'resync': True,
+                        'seq': counter.seq,
+                    },
+                    status=status.HTTP_410_GONE
+                )
+            # Bounded by the counter read above: later changes are left for the next sync
+            page, has_more = changes.read_page(since, counter.seq, limit, position)
+            upserted_ids = [agent_id for _, kind, _, agent_id in page if kind == changes.UPSERTED]
+            upserted = Agent.objects.filter(pk__in=upserted_ids).order_by('change_seq', 'id')
+            return Response({
+                'since': since,
+                'seq': page[-1][0] if has_more else counter.seq,
+                'has_more': has_more,
+                'next': replace_query_param(
+                    request.build_absolute_uri(), 'cursor', changes.encode_position(page[-1])
+                ) if has_more else None,
+                'upserted': encoder.encode(encoder.queryset(upserted)) if upserted_ids else [],
+                'deleted': [str(agent_id) for _, kind, _, agent_id in page if kind == changes.DELETED],
+            })
+
+        return caching.conditional_response('changes', request, compute)
+
+    @action(detail=False, methods=['get'])
+    def cache_stats(self, request: Request) -> Response:
+        """
+        Hit/miss counters of the result cache for this worker process.
+        """
+        return Response(caching.stats())
+
+    def wants_async(self) -> bool:
+        """?async=1 runs the action as a background job (api/jobs.py) instead of inside the request."""
+        return self.request.query_params.get('async') in ('1', 'true')
+
+    def get_client_ip(self, request):
+        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+        return x_forwarded_for.split(',')[0] if x_forwarded_for else request.META.get('REMOTE_ADDR')
+
+    def enqueue(self, kind: str, **kwargs: Any) -> Response:
+        """Queues a job for `manage.py runworker` and answers 202 with the URL to poll."""
+        job = jobs.enqueue(kind, self.request.user, ip=self.get_client_ip(self.request), **kwargs)
+        serializer = JobSerializer(job, context={'request': self.request})
+        url = self.request.build_absolute_uri(reverse('job-detail', kwargs={'pk': job.pk}))
+        return Response({**serializer.data, 'url': url}, status=status.HTTP_202_ACCEPTED, headers={'Location': url})
+
+    def get_import_mode(self):
+        """?mode=insert (default, existing DNIs are skipped) or ?mode=upsert (existing DNIs are updated)."""
+        mode = self.request.query_params.get('mode', 'insert')
+        return mode if mode in importer.MODES else None
 
     @action(detail=False, methods=['post'])
     def bulk(self, request: Request) -> Response:
         """
         Bulk creates agents from a list of data using bulk_create for performance.
-        Skips duplicates (DNI) by pre-fetching existing DNIS.
+        Skips duplicates (DNI) by pre-fetching existing DNIs, chunk by chunk.
+        With ?mode=upsert existing DNIs are updated instead, writing only the rows that changed.
         """
         agents_data = request.data
         if not isinstance(agents_data, list):
             return Response({'error': 'Expected a list of agents'}, status=status.HTTP_400_BAD_REQUEST)
-        
+        mode = self.get_import_mode()
+        if mode is None:
+            return Response({'error': "Modo inválido. Usá 'insert' o 'upsert'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if self.wants_async():
+            return self.enqueue('bulk', payload=agents_data, params={'mode': mode})
+
         try:
-            # 1. Extract all DNIs from incoming data to optimize duplicate checking
-            # Filter out entries with no DNI to avoid issues or handle them separately
-            incoming_dnis = {str(d.get('dni')).strip() for d in agents_data if d.get('dni')}
-            
-            # 2. Query DB once to find which of these DNIs already exist for this user
-            existing_dnis = set(Agent.objects.filter(
-                user=request.user, 
-                dni__in=incoming_dnis
-            ).values_list('dni', flat=True))
-
-            new_agents = []
-            skipped_count = 0
-            errors = []
-
-            for index, agent_data in enumerate(agents_data):
-                dni = agent_data.get('dni')
-                # Normalize DNI same way as above
-                if dni:
-                    dni = str(dni).strip()
-                    if dni in ['-', '']: # Skip invalid placeholders
-                        skipped_count += 1
-                        continue
-
-                # Deduplication Check
-                if dni and dni in existing_dnis:
-                    skipped_count += 1
-                    continue
-                
-                # If DNI appeared multiple times in the SAME request, we should also track that
-                # We can add 'dni' to existing_dnis immediately to catch duplicates within the file itself
-                if dni:
-                    existing_dnis.add(dni)
-
-                try:
-                    # Prepare agent instance (no save() yet)
-                    agent = Agent(
-                        user=request.user,
-                        full_name=agent_data.get('fullName'),
-                        birth_date=agent_data.get('birthDate'),
-                        gender=agent_data.get('gender'),
-                        retirement_date=agent_data.get('retirementDate'),
-                        status=agent_data.get('status'),
-                        agreement=agent_data.get('agreement'),
-                        law=agent_data.get('law'),
-                        affiliate_status=agent_data.get('affiliateStatus'),
-                        ministry=agent_data.get('ministry'),
-                        location=agent_data.get('location'),
-                        branch=agent_data.get('branch'),
-                        cuil=agent_data.get('cuil'),
-                        dni=dni, # Use normalized DNI
-                        seniority=agent_data.get('seniority')
-                    )
-                    new_agents.append(agent)
-
-                except Exception as e:
-                    errors.append(f"Row {index}: Error preparing data - {str(e)}")
-
-            # 3. Bulk Insert
-            if new_agents:
-                # bulk_create ignores signals like post_save, but is very fast.
-                # Since we don't have critical logic in save() other than ID generation 
-                # (which custom clean Agent.save logic might handle or UUIDField defaults),
-                # we need to be careful.
-                # Agent model has 'id = uuid.uuid4()' in save(). 
-                # bulk_create DOES NOT call save(). So IDs won't be generated if they are generated in save().
-                # We must generate IDs manually here if the model relies on save() for it.
-                
-                import uuid
-                for a in new_agents:
-                    if not a.id:
-                        a.id = uuid.uuid4()
-                        
-                Agent.objects.bulk_create(new_agents, batch_size=1000)
-
-            created_count = len(new_agents)
-            
-            msg = f"Importación finalizada. Creados: {created_count}. Duplicados omitidos: {skipped_count}."
+            # Rows are written in fixed-size chunks (one DNI lookup + one bulk_create each).
+            # insert_agents() skips DNI placeholders and DNIs already present, including
+            # duplicates within the file itself; upsert_agents() updates changed rows instead.
+            result = importer.import_payload(agents_data, request.user, mode=mode)
+            errors = result['errors']
+
+            msg = importer.summary_message(result)
             if errors:
                 msg += f" Errores varios: {len(errors)} (ver consola)."
             
 
 
             # Audit Log
-            x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-            ip = x_forwarded_for.split(',')[0] if x_forwarded_for else request.META.get('REMOTE_ADDR')
-            SecurityLog.objects.create(
-                user=request.user,
-                action='BULK_IMPORT',
-                ip_address=ip,
-                details=f"Created: {created_count}. Skipped: {skipped_count}. Errors: {len(errors)}"
+            audit.record(
+                'BULK_IMPORT', user=request.user, ip=audit.client_ip(request),
+                details=f"{importer.audit_summary(result)} Errors: {len(errors)}",
             )
-            
-            return Response({
-                'message': msg,
-                'created': created_count,
-                'skipped': skipped_count,
-                'errors': errors
-            }, status=status.HTTP_200_OK)
+
+            result.pop('rows')
+            return Response({'message': msg, **result}, status=status.HTTP_200_OK)
 
         except Exception as e:
             import traceback
             traceback.print_exc()
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_file(self, request: Request) -> Response:
+        """
+        Imports agents from a raw .xlsx upload (multipart field 'file').
+        Parsed server-side with openpyxl in read_only mode and inserted in fixed-size chunks,
+        using the same column rules and DNI deduplication as the dashboard import.
+        """
+        from openpyxl.utils.exceptions import InvalidFileException
+        import zipfile
+
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({'error': 'Adjuntá un archivo Excel en el campo "file".'}, status=status.HTTP_400_BAD_REQUEST)
+        if not upload.name.lower().endswith(('.xlsx', '.xlsm')):
+            return Response({'error': 'Formato no soportado. Solo se aceptan archivos .xlsx.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        mode = self.get_import_mode()
+        if mode is None:
+            return Response({'error': "Modo inválido. Usá 'insert' o 'upsert'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if self.wants_async():
+            return self.enqueue('import', upload=upload, params={'filename': upload.name, 'mode': mode})
+
+        try:
+            result = importer.import_workbook(upload, request.user, mode=mode)
+        except (zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+            return Response({'error': f'No se pudo leer el archivo Excel: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        msg = importer.summary_message(result)
+        if result['error_count']:
+            msg += f" Errores varios: {result['error_count']}."
+
+        # Audit Log
+        audit.record(
+            'BULK_IMPORT', user=request.user, ip=audit.client_ip(request),
+            details=f"File: {upload.name}. Rows: {result['rows']}. {importer.audit_summary(result)} Errors: {result['error_count']}",
+        )
+
+        return Response({'message': msg, **result}, status=status.HTTP_200_OK)
+
     def create(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         """
         Creates a single agent. Handles camelCase to snake_case mapping for frontend compatibility.
@@ -424,113 +528,223 @@ class AgentViewSet(viewsets.ModelViewSet):
             for camel, snake in mapping.items():
                 if camel in data:
                     data[snake] = data.pop(camel)
-            
-            return super().create(request, *args, **kwargs)
+
+            serializer = self.get_serializer(data=data)
+            serializer.is_valid(raise_exception=True)
+            self.perform_create(serializer)
+            headers = self.get_success_headers(serializer.data)
+            return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+        except ValidationError:
+            raise
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def perform_create(self, serializer):
+        # Agent.save() fills the derived columns (search_text, status_code) and invalidates the result cache
+        serializer.save(user=self.request.user)
+
     @action(detail=False, methods=['delete'])
     def delete_all(self, request: Request) -> Response:
         """
         Deletes all agents belonging to the current user.
         """
+        if self.wants_async():
+            return self.enqueue('delete_all')
+
         try:
-            count, _ = Agent.objects.filter(user=request.user).delete()
+            count = changes.delete_agents(Agent.objects.filter(user=request.user))
+            caching.invalidate_agents()
             
             # Audit Log
-            x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-            ip = x_forwarded_for.split(',')[0] if x_forwarded_for else request.META.get('REMOTE_ADDR')
-            SecurityLog.objects.create(
-                user=request.user,
-                action='DELETE_ALL',
-                ip_address=ip,
-                details=f"Deleted {count} agents."
-            )
+            audit.record('DELETE_ALL', user=request.user, ip=audit.client_ip(request), details=f"Deleted {count} agents.")
             
             return Response({'message': f'Se eliminaron {count} agentes.'}, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def perform_content_negotiation(self, request, force=False):
+        # ?format=csv|xlsx selects the export format, not a DRF renderer
+        if self.action == 'export':
+            force = True
+        return super().perform_content_negotiation(request, force=force)
+
     @action(detail=False, methods=['get'])
     def export(self, request: Request) -> HttpResponse:
         """
-        Exports the filtered agents to an Excel file.
+        Exports the filtered agents to an Excel file (or CSV with ?format=csv).
+        Streams from a server-side cursor, so memory stays flat for any roster size.
+        Honours If-Modified-Since / If-None-Match: 304 when no agent changed since.
         """
-        import openpyxl
+        if self.wants_async():
+            # The worker writes the file; it's then fetched from the job's download_url
+            return self.enqueue('export', params={
+                'format': 'csv' if request.query_params.get('format') == 'csv' else 'xlsx',
+                'filters': filters.filter_params(request.query_params),
+            })
+
+        return caching.conditional_response('export', request, self.export_file, cache=False)
 
+    def export_file(self) -> HttpResponse:
+        """Builds the export response for the current request (synchronous path of export)."""
+        import tempfile
+
+        request = self.request
 
         # 1. Get filtered queryset (reuse existing logic)
         queryset = self.get_queryset()
+        rows = exports.iter_rows(queryset)
 
-        # 2. Create Workbook
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Agentes Filtrados"
+        # Audit Log (row count comes from the stream itself, no extra COUNT query)
+        ip = audit.client_ip(request)
+        user = self.request.user
 
-        # 3. Headers
-        headers = [
-            'Nombre Completo', 'DNI', 'CUIL', 'Sexo', 'Fecha Nac.', 
-            'Fecha Retiro', 'Edad', 'Estado', 'Ley', 'Afiliado', 
-            'Ministerio', 'Repartición', 'Localidad', 'Antigüedad', 'Convenio'
-        ]
-        ws.append(headers)
-
-        # 4. Data Rows
-        from datetime import date
-        today = date.today()
-
-        for agent in queryset:
-            # Calculate Age
-            age = None
-            if agent.birth_date:
-                age = today.year - agent.birth_date.year - ((today.month, today.day) < (agent.birth_date.month, agent.birth_date.day))
-
-            # Format Status
-            status_label = agent.status.get('label') if isinstance(agent.status, dict) else str(agent.status)
-
-            ws.append([
-                agent.full_name,
-                agent.dni,
-                agent.cuil,
-                agent.gender,
-                agent.birth_date,
-                agent.retirement_date,
-                age,
-                status_label,
-                agent.law,
-                agent.affiliate_status,
-                agent.ministry,
-                agent.branch,
-                agent.location,
-                agent.seniority,
-                agent.agreement
-            ])
-
-        # 5. Response
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename=agentes_filtrados.xlsx'
-        
-        wb.save(response)
+        def log_export(count):
+            audit.record('EXPORT', user=user, ip=ip, details=f"Exported {count} agents.")
 
-        # Audit Log
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        ip = x_forwarded_for.split(',')[0] if x_forwarded_for else request.META.get('REMOTE_ADDR')
-        SecurityLog.objects.create(
-            user=self.request.user,
-            action='EXPORT',
-            ip_address=ip,
-            details=f"Exported {queryset.count()} agents."
+        # 2a. CSV: rows go out as they are read
+        if request.query_params.get('format') == 'csv':
+            response = StreamingHttpResponse(exports.iter_csv(rows, on_complete=log_export), content_type='text/csv; charset=utf-8')
+            response['Content-Disposition'] = 'attachment; filename=agentes_filtrados.csv'
+            return response
+
+        # 2b. XLSX: write-only workbook spooled to a temp file, then streamed in chunks
+        tmp = tempfile.TemporaryFile()
+        count = exports.write_xlsx(rows, tmp)
+        tmp.seek(0)
+        log_export(count)
+
+        return FileResponse(tmp, as_attachment=True, filename='agentes_filtrados.xlsx', content_type=exports.XLSX_CONTENT_TYPE)
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Background jobs started with ?async=1 (import, bulk, export, delete_all).
+    Poll /api/jobs/<id>/ for status and progress; finished exports are fetched from download/.
+    """
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self) -> QuerySet:
+        queryset = Job.objects.all().select_related('created_by')
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(created_by=self.request.user)
+        return queryset
+
+    @action(detail=True, methods=['get'])
+    def download(self, request: Request, pk=None) -> HttpResponse:
+        """
+        Streams the file produced by a finished export job.
+        """
+        job = self.get_object()
+        result = job.result or {}
+        if job.status != 'done' or not result.get('file'):
+            return Response({'error': 'La tarea no generó ningún archivo.'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            fileobj = open(result['file'], 'rb')
+        except FileNotFoundError:
+            return Response({'error': 'El archivo ya no está disponible.'}, status=status.HTTP_410_GONE)
+        return FileResponse(fileobj, as_attachment=True, filename=result['filename'], content_type=result['content_type'])
+
+class ImportSessionViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    Resumable chunked imports (see api/import_sessions.py): open a session,
+    PUT numbered chunks (re-sending one is a no-op), then commit for the totals.
+    """
+    serializer_class = ImportSessionSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+    def get_queryset(self) -> QuerySet:
+        return ImportSession.objects.filter(created_by=self.request.user)
+
+    def perform_create(self, serializer):
+        x_forwarded_for = self.request.META.get('HTTP_X_FORWARDED_FOR')
+        ip = x_forwarded_for.split(',')[0] if x_forwarded_for else self.request.META.get('REMOTE_ADDR')
+        serializer.save(created_by=self.request.user, ip_address=ip)
+
+    @action(detail=True, methods=['put', 'post'], url_path=r'chunks/(?P<index>[0-9]+)')
+    def chunk(self, request: Request, pk=None, index=None) -> Response:
+        """
+        Applies chunk number <index> (a list of agents, same format as /api/agents/bulk/).
+        201 when applied now, 200 with the stored result when it had already been applied.
+        """
+        session = self.get_object()
+        rows = request.data
+        if not isinstance(rows, list):
+            return Response({'error': 'Expected a list of agents'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > import_sessions.MAX_CHUNK_ROWS:
+            return Response({'error': f'Máximo {import_sessions.MAX_CHUNK_ROWS} filas por bloque.'}, status=status.HTTP_400_BAD_REQUEST)
+        if session.total_chunks is not None and int(index) >= session.total_chunks:
+            return Response({'error': f'Bloque fuera de rango (total: {session.total_chunks}).'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            chunk, applied = import_sessions.add_chunk(session, int(index), rows)
+        except import_sessions.SessionClosed:
+            return Response({'error': 'La sesión de importación ya fue confirmada.'}, status=status.HTTP_409_CONFLICT)
+
+        return Response(
+            {'index': chunk.index, 'applied': applied, 'result': chunk.result},
+            status=status.HTTP_201_CREATED if applied else status.HTTP_200_OK
         )
 
-        return response            
+    @action(detail=True, methods=['post'])
+    def commit(self, request: Request, pk=None) -> Response:
+        """
+        Closes the session and returns the totals of all its chunks.
+        Refused while declared chunks are missing; committing again returns the same totals.
+        """
+        session = self.get_object()
+        if session.status == 'open':
+            missing = import_sessions.missing_chunks(session)
+            if missing:
+                return Response({'error': 'Faltan bloques por enviar.', 'missing': missing}, status=status.HTTP_409_CONFLICT)
+        return Response(import_sessions.commit(session), status=status.HTTP_200_OK)
 
-from groq import Groq
 
 class ChatView(views.APIView):
     permission_classes = [permissions.AllowAny] # Public chatbot
-    throttle_classes = [ScopedRateThrottle]
+    throttle_classes = [SharedScopedRateThrottle]
     throttle_scope = 'chat'
 
+    def get_local_answer(self, request):
+        """
+        (reply, source) when the message can be answered without the LLM, else (None, None);
+        resolved once per request. Dashboard commands go through the local intent parser
+        (api/intents.py) first, then every mode checks the answer cache (api/chat.py).
+        """
+        if not hasattr(self, '_local_answer'):
+            message = request.data.get('message')
+            mode = request.data.get('mode', 'public')
+            self._cache_key = chat.AnswerCache.make_key(mode, message) if message else None
+            self._local_answer = (None, None)
+            if message and mode == 'private':
+                parsed = intents.parse(message)
+                if parsed is not None:
+                    self._local_answer = (json.dumps(parsed, ensure_ascii=False), 'LOCAL')
+            if self._local_answer[0] is None and self._cache_key:
+                cached = chat.ANSWER_CACHE.get(self._cache_key)
+                if cached is not None:
+                    self._local_answer = (cached, 'HIT')
+        return self._local_answer
+
+    def check_throttles(self, request):
+        # Answers resolved locally don't cost an LLM call, so they don't count against the rate
+        if self.get_local_answer(request)[0] is not None:
+            return
+        super().check_throttles(request)
+
+    def wants_stream(self, request) -> bool:
+        """Server-Sent Events are opt-in: ?stream=1, {"stream": true} or Accept: text/event-stream."""
+        return (
+            request.query_params.get('stream') in ('1', 'true')
+            or request.data.get('stream') is True
+            or 'text/event-stream' in request.META.get('HTTP_ACCEPT', '')
+        )
+
+    def perform_content_negotiation(self, request, force=False):
+        # No DRF renderer handles text/event-stream; streamed replies bypass the renderers anyway
+        if 'text/event-stream' in request.META.get('HTTP_ACCEPT', ''):
+            force = True
+        return super().perform_content_negotiation(request, force=force)
+
     def post(self, request):
         user_message = request.data.get('message')
         mode = request.data.get('mode', 'public') # 'public' or 'private'
@@ -538,113 +752,137 @@ class ChatView(views.APIView):
         if not user_message:
             return Response({'error': 'Message is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            client = Groq(
-                api_key=getattr(settings, 'GROQ_API_KEY', None),
-            )
+        messages = [
+            {
+                "role": "system",
+                "content": chat.system_prompt(mode)
+            },
+            {
+                "role": "user",
+                "content": user_message
+            }
+        ]
 
-            # --- PROMPT STRATEGY ---
-            if mode == 'private':
-                # Dashboard Assistant (Agentic JSON Mode)
-                system_prompt = (
-                    "Sos 'PILIN', el asistente del Dashboard del sistema de jubilaciones. "
-                    "Tu función EXCLUSIVA es controlar la interfaz mediante comandos JSON. "
-                    "NO inventes datos. NO agregues explicaciones fuera del JSON. "
-                    "Si no entendés la orden, devolvé un JSON con intent='message' preguntando nuevamente. "
-                    "SIEMPRE debes responder con un JSON válido (sin markdown ```json). "
-                    "Formato de respuesta: {\"intent\": \"...\", \"action\": \"...\", \"value\": \"...\", \"reply\": \"...\"}\n"
-                    "INTENCIONES:\n"
-                    "1. 'command': Para ejecutar una acción.\n"
-                    "   - Buscar DNI: action='search_dni', value='12345678' (SOLO si es número).\n"
-                    "   - Filtrar Jurisdicción: action='filter_jurisdiction', value='Salud' (o lo que pida).\n"
-                    "   - Filtrar Convenio: action='filter_agreement', value='Ley 643' (o lo que pida).\n"
-                    "   - Filtrar Apellido/Nombre: action='filter_surname', value='Perez'.\n"
-                    "2. 'message': Para charlar sin acciones. reply='Texto de respuesta'.\n"
-                    "EJEMPLOS:\n"
-                    "- User: 'Busca al 20300400' -> {\"intent\": \"command\", \"action\": \"search_dni\", \"value\": \"20300400\", \"reply\": \"Buscando DNI...\"}\n"
-                    "- User: 'Busca a Perez' -> {\"intent\": \"command\", \"action\": \"filter_surname\", \"value\": \"Perez\", \"reply\": \"Buscando apellido Perez...\"}\n"
-                    "- User: 'Quien es Juan?' -> {\"intent\": \"command\", \"action\": \"filter_surname\", \"value\": \"Juan\", \"reply\": \"Buscando a Juan...\"}\n"
-                    "- User: 'Mostrame salud' -> {\"intent\": \"command\", \"action\": \"filter_jurisdiction\", \"value\": \"Salud\", \"reply\": \"Filtrando por Salud.\"}\n"
-                    "- User: 'Hola' -> {\"intent\": \"message\", \"reply\": \"Hola, ¿qué buscás hoy?\"}"
-                )
-            else:
-                # Public Expert (Friendly but Restricted)
-                system_prompt = (
-                    "¡Hola! Soy 'PILIN', tu asistente virtual amigable del Instituto de Seguridad Social (ISS) de La Pampa. 🤖✨ "
-                    "Estoy aquí para brindarte INFORMACIÓN general sobre jubilaciones."
-                    "\n\n"
-                    "Mis capacidades son LIMITADAS a:\n"
-                    "1. Explicar requisitos de jubilaciones (Ordinaria, Invalidez, etc.).\n"
-                    "2. Proveer links a la normativa oficial.\n"
-                    "3. Responder saludos y preguntas básicas de cortesía.\n"
-                    "\n"
-                    "📕 RESPUESTAS ESPECÍFICAS (Usa este texto si preguntan por ANSES/Privados/Monotributo):\n"
-                    "  'Para jubilarte necesitás tener la edad (60 años las mujeres y 65 los varones) y 30 años de aportes. Si trabajaste en el sector privado, campo o sos monotributista, te corresponde ANSES.\n"
-                    "  ¿Cómo empezar? Primero, revisá tus aportes entrando a la página de ANSES con tu clave. Si te faltan años, no te preocupes: podés consultar por la Moratoria para completarlos.\n"
-                    "  ¿Dónde ir? El trámite es con turno previo. Una vez que lo tengas, presentate con tu DNI en la oficina de tu ciudad (Santa Rosa, General Pico, General Acha, Victorica o Realicó). Si sos mamá, no te olvides de llevar las partidas de nacimiento de tus hijos, porque te suman años de aporte.\n"
-                    "  Para más información: [🏢 Jubilación por Anses](https://dgp.lapampa.gob.ar/jubilacion-por-anses)'\n"
-                    "\n"
-                    "⛔ SI PREGUNTAN POR: 'Retiro Especial', 'Jubilación Anticipada', 'Anticipada' o 'Ley 3581' -> RESPONDE SOLO ESTO:\n"
-                    "  'Este sistema está diseñado para empleados que cuentan con los años de aportes necesarios pero aún no alcanzan la edad jubilatoria ordinaria. A continuación, te detallo los puntos clave:\n"
-                    "\n"
-                    "  1. Requisitos para acceder\n"
-                    "  Para solicitar este retiro, el agente debe cumplir con las siguientes condiciones:\n"
-                    "  - Edad mínima: 55 años para las mujeres y 60 años para los varones.\n"
-                    "  - Aportes: Registrar 30 años o más de servicios con aportes.\n"
-                    "  - Aportes en La Pampa: De esos 30 años, al menos 20 años deben haber sido aportados al Instituto de Seguridad Social (ISS) de La Pampa.\n"
-                    "  - Caja Otorgante: El ISS debe ser la caja otorgante de la prestación (donde se registra la mayor cantidad de aportes).\n"
-                    "\n"
-                    "  2. Monto del beneficio (Haber)\n"
-                    "  - Se garantiza que el monto no sea inferior al haber mínimo jubilatorio vigente.\n"
-                    "  - Se mantiene el derecho a percibir el Sueldo Anual Complementario (Aguinaldo) y los aumentos que se otorguen al sector pasivo.\n"
-                    "\n"
-                    "  Más información: [📜 Retiro Especial](https://dgp.lapampa.gob.ar/jubilaciones-especiales)'\n"
-                    "\n"
-                    "⛔ SI PREGUNTAN POR: 'Ley 2954', '2954' o 'Suplemento Especial Vitalicio' -> RESPONDE SOLO ESTO:\n"
-                    "  'El Suplemento Especial Vitalicio (Ley 2954) es un beneficio previsional específico de la provincia de La Pampa, diseñado para corregir una situación de \"injusticia previsional\" que afectaba a empleados públicos que ingresaron al Estado bajo modalidades de contratación especial y luego pasaron a planta permanente.\n"
-                    "\n"
-                    "  1. ¿A quiénes está dirigido?\n"
-                    "  El beneficio alcanza a los empleados públicos provinciales (y municipales de localidades adheridas) que:\n"
-                    "  - Ingresaron al régimen del Instituto de Seguridad Social (ISS) entre el 1 de enero de 2004 y el 31 de diciembre de 2007.\n"
-                    "  - Incluye también a quienes pasaron a planta mediante la Ley 2343 (ex pasantes o contratados).\n"
-                    "  - Excepciones: No aplica para los escalafones Docente, Judicial ni Policial.\n"
-                    "\n"
-                    "  Más información: [📜 Suplemento Especial Vitalicio](https://dgp.lapampa.gob.ar/jubilacion-anticipada)'\n"
-                    "\n"
-                    "🚫 LO QUE NO PUEDO HACER (Y NO DEBO OFRECER):\n"
-                    "- NO puedo consultar estado de trámites personales.\n"
-                    "- NO puedo completar documentos ni formularios.\n"
-                    "- NO puedo ver datos de agentes específicos.\n"
-                    "\n"
-                    "Enlaces útiles (USA FORMATO MARKDOWN `[Titulo](URL)` para que sean clicables):\n"
-                    "- [👵 Jubilación Ordinaria](https://dgp.lapampa.gob.ar/jubilacion-ordinaria)\n"
-                    "- [♿ Jubilación por Invalidez](https://dgp.lapampa.gob.ar/jubilacion-anticipada)\n"
-                    "- [⏳ Jubilación Anticipada](https://dgp.lapampa.gob.ar/jubilacion-anticipada)\n"
-                    "- [📜 Suplemento Especial Vitalicio](https://dgp.lapampa.gob.ar/jubilacion-anticipada)\n"
-                    "- [🏢 Jubilación por Anses](https://dgp.lapampa.gob.ar/jubilacion-por-anses)\n\n"
-                    "⚠️ REGLA DE ORO: JAMÁS pongas enlaces a `www.anses.gob.ar` ni otros sitios nacionales. SOLO usa los enlaces de `dgp.lapampa.gob.ar` listados arriba. \n"
-                    "⚠️ RESTRICCIÓN FINAL: SI LA PREGUNTA COINCIDE CON UN TEMA 'RESPUESTA ESPECÍFICA', USA EL TEXTO LITERAL. NO CAMBIES NI UNA COMA. NO AGREGUES SALUDOS INNECESARIOS AL FINAL."
+        local_reply, source = self.get_local_answer(request)
+        if self.wants_stream(request):
+            return self.stream_reply(messages, local_reply, source)
+
+        if local_reply is not None:
+            bot_reply = local_reply
+        else:
+            try:
+                # Shared client: pooled keep-alive connections, timeouts and a retry budget (api/chat_backend.py)
+                bot_reply = chat_backend.complete(
+                    messages=messages,
+                    model=chat.CHAT_MODEL,
+                    temperature=0.0, # ZERO temperature for maximum determinism
                 )
+            except Exception as e:
+                print(f"Groq API Error: {e}")
+                return Response({'response': chat.ERROR_REPLY}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            chat_completion = client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": system_prompt
-                    },
-                    {
-                        "role": "user",
-                        "content": user_message
-                    }
-                ],
-                model="llama-3.1-8b-instant",
-                temperature=0.0, # ZERO temperature for maximum determinism
-            )
+            if bot_reply:
+                chat.ANSWER_CACHE.set(self._cache_key, bot_reply)
 
-            bot_reply = chat_completion.choices[0].message.content
-            return Response({'response': bot_reply})
+        data = {'response': bot_reply}
+        if mode == 'private' and request.data.get('resolve') is True:
+            data.update(self.resolve_command(request, bot_reply))
+        response = Response(data)
+        response['X-Cache'] = source or 'MISS'
+        return response
 
-        except Exception as e:
-            print(f"Groq API Error: {e}")
-            return Response({'response': 'Lo siento, tuve un problema conectando con mi cerebro digital. ¿Podrías intentar de nuevo?'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    def resolve_command(self, request, bot_reply) -> dict:
+        """
+        With {"resolve": true}, a dashboard command is carried out here: the reply's
+        command and the first page of matching agents come back in the same response,
+        {command, agents: {count, next, previous, results}}, so the client skips its
+        follow-up /api/agents/ request. The page is what /api/agents/ would return for
+        the command's filters in cursor mode (same filters, encoder and pagination
+        links); only authenticated users get it.
+        """
+        command = intents.read_command(bot_reply)
+        if command is None:
+            return {}
+        if not request.user or not request.user.is_authenticated:
+            return {'command': command}
+
+        params = {'pagination': 'cursor', 'total': 'exact', **intents.command_filters(command)}
+        for name in ('page_size', 'fields'):
+            if request.data.get(name):
+                params[name] = str(request.data[name])
+        try:
+            encoder = AgentRowEncoder(AgentRowEncoder.parse_fields(params.get('fields')))
+        except ValidationError:
+            return {'command': command}
+
+        # Keyset pagination needs the (full_name, id) of the boundary rows
+        queryset = encoder.queryset(filters.filter_agents(params), extra=('full_name', 'id'))
+        paginator = AgentCursorPagination()
+        list_url = request.build_absolute_uri(reverse('agent-list')) + '?' + urlencode(params)
+        page = paginator.paginate(queryset, params, list_url)
+        return {'command': command, 'agents': paginator.get_paginated_response(encoder.encode(page)).data}
+
+    def stream_reply(self, messages, local_reply=None, source=None) -> StreamingHttpResponse:
+        """
+        Relays the reply as Server-Sent Events: one 'delta' event per token chunk,
+        then 'done' with the full text (or 'error'). Local answers go out as a
+        single delta. The full reply is cached like a JSON one.
+        """
+        cache_key = self._cache_key
+
+        def events():
+            if local_reply is not None:
+                yield chat.sse_event('delta', {'delta': local_reply})
+                yield chat.sse_event('done', {'response': local_reply})
+                return
+            parts = []
+            try:
+                for delta in chat_backend.stream(messages, model=chat.CHAT_MODEL, temperature=0.0):
+                    parts.append(delta)
+                    yield chat.sse_event('delta', {'delta': delta})
+            except Exception as e:
+                print(f"Groq API Error: {e}")
+                yield chat.sse_event('error', {'response': chat.ERROR_REPLY})
+                return
+            reply = ''.join(parts)
+            if reply:
+                chat.ANSWER_CACHE.set(cache_key, reply)
+            yield chat.sse_event('done', {'response': reply})
+
+        response = StreamingHttpResponse(events(), content_type='text/event-stream; charset=utf-8')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Reverse proxies must pass events through unbuffered
+        response['X-Cache'] = source or 'MISS'
+        return response
+
+
+class ChatCacheStatsView(views.APIView):
+    """Hit/miss counters of the chat answer cache for this worker process (admins only)."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(chat.ANSWER_CACHE.stats())
+
+
+class ChatBackendStatsView(views.APIView):
+    """Groq call latency (p50/p90/p99), errors and retries for this worker process (admins only)."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(chat_backend.stats())
+
+
+class ChatIntentStatsView(views.APIView):
+    """Hit rate of the local dashboard command parser for this worker process (admins only)."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(intents.stats())
+
+
+class ThrottleStatsView(views.APIView):
+    """Busiest rate-limit keys in the shared throttle store (admins only; SQLite store)."""
+    permission_classes = [permissions.IsAdminUser]
 
+    def get(self, request):
+        return Response({'store': type(get_store()).__name__, 'keys': get_store().snapshot()})
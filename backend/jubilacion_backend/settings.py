@@ -100,6 +100,52 @@ if database_url:
     DATABASES['default'] = dj_database_url.parse(database_url, conn_max_age=600)
 
 
+# Cache
+# 'default' stays per-process (throttling, short-lived counts). 'agents' holds API results
+# (api/caching.py) and must be shared by every worker so a write invalidates all of them:
+# file-based by default; AGENTS_CACHE_BACKEND accepts locmem (single process / dev), file,
+# db (run `manage.py createcachetable`), redis, or a full backend dotted path.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'db': 'django.core.cache.backends.db.DatabaseCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+AGENTS_CACHE_BACKEND = config('AGENTS_CACHE_BACKEND', default='file')
+AGENTS_CACHE_LOCATION = config('AGENTS_CACHE_LOCATION', default={
+    'file': str(BASE_DIR / 'cache' / 'agents'),
+    'db': 'agents_cache',
+}.get(AGENTS_CACHE_BACKEND, 'agents'))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'agents': {
+        'BACKEND': CACHE_BACKENDS.get(AGENTS_CACHE_BACKEND, AGENTS_CACHE_BACKEND),
+        'LOCATION': AGENTS_CACHE_LOCATION,
+        'TIMEOUT': config('AGENTS_CACHE_TIMEOUT', default=600, cast=int),
+    },
+}
+if AGENTS_CACHE_BACKEND in ('locmem', 'file', 'db'):
+    CACHES['agents']['OPTIONS'] = {'MAX_ENTRIES': 5000}
+
+
+# Background jobs (api/jobs.py, run by `manage.py runworker`)
+# Uploaded files and export results live here until the job expires; shared by web and worker.
+JOB_FILES_DIR = config('JOB_FILES_DIR', default=str(BASE_DIR / 'jobs'))
+JOB_STALE_SECONDS = config('JOB_STALE_SECONDS', default=900, cast=int)
+JOB_RETENTION_HOURS = config('JOB_RETENTION_HOURS', default=24, cast=int)
+# Chunked import sessions (api/import_sessions.py) idle for longer than this are purged
+IMPORT_SESSION_TTL_HOURS = config('IMPORT_SESSION_TTL_HOURS', default=48, cast=int)
+# Deleted-agent tombstones for delta sync (api/changes.py) are kept this long
+AGENT_TOMBSTONE_RETENTION_DAYS = config('AGENT_TOMBSTONE_RETENTION_DAYS', default=30, cast=int)
+# Compressed roster snapshots (api/snapshots.py), one per dataset version; shared by all workers
+SNAPSHOT_DIR = config('SNAPSHOT_DIR', default=str(BASE_DIR / 'cache' / 'snapshots'))
+# Old SecurityLog rows moved out by `manage.py archive_security_logs` (gzipped JSONL per day)
+SECURITY_LOG_ARCHIVE_DIR = config('SECURITY_LOG_ARCHIVE_DIR', default=str(BASE_DIR / 'archive' / 'security_logs'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -148,6 +194,14 @@ ANYMAIL = {
     "RESEND_API_KEY": config('RESEND_API_KEY', default=''),
 }
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@pilin.local')
+# Email outbox (api/outbox.py): sent by `manage.py send_outbox` or runworker, retried with backoff
+OUTBOX_BATCH_SIZE = config('OUTBOX_BATCH_SIZE', default=50, cast=int)
+OUTBOX_MAX_ATTEMPTS = config('OUTBOX_MAX_ATTEMPTS', default=8, cast=int)
+OUTBOX_BACKOFF_SECONDS = config('OUTBOX_BACKOFF_SECONDS', default=30, cast=int)
+
+# SecurityLog writes are buffered per process (api/audit.py); 0 seconds writes each event at once
+AUDIT_BUFFER_SIZE = config('AUDIT_BUFFER_SIZE', default=100, cast=int)
+AUDIT_FLUSH_SECONDS = config('AUDIT_FLUSH_SECONDS', default=2.0, cast=float)
 
 # Turnstile Configuration (CAPTCHA) - Verified Active
 # Default keys are Cloudflare's "Always Pass" test keys for development
@@ -159,6 +213,15 @@ TURNSTILE_SECRET_KEY = os.environ.get('TURNSTILE_SECRET_KEY', '1x000000000000000
 
 # LLM Configuration (Groq)
 GROQ_API_KEY = os.environ.get('GROQ_API_KEY', '')
+# Per-process cache of chat answers (api/chat.py); keys change with the prompt/model
+CHAT_CACHE_TTL = config('CHAT_CACHE_TTL', default=3600, cast=int)
+CHAT_CACHE_MAX_ENTRIES = config('CHAT_CACHE_MAX_ENTRIES', default=1000, cast=int)
+# Shared Groq client (api/chat_backend.py): timeouts in seconds, retries bounded by CHAT_RETRY_BUDGET
+CHAT_CONNECT_TIMEOUT = config('CHAT_CONNECT_TIMEOUT', default=3.0, cast=float)
+CHAT_READ_TIMEOUT = config('CHAT_READ_TIMEOUT', default=15.0, cast=float)
+CHAT_MAX_RETRIES = config('CHAT_MAX_RETRIES', default=2, cast=int)
+CHAT_RETRY_BUDGET = config('CHAT_RETRY_BUDGET', default=20.0, cast=float)
+CHAT_POOL_SIZE = config('CHAT_POOL_SIZE', default=10, cast=int)
 TURNSTILE_VERIFY_URL = 'https://challenges.cloudflare.com/turnstile/v0/siteverify'
 
 # DEBUG: Print Email Config to Console on Startup (Masked Password)
@@ -203,12 +266,14 @@ AUTH_USER_MODEL = 'api.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Trusts the claims of login tokens, re-checked against the user every AUTH_STATE_TTL seconds
+        'api.authentication.ClaimsJWTAuthentication',
     ),
+    # Counted in a store shared by all workers (api/throttling.py), not per process
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle',
-        'rest_framework.throttling.ScopedRateThrottle',
+        'api.throttling.SharedAnonRateThrottle',
+        'api.throttling.SharedUserRateThrottle',
+        'api.throttling.SharedScopedRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '10/minute',
@@ -235,3 +300,10 @@ from datetime import timedelta
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=8),
 }
+# Throttle counters (api/throttling.py): 'sqlite' shares them between the workers of one host;
+# 'cache' uses THROTTLE_CACHE_ALIAS, which needs atomic incr() (a redis CACHES entry)
+THROTTLE_STORE = config('THROTTLE_STORE', default='sqlite')
+THROTTLE_DB_PATH = config('THROTTLE_DB_PATH', default=str(BASE_DIR / 'cache' / 'throttle.sqlite3'))
+THROTTLE_CACHE_ALIAS = config('THROTTLE_CACHE_ALIAS', default='default')
+# Seconds a user's active/password/privilege state is trusted by api/authentication.py
+AUTH_STATE_TTL = config('AUTH_STATE_TTL', default=60, cast=int)
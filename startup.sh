@@ -5,6 +5,8 @@ echo "Running migrations..."
 python backend/manage.py migrate
 echo "Creating superuser..."
 python backend/manage.py createsu
+echo "Starting background worker..."
+python backend/manage.py runworker &
 echo "Starting Gunicorn..."
 cd backend
 gunicorn jubilacion_backend.wsgi --log-file -
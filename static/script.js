@@ -372,6 +372,11 @@ function handleFileSelect(e) {
 
 
 function processFile(file) {
+    // .xlsx files are parsed server-side (streamed, no row limit); other formats keep the in-browser path
+    if (/\.xlsx$/i.test(file.name)) {
+        uploadWorkbook(file);
+        return;
+    }
     const reader = new FileReader();
     reader.onload = (e) => {
         const data = new Uint8Array(e.target.result);
@@ -385,6 +390,108 @@ function processFile(file) {
     reader.readAsArrayBuffer(file);
 }
 
+// Polls a background job (/api/jobs/<id>/) until it finishes. Resolves with the final job.
+async function waitForJob(jobId, onProgress = null, interval = 1500) {
+    while (true) {
+        const res = await fetch(`${API_URL}/jobs/${jobId}/`, {
+            headers: { 'Authorization': `Bearer ${token}` }
+        });
+        if (!res.ok) throw new Error(`Job poll failed: ${res.status}`);
+        const job = await res.json();
+        if (job.status === 'done' || job.status === 'failed') return job;
+        if (onProgress) onProgress(job);
+        await new Promise(resolve => setTimeout(resolve, interval));
+    }
+}
+
+async function uploadWorkbook(file) {
+    const formData = new FormData();
+    formData.append('file', file);
+    try {
+        // Runs as a background job: the request returns at once and we poll for the result
+        const res = await fetch(`${API_URL}/agents/import/?async=1`, {
+            method: 'POST',
+            headers: {
+                'Authorization': `Bearer ${token}`,
+                'X-CSRFToken': getCookie('csrftoken')
+            },
+            body: formData
+        });
+
+        const data = await res.json();
+        if (!res.ok) {
+            alert(`Error al importar: ${data.error || data.detail}`);
+            return;
+        }
+
+        const job = await waitForJob(data.id, (j) => console.log(`Importando... ${j.progress}${j.total ? ' / ' + j.total : ''} filas`));
+        if (job.status === 'done') {
+            const result = job.result;
+            if (result.errors && result.errors.length) console.warn('Errores de importación:', result.errors);
+            let msg = result.message;
+            if (result.error_count) msg += ` Errores varios: ${result.error_count}.`;
+            alert(`Éxito: ${msg}`);
+            closeUploadModal();
+            loadAgents();
+        } else {
+            alert(`Error al importar: ${job.error}`);
+        }
+    } catch (err) {
+        console.error(err);
+        alert('Error de conexión al importar');
+    }
+}
+
+// Resumable import (/api/imports/): rows go in numbered chunks, each applied on its own.
+// A failed chunk is retried; re-sending a chunk the server already applied is a no-op.
+const IMPORT_CHUNK_SIZE = 1000;
+const IMPORT_CHUNK_RETRIES = 3;
+
+async function uploadInChunks(agents, mode = 'insert') {
+    const headers = {
+        'Content-Type': 'application/json',
+        'Authorization': `Bearer ${token}`,
+        'X-CSRFToken': getCookie('csrftoken')
+    };
+    const totalChunks = Math.ceil(agents.length / IMPORT_CHUNK_SIZE);
+
+    const res = await fetch(`${API_URL}/imports/`, {
+        method: 'POST',
+        headers,
+        body: JSON.stringify({ mode, total_chunks: totalChunks })
+    });
+    const session = await res.json();
+    if (!res.ok) throw new Error(session.error || session.detail || 'No se pudo iniciar la importación');
+
+    for (let index = 0; index < totalChunks; index++) {
+        const chunk = agents.slice(index * IMPORT_CHUNK_SIZE, (index + 1) * IMPORT_CHUNK_SIZE);
+        for (let attempt = 1; ; attempt++) {
+            try {
+                const chunkRes = await fetch(`${API_URL}/imports/${session.id}/chunks/${index}/`, {
+                    method: 'PUT',
+                    headers,
+                    body: JSON.stringify(chunk)
+                });
+                if (chunkRes.ok) break;
+                if (chunkRes.status < 500) {
+                    const errorData = await chunkRes.json();
+                    throw Object.assign(new Error(errorData.error || errorData.detail), { fatal: true });
+                }
+                throw new Error(`HTTP ${chunkRes.status}`);
+            } catch (err) {
+                if (err.fatal || attempt >= IMPORT_CHUNK_RETRIES) throw err;
+                await new Promise(resolve => setTimeout(resolve, 1000 * attempt));
+            }
+        }
+        console.log(`Importando... bloque ${index + 1} / ${totalChunks}`);
+    }
+
+    const commitRes = await fetch(`${API_URL}/imports/${session.id}/commit/`, { method: 'POST', headers });
+    const result = await commitRes.json();
+    if (!commitRes.ok) throw new Error(result.error || result.detail);
+    return result;
+}
+
 async function analyzeData(data) {
     if (!data || data.length < 2) {
         alert('El archivo parece estar vacío o no tiene datos.');
@@ -602,28 +709,14 @@ async function analyzeData(data) {
 
     if (agentsToUpload.length > 0) {
         try {
-            const res = await fetch(`${API_URL}/agents/bulk/`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'Authorization': `Bearer ${token}`,
-                    'X-CSRFToken': getCookie('csrftoken')
-                },
-                body: JSON.stringify(agentsToUpload)
-            });
-
-            if (res.ok) {
-                const data = await res.json();
-                alert(`Éxito: ${data.message}`);
-                closeUploadModal();
-                loadAgents();
-            } else {
-                const errorData = await res.json();
-                alert(`Error al importar: ${errorData.error}`);
-            }
+            const data = await uploadInChunks(agentsToUpload);
+            if (data.errors && data.errors.length) console.warn('Errores de importación:', data.errors);
+            alert(`Éxito: ${data.message}`);
+            closeUploadModal();
+            loadAgents();
         } catch (err) {
             console.error(err);
-            alert('Error de conexión al importar');
+            alert(`Error al importar: ${err.message}`);
         }
     } else {
         alert('No se encontraron agentes válidos para importar.');
@@ -632,6 +725,9 @@ async function analyzeData(data) {
 
 // --- Persistence (API) ---
 
+// Columns the dashboard renders (the list endpoint's ?fields=; the owner 'user' id is not needed)
+const AGENT_LIST_FIELDS = 'id,full_name,birth_date,gender,retirement_date,status,agreement,law,affiliate_status,ministry,location,branch,cuil,dni,seniority';
+
 async function loadAgents(url = null, filters = {}, pageSize = 100) {
     let fetchUrl;
 
@@ -653,7 +749,8 @@ async function loadAgents(url = null, filters = {}, pageSize = 100) {
         }
     } else {
         // Initial load or filter change
-        fetchUrl = `${API_URL}/agents/?page_size=${pageSize}`;
+        // Cursor (keyset) pagination: next/prev links carry an opaque cursor, deep pages cost the same as page 1
+        fetchUrl = `${API_URL}/agents/?pagination=cursor&page_size=${pageSize}&fields=${AGENT_LIST_FIELDS}`;
 
         // Add Filters
         if (currentStatusFilter) {
@@ -677,47 +774,7 @@ async function loadAgents(url = null, filters = {}, pageSize = 100) {
         });
         if (res.ok) {
             const data = await res.json();
-            const agentsList = data.results || data;
-
-            // Pagination state
-            nextPageUrl = data.next;
-            prevPageUrl = data.previous;
-
-            // Update UI Controls
-            const prevBtn = document.getElementById('prev-page');
-            const nextBtn = document.getElementById('next-page');
-            const pageInfo = document.getElementById('page-info');
-
-            if (prevBtn) prevBtn.disabled = !prevPageUrl;
-            if (nextBtn) nextBtn.disabled = !nextPageUrl;
-            if (pageInfo) pageInfo.textContent = `Página ${currentPage}`;
-
-            globalAgents = agentsList.map(a => ({
-                id: a.id,
-                fullName: a.full_name,
-                birthDate: a.birth_date,
-                gender: a.gender,
-                retirementDate: a.retirement_date,
-                status: typeof a.status === 'string' ? JSON.parse(a.status) : a.status,
-                age: a.birth_date ? calculateAge(new Date(a.birth_date)) : null,
-                agreement: a.agreement,
-                law: a.law,
-                affiliate_status: a.affiliate_status,
-                ministry: a.ministry,
-                location: a.location,
-                branch: a.branch,
-                cuil: a.cuil,
-                dni: a.dni,
-                seniority: a.seniority
-            }));
-            sortAgents();
-
-            if (globalAgents.length === 0) {
-                console.log('No agents found');
-            }
-
-            renderDashboard();
-
+            applyAgentPage(data);
         } else if (res.status === 401 || res.status === 403) {
             logout();
         }
@@ -727,6 +784,50 @@ async function loadAgents(url = null, filters = {}, pageSize = 100) {
     }
 }
 
+// Shows one page of /api/agents/ results ({count, next, previous, results}) in the table
+function applyAgentPage(data) {
+    const agentsList = data.results || data;
+
+    // Pagination state
+    nextPageUrl = data.next;
+    prevPageUrl = data.previous;
+
+    // Update UI Controls
+    const prevBtn = document.getElementById('prev-page');
+    const nextBtn = document.getElementById('next-page');
+    const pageInfo = document.getElementById('page-info');
+
+    if (prevBtn) prevBtn.disabled = !prevPageUrl;
+    if (nextBtn) nextBtn.disabled = !nextPageUrl;
+    if (pageInfo) pageInfo.textContent = `Página ${currentPage}`;
+
+    globalAgents = agentsList.map(a => ({
+        id: a.id,
+        fullName: a.full_name,
+        birthDate: a.birth_date,
+        gender: a.gender,
+        retirementDate: a.retirement_date,
+        status: typeof a.status === 'string' ? JSON.parse(a.status) : a.status,
+        age: a.birth_date ? calculateAge(new Date(a.birth_date)) : null,
+        agreement: a.agreement,
+        law: a.law,
+        affiliate_status: a.affiliate_status,
+        ministry: a.ministry,
+        location: a.location,
+        branch: a.branch,
+        cuil: a.cuil,
+        dni: a.dni,
+        seniority: a.seniority
+    }));
+    sortAgents();
+
+    if (globalAgents.length === 0) {
+        console.log('No agents found');
+    }
+
+    renderDashboard();
+}
+
 function nextPage() {
     if (nextPageUrl) {
         currentPage++;
@@ -738,7 +839,6 @@ function prevPage() {
     if (prevPageUrl) {
         currentPage--;
         loadAgents(prevPageUrl);
-        loadAgents(prevPageUrl);
     }
 }
 
@@ -759,8 +859,27 @@ async function exportAgents() {
     }
 
     try {
+        // Generated by a background job, then downloaded from the job's download_url
+        const jobRes = await fetch(`${exportUrl}async=1`, {
+            headers: {
+                'Authorization': `Bearer ${token}`,
+                'X-CSRFToken': getCookie('csrftoken')
+            }
+        });
+        if (!jobRes.ok) {
+            console.error('Export failed:', jobRes.status);
+            if (jobRes.status === 401) logout();
+            else alert('Error al exportar el archivo.');
+            return;
+        }
+        const job = await waitForJob((await jobRes.json()).id);
+        if (job.status !== 'done') {
+            alert(`Error al exportar el archivo: ${job.error}`);
+            return;
+        }
+
         // Use fetch with Auth header instead of window.location.href
-        const res = await fetch(exportUrl, {
+        const res = await fetch(`${API_URL}/jobs/${job.id}/download/`, {
             headers: {
                 'Authorization': `Bearer ${token}`,
                 'X-CSRFToken': getCookie('csrftoken')
@@ -1136,30 +1255,15 @@ async function sendMessage() {
     addMessage(text, 'user');
     input.value = '';
 
-    // Process logic with a small delay to simulate "thinking"
-    // Using setTimeout wrapped in a promise or just awaiting after a delay
-
-    // Simulate thinking delay visually if desired, but for now just await response
-    const loadingId = addMessage('...', 'bot'); // Optional: Add a temp loading message
+    // Bot bubble shows "..." until the reply (or its first streamed tokens) arrives
+    const bubble = addMessage('...', 'bot');
 
     try {
-        // Improve: Remove "..." message before adding real response, or just replace it.
-        // For simplicity: We wait 400ms then call async process
-        await new Promise(r => setTimeout(r, 400));
-
-        const response = await processUserQuery(text);
-
-        // Remove loading message if we had one, or just append. 
-        // Simplest compatible way: Remove the last '...' message if it exists
-        const container = document.getElementById('chatbot-messages');
-        if (container.lastChild && container.lastChild.innerHTML === '...') {
-            container.removeChild(container.lastChild);
-        }
-
-        addMessage(response, 'bot');
+        const response = await processUserQuery(text, partial => setMessageText(bubble, partial));
+        setMessageText(bubble, response);
     } catch (e) {
         console.error(e);
-        addMessage('Ups, tuve un error al buscar esa información.', 'bot');
+        setMessageText(bubble, 'Ups, tuve un error al buscar esa información.');
     }
 }
 
@@ -1167,7 +1271,12 @@ function addMessage(text, sender) {
     const container = document.getElementById('chatbot-messages');
     const div = document.createElement('div');
     div.className = `message ${sender}`;
+    container.appendChild(div);
+    setMessageText(div, text);
+    return div;
+}
 
+function setMessageText(div, text) {
     // Parse Markdown Links: [text](url) -> <a href="url" target="_blank">text</a>
     // Also parse plain https:// links if they aren't already part of a markdown link
     let formattedText = text.replace(/\n/g, '<br>');
@@ -1180,7 +1289,7 @@ function addMessage(text, sender) {
     // But to be safe, we stick to the Markdown parser since we instructed the bot to use it.
 
     div.innerHTML = formattedText;
-    container.appendChild(div);
+    const container = div.parentNode;
     container.scrollTop = container.scrollHeight;
 }
 
@@ -1220,7 +1329,7 @@ function normalizeString(str) {
     return str.normalize("NFD").replace(/[\u0300-\u036f]/g, "").toLowerCase().trim();
 }
 
-async function processUserQuery(query) {
+async function processUserQuery(query, onPartial = null) {
     const normalizedQuery = normalizeString(query);
     const lower = query.toLowerCase().trim();
 
@@ -1247,18 +1356,33 @@ async function processUserQuery(query) {
         }
     }
 
+    // --- Public mode: streamed reply (Server-Sent Events), shown as tokens arrive ---
+    if (!currentUser) {
+        try {
+            return await streamChat(query, onPartial);
+        } catch (e) {
+            console.error('Chat Stream Error:', e);
+            return 'Error de conexión. Verifica tu internet.';
+        }
+    }
+
     // --- LLM (Groq) for everything else ---
     try {
         const mode = currentUser ? 'private' : 'public';
+        // resolve: the server runs the command and returns its first page of agents in the same response
         const res = await fetch(`${API_URL}/chat/`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                ...(token ? { 'Authorization': `Bearer ${token}` } : {}),
                 'X-CSRFToken': getCookie('csrftoken')
             },
             body: JSON.stringify({
                 message: query,
-                mode: mode
+                mode: mode,
+                resolve: true,
+                page_size: currentPageSize || 100,
+                fields: AGENT_LIST_FIELDS
             })
         });
 
@@ -1268,6 +1392,12 @@ async function processUserQuery(query) {
             // Check if response is JSON-command (Private Mode)
             if (currentUser) {
                 try {
+                    // Command already carried out server-side
+                    if (data.command && data.agents) {
+                        showBotResults(data.command, data.agents);
+                        return data.command.reply || 'Ejecutando acción...';
+                    }
+
                     // LLM might return "Here is json: {...}", so we try to extract JSON
                     let text = data.response;
                     const jsonMatch = text.match(/\{[\s\S]*\}/);
@@ -1296,6 +1426,81 @@ async function processUserQuery(query) {
     }
 }
 
+// Streams a public chat reply: the server sends 'delta' events, then 'done' (or 'error')
+async function streamChat(query, onPartial) {
+    const res = await fetch(`${API_URL}/chat/?stream=1`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream',
+            'X-CSRFToken': getCookie('csrftoken')
+        },
+        body: JSON.stringify({ message: query, mode: 'public' })
+    });
+    if (!res.ok || !res.body) {
+        console.error('Chat API Error:', res.status);
+        return 'Lo siento, mi cerebro de IA está desconectado temporalmente. Intenta más tarde.';
+    }
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let text = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            const event = (frame.match(/^event: (.*)$/m) || [])[1];
+            const data = (frame.match(/^data: (.*)$/m) || [])[1];
+            if (!data) continue;
+            const payload = JSON.parse(data);
+            if (event === 'delta') {
+                text += payload.delta;
+                if (onPartial) onPartial(text);
+            } else {
+                // 'done' carries the full reply, 'error' the message to show
+                return payload.response;
+            }
+        }
+    }
+    return text;
+}
+
+// Command filter -> loadAgents() filter key (same mapping as executeBotCommand)
+const BOT_COMMAND_FILTERS = {
+    search_dni: 'dni',
+    filter_jurisdiction: 'ministry',
+    filter_agreement: 'agreement',
+    filter_surname: 'surname'
+};
+
+// Shows the agents a resolved chat command returned (no extra /agents/ request)
+function showBotResults(cmd, page) {
+    currentStatusFilter = null;
+    currentFilters = { [BOT_COMMAND_FILTERS[cmd.action]]: cmd.value.trim() };
+    currentPage = 1;
+
+    const statusBadges = document.querySelectorAll('.filter-badge');
+    statusBadges.forEach(b => b.classList.remove('active'));
+
+    applyAgentPage(page);
+
+    if (cmd.action === 'search_dni') {
+        if (globalAgents.length > 0) {
+            openDetailsModal(globalAgents[0].id);
+        } else {
+            alert('No se encontró nadie con ese DNI.');
+            resetSearch();
+        }
+    }
+}
+
 async function executeBotCommand(cmd) {
     // Reset status filter for global search
     currentStatusFilter = null;